@@ -8,14 +8,15 @@ import argparse
 import time
 import shutil
 import copy
-import json
 import yaml
 
-import subprocess
 import signal
+import multiprocessing
+import threading
+import queue
+import itertools
 
 from bs4 import BeautifulSoup as bs
-import pandas as pd
 
 import datetime
 from dateutil.parser import parse
@@ -25,42 +26,55 @@ import re
 import utils.constants_and_paths as constants
 import utils.correct_deploy as deploy
 import utils.routine_operations as routine
+import utils.get_interval as get_interval
+import utils.columnar_cache as columnar
+import utils.detection_trace as tracing
+import utils.frame_cache as frame_cache
+import utils.serving_queue as serving
+import utils.interval_preview as preview
+import utils.parameter_search as search
 
 import jinja.pylib.get_template as template
 
 from loguru import logger
 import gevent
 
-from typing import Dict, List, Union
+from typing import Any, Dict, List, Tuple, Union
 
 VERSION = '1.0.0'
 
 config_path = None
 config = None
 config_backup = None
+# Время изменения прочитанного конфига: конфиг перечитывается, если его переписал другой процесс веб-приложения
+config_mtime = None
 
 app = Flask(__name__, static_folder="./web", template_folder="./web", static_url_path="")
 CORS(app)
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
 clients = {}
 
-# Переменная под фрейм исходных данных срезов
-slices_df = None
-# Переменная под фрейм kks, групп и описания
-kks_with_groups = None
-# Переменная под фрейм сглаженных данных
-roll_df = None
-# Переменная под фрейм предикта
-predict_df = None
-# Переменная под фрейм лосса
-loss_df = None
-# Переменная под json интервалы
-json_interval = None
-
-
-# Переменная под объект процесса Popen выделения интервалов
+# Переменная под общий LRU кэш фреймов объектов и групп: срезы, kks, roll, лосс, средний лосс, json интервалы.
+# Обработчики получают фреймы по описателю (объект, группа) из запроса, поэтому клиенты, просматривающие
+# разные объекты, не подменяют данные друг друга
+frames = None
+
+
+# Переменная под объект процесса выделения интервалов
 p_get_interval = None
-sid_proc = None
+# Блокировка, исключающая одновременное выделение интервалов и выделение в режиме дописывания, событие
+# кооперативной отмены выделения и sid запустившего его клиента, общие для всех процессов веб-приложения
+detection_lock = threading.Lock()
+detection_cancel = None
+detection_owner = None
+# Время ожидания блокировки выделения, которую может занимать опрос режима дописывания, с
+DETECTION_LOCK_TIMEOUT = 30
+# Блокировка подбора параметров: подбор занимает пул процессов, одновременно выполняется один подбор
+search_lock = threading.Lock()
+# Порт текущего процесса веб-приложения, процессы остальных портов и счетчик распределения клиентов по ним
+serve_port = None
+serve_processes = []
+serve_counter = itertools.count()
 # Переменная под объект гринлета построения отчета
 report_greenlet = None
 
@@ -102,10 +116,31 @@ def catch_all(path):
 @app.route('/api_urls.js')
 def get_api_urls_js():
     """
-    Функция посылки js файла с URL бэкенда
-    :return: ./web/api_urls.js
+    Функция посылки js файла с URL бэкенда. Если процессов веб-приложения несколько, основной процесс
+    распределяет клиентов по процессам по кругу: клиент отправляет HTTP запросы и события Socket.IO
+    одному процессу
+    :return: ./web/api_urls.js или js с URL процесса клиента
+    """
+    if args.serve_workers == 1:
+        return send_file('./web/api_urls.js')
+    port = serve_port
+    if serve_port == args.port:
+        port = args.port + next(serve_counter) % args.serve_workers
+    return Response(f"window.api = {{ url: 'http://{args.host}:{port}/' }};", mimetype='application/javascript')
+
+
+@app.before_request
+def refresh_config() -> None:
+    """
+    Процедура перечитывания конфига, если его переписал другой процесс веб-приложения, выделявший интервалы
+    :return: None
     """
-    return send_file('./web/api_urls.js')
+    global config, config_mtime
+    mtime = os.stat(constants.CONFIG).st_mtime_ns
+    if mtime != config_mtime:
+        with open(constants.CONFIG, 'r') as read_file:
+            config = yaml.safe_load(read_file)
+        config_mtime = mtime
 
 
 @app.route('/bootstrap/dist/css/bootstrap.min.css')
@@ -197,20 +232,14 @@ def init_sidebar() -> Response:
     Функция инициализации меню sidebar: объекты, группы, интервалы
     :return: json с инициализированными объектами, группами, интервалами
     """
-    global slices_df, kks_with_groups, roll_df, loss_df, json_interval
     logger.info(f"init_sidebar()")
-    # Инициализируем исходные интервалы
-    json_interval = init_json_interval
-    # Инициализируем pandas фреймы
-    slices_df = pd.read_csv(config_path[init_object]['slices'], parse_dates=['timestamp'], index_col=['timestamp'])
-    kks_with_groups = pd.read_csv(config_path[init_object]['kks_with_groups'], sep=';')
-    # Убираем Nan-ы в описании датчиков
-    kks_with_groups['name'].fillna(value='ОПИСАНИЯ НЕТ', inplace=True)
-    roll_df = pd.read_csv(os.path.join(config_path[init_object]['roll'], f'roll_{init_group}.csv'), parse_dates=['timestamp'], index_col=['timestamp'])
-    loss_df = pd.read_csv(os.path.join(config_path[init_object]['loss'], f'loss_{init_group}.csv'), parse_dates=['timestamp'], index_col=['timestamp'])
+    # Инициализируем pandas фреймы и исходные интервалы
+    load_object(init_object)
+    json_interval = load_group(init_object, init_group)
+    prefetch_adjacent(init_object, init_group)
 
     return jsonify(object=init_object, objects=init_objects, group=init_group, groups=init_groups,
-                   intervals=init_intervals)
+                   intervals=[record['time'] for record in json_interval])
 
 
 @app.route('/api/update_sidebar/', methods=['GET'])
@@ -226,19 +255,10 @@ def update_sidebar() -> Response:
         :param gr: выбранная группа
         :return: json с интервалами, группой и группами
         """
-        global slices_df, kks_with_groups, roll_df, loss_df, json_interval
         logger.info(f"update_sidebar_by_object({ob}, {gr})")
         # Загружаем необходимые pandas фреймы при смене объекта
-        slices_df = pd.read_csv(config_path[object_selected]['slices'], parse_dates=['timestamp'], index_col=['timestamp'])
-        kks_with_groups = pd.read_csv(config_path[object_selected]['kks_with_groups'], sep=';')
-        # Убираем Nan-ы в описании датчиков
-        kks_with_groups['name'].fillna(value='ОПИСАНИЯ НЕТ', inplace=True)
-        roll_df = pd.read_csv(os.path.join(config_path[object_selected]['roll'], f'roll_{group}.csv'), parse_dates=['timestamp'], index_col=['timestamp'])
-        loss_df = pd.read_csv(os.path.join(config_path[object_selected]['loss'], f'loss_{group}.csv'), parse_dates=['timestamp'], index_col=['timestamp'])
-
-        with open(os.path.join(config_path[object_selected]['json_interval'], f'group_{group}.json'), 'r') as read_file:
-            json_interval = json.load(read_file)
-        intervals = [record['time'] for record in json_interval]
+        load_object(ob)
+        intervals = [record['time'] for record in load_group(ob, gr)]
 
         return jsonify(intervals=intervals, group=group, groups=groups)
 
@@ -249,15 +269,9 @@ def update_sidebar() -> Response:
         :param gr: выбранная группа
         :return: json с интервалами, группой и группами
         """
-        global roll_df, loss_df, json_interval
         logger.info(f"update_sidebar_by_group({ob}, {gr})")
         # Загружаем необходимые pandas фреймы при смене группы
-        roll_df = pd.read_csv(os.path.join(config_path[object_selected]['roll'], f'roll_{group}.csv'), parse_dates=['timestamp'], index_col=['timestamp'])
-        loss_df = pd.read_csv(os.path.join(config_path[object_selected]['loss'], f'loss_{group}.csv'), parse_dates=['timestamp'], index_col=['timestamp'])
-
-        with open(os.path.join(config_path[object_selected]['json_interval'], f'group_{group}.json'), 'r') as read_file:
-            json_interval = json.load(read_file)
-        intervals = [record['time'] for record in json_interval]
+        intervals = [record['time'] for record in load_group(ob, gr)]
 
         return jsonify(intervals=intervals, group=group, groups=groups)
 
@@ -275,7 +289,78 @@ def update_sidebar() -> Response:
     group = group_selected if group_selected < groups else 0
     logger.info(f"update_sidebar({object_selected}, {group})")
 
-    return update_sidebar_cause_dict[cause](object_selected, group)
+    # Пользователь ушел от прогреваемых групп - фоновая загрузка не должна конкурировать с чтением выбранных
+    frames.cancel_prefetch()
+    response = update_sidebar_cause_dict[cause](object_selected, group)
+    logger.info(f"frame cache: {frames.stats()}")
+    prefetch_adjacent(object_selected, group)
+    return response
+
+
+def resolve_frames(object_selected: str, group_selected: Union[int, None], *artifacts: str) -> list:
+    """
+    Функция фреймов по описателю (объект, группа) запроса из общего кэша фреймов. Фреймы общие для всех
+    клиентов и обработчиками не изменяются
+    :param object_selected: выбранный объект
+    :param group_selected: выбранная группа, для артефактов объекта не учитывается
+    :param artifacts: наименования артефактов
+    :return: список значений артефактов в порядке artifacts
+    """
+    return [frames.artifact(config_path[object_selected], object_selected, group_selected, artifact)
+            for artifact in artifacts]
+
+
+def load_object(object_selected: str) -> None:
+    """
+    Процедура загрузки фреймов объекта в кэш фреймов: срезы, kks с группами
+    :param object_selected: выбранный объект
+    :return: None
+    """
+    resolve_frames(object_selected, None, *frame_cache.OBJECT_ARTIFACTS)
+
+
+def load_group(object_selected: str, group_selected: int) -> List[dict]:
+    """
+    Функция загрузки фреймов группы в кэш фреймов: roll, лосс, средний лосс, json интервалы
+    :param object_selected: выбранный объект
+    :param group_selected: выбранная группа
+    :return: json интервалы группы
+    """
+    *_, json_interval = resolve_frames(object_selected, group_selected, *frame_cache.GROUP_ARTIFACTS)
+    return json_interval
+
+
+def prefetch_adjacent(object_selected: str, group_selected: int) -> None:
+    """
+    Процедура фоновой загрузки соседних групп выбранного объекта и, если задано, следующего объекта
+    в кэш фреймов. Предыдущая фоновая загрузка отменяется
+    :param object_selected: выбранный объект
+    :param group_selected: выбранная группа
+    :return: None
+    """
+    ticket = frames.cancel_prefetch()
+    groups = config[object_selected]['count_of_groups']
+    items = [(config_path[object_selected], object_selected, group, artifact)
+             for group in (group_selected + 1, group_selected - 1) if 0 <= group < groups
+             for artifact in frame_cache.PREFETCH_ARTIFACTS]
+    if args.prefetch_object:
+        objects = list(config_path.keys())
+        next_object = objects[(objects.index(object_selected) + 1) % len(objects)]
+        if next_object != object_selected:
+            items += [(config_path[next_object], next_object, None, artifact)
+                      for artifact in frame_cache.OBJECT_ARTIFACTS]
+    if items:
+        socketio.start_background_task(frames.prefetch, items, ticket)
+
+
+@app.route('/api/frame_cache/', methods=['GET'])
+def frame_cache_stats() -> Response:
+    """
+    Функция статистики кэша фреймов: количество значений, память, попадания и промахи
+    :return: json статистики кэша фреймов
+    """
+    logger.info(f"frame_cache_stats()")
+    return jsonify(frames.stats())
 
 
 @app.route('/api/init_post_processing/', methods=['GET'])
@@ -288,6 +373,86 @@ def init_post_processing() -> Response:
     return jsonify(postProcessing=routine.dict_to_lower_camel_case(config['post_processing']))
 
 
+@app.route('/api/preview_intervals/', methods=['GET'])
+def preview_intervals() -> Response:
+    """
+    Функция предпросмотра интервалов группы по параметрам постобработки без запуска выделения и записи на диск
+    :return: json с временем и индексами интервалов, суммарной длиной и долей аномалий
+    """
+    object_selected = request.args.get('objectSelected', type=str)
+    group_selected = request.args.get('groupSelected', type=int)
+    post_processing = routine.dict_to_snake_case({key: request.args.get(key) for key in request.args
+                                                  if key not in ('objectSelected', 'groupSelected')})
+    logger.info(f"preview_intervals({object_selected}, {group_selected}, {post_processing})")
+    try:
+        if object_selected not in config_path or group_selected is None or \
+                not 0 <= group_selected < config[object_selected]['count_of_groups']:
+            raise ValueError(f"unknown group {group_selected} of object {object_selected}")
+        unknown = set(post_processing) - set(config['post_processing'])
+        if unknown:
+            raise ValueError(f"unknown post processing parameters {sorted(unknown)}")
+        # Пороги - доли, длины и счетчики - количество отсчетов, отрицательное окно сглаживания отключает его
+        post_processing = {
+            **{key: values[0] for key, values in search.validate_space(
+                {key: value for key, value in post_processing.items() if key in search.SEARCH_PARAMETERS}).items()},
+            **{key: search.cast_value(key, value, integer=True, minimum=-1 if key == 'roll_in_hours' else 1)
+               for key, value in post_processing.items() if key not in search.SEARCH_PARAMETERS}
+        }
+    except ValueError as parameter_error:
+        logger.error(parameter_error)
+        return jsonify(causeException=str(parameter_error), status='error'), 400
+
+    result = preview.preview_intervals(os.path.join(config_path[object_selected]['predict'],
+                                                    f'predict_{group_selected}.csv'),
+                                       config_path[object_selected]['roll_cache'], group_selected,
+                                       config[object_selected], {**config['post_processing'], **post_processing},
+                                       constants.COLUMNAR_CACHE)
+    return jsonify(intervals=result['intervals'], index=result['index'], sumAnomaly=result['sum_anomaly'],
+                   partOfAnomaly=result['part_of_anomaly'])
+
+
+@app.route('/api/detection_trace/', methods=['GET'])
+def detection_trace() -> Response:
+    """
+    Функция трассы последнего выделения интервалов: время и пик памяти по группам и этапам
+    :return: json трассы выделения или пустой объект, если выделение еще не выполнялось
+    """
+    logger.info(f"detection_trace()")
+    return jsonify(tracing.read_trace(os.getcwd()) or {})
+
+
+@socketio.on('/api/parameter_search/')
+def parameter_search(object_selected: str, group_selected: int, settings: dict) -> Dict[str, Union[str, list]]:
+    """
+    Функция подбора параметров постобработки группы по сетке или случайным наборам значений
+    :param object_selected: выбранный объект
+    :param group_selected: выбранная группа
+    :param settings: json объект подбора: space - значения параметров, count - количество случайных наборов,
+    targetFraction - целевая доля аномалий или labels - размеченные интервалы. Наборов не больше
+    search.MAX_SEARCH_SETS, подбор занимает --workers процессов
+    :return: json объект со статусом выполненной операции и таблицей наборов по убыванию качества
+    """
+    logger.info(f"parameter_search({object_selected}, {group_selected}, {settings})")
+    refresh_config()
+    if not search_lock.acquire(blocking=False):
+        return {'causeException': "подбор параметров уже выполняется", 'status': 'error'}
+    try:
+        space = search.parse_space([], config['post_processing'])
+        space.update(search.validate_space(routine.dict_to_snake_case(settings.get('space', {}))))
+        table = search.search_group(
+            os.path.join(config_path[object_selected]['predict'], f'predict_{int(group_selected)}.csv'),
+            config_path[object_selected]['roll_cache'], int(group_selected), config[object_selected],
+            config['post_processing'], space, settings.get('count'), settings.get('targetFraction'),
+            settings.get('labels'), workers=args.workers, columnar_cache_dir=constants.COLUMNAR_CACHE)
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as search_error:
+        logger.error(search_error)
+        return {'causeException': str(search_error), 'status': 'error'}
+    finally:
+        search_lock.release()
+    table.columns = [routine.to_lower_camel_case(column) for column in table.columns]
+    return {'table': table.to_dict('records'), 'status': 'success'}
+
+
 @socketio.on('/api/interval_detection/')
 def interval_detection(post_processing: dict) -> Dict[str, str]:
     """
@@ -295,17 +460,36 @@ def interval_detection(post_processing: dict) -> Dict[str, str]:
     :param post_processing: json объект параметров постобработки
     :return: json объект со статусом выполненной операции: success - успешно, error - ошибка
     """
-    global config, config_backup, p_get_interval, sid_proc
     sid = request.sid
-    if p_get_interval is not None:
+    # Выделение, запущенное клиентом любого процесса веб-приложения, отклоняет повторный запуск. Опрос
+    # режима дописывания занимает блокировку ненадолго, и запуск его дожидается
+    if detection_owner.value or not detection_lock.acquire(timeout=DETECTION_LOCK_TIMEOUT):
         return {'causeException': "Процесс уже запущен для другого клиента", 'status': 'error'}
-    sid_proc = sid
-    logger.info(f"interval_detection({post_processing})")
+    try:
+        detection_owner.value = sid.encode()
+        detection_cancel.clear()
+        logger.info(f"interval_detection({post_processing})")
+        refresh_config()
+        return interval_detection_run(post_processing, sid)
+    finally:
+        detection_owner.value = b''
+        detection_lock.release()
+
+
+def interval_detection_run(post_processing: dict, sid: str) -> Dict[str, str]:
+    """
+    Функция запуска процесса выделения интервалов и трансляции его прогресса клиенту
+    :param post_processing: json объект параметров постобработки
+    :param sid: идентификатор сокета клиента, запустившего выделение
+    :return: json объект со статусом выполненной операции: success - успешно, error - ошибка
+    """
+    global config, config_backup, p_get_interval
 
     post_processing = routine.dict_to_snake_case(post_processing)
-    # Временное сохранение директорий объектов и конфига на случай отмены выделения интервалов
+    # Временное сохранение конфига на случай отмены выделения интервалов, выделение пишет в снимок директории
+    # объектов и применяется только при успешном завершении
     config_backup = copy.deepcopy(config)
-    routine.copy_recursively_objects_directory(constants.OBJECTS, constants.OBJECTS_BACKUP)
+    routine.snapshot_objects_directory(constants.OBJECTS, constants.OBJECTS_STAGING)
 
     # Сохраняем параметры, на которых выделяем интервал, в конфиг
     config['post_processing'] = post_processing
@@ -316,71 +500,110 @@ def interval_detection(post_processing: dict) -> Dict[str, str]:
     with open(constants.CONFIG, 'r') as read_file:
         config = yaml.safe_load(read_file)
 
-    # Запуск выделения интервалов, если ошибка, то восстанавливаем исходный конфиг и директории с объектами
-    arguments = ["python", "./get_interval.py", "-s", args.path, "-d", os.getcwd(),
-                 "-c", os.path.join(os.getcwd(), constants.CONFIG)]
-    logger.info(' '.join(arguments))
-    try:
-        p_get_interval = subprocess.Popen(arguments, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                          cwd=os.path.join(os.getcwd(), 'utils'))
-        while p_get_interval.poll() is None:
-            socketio.sleep(2)
-            if os.path.isfile(f'utils{os.sep}complete.log'):
-                with open(f'utils{os.sep}complete.log', 'r') as read_file:
-                    status = read_file.readline()
-                    socketio.emit("setPercentIntervalDetection", int(status.strip('%')), to=sid)
-    except subprocess.CalledProcessError as subprocess_exception:
-        logger.error(subprocess_exception)
-        # Восстанавливаем исходный конфиг и объекты
-        config = routine.backup_recovery(constants.CONFIG, config_backup, constants.OBJECTS_BACKUP,
-                                         constants.OBJECTS)
-        return {'causeException': str(subprocess_exception), 'status': 'error'}
-    except RuntimeError as run_time_error:
-        logger.error(run_time_error)
-        # Восстанавливаем исходный конфиг и объекты
-        config = routine.backup_recovery(constants.CONFIG, config_backup, constants.OBJECTS_BACKUP,
-                                         constants.OBJECTS)
-        return {'causeException': str(run_time_error), 'status': 'error'}
-    except KeyboardInterrupt as keyboard_interrupt:
-        logger.warning("KeyboardInterrupt")
-        # Восстанавливаем исходный конфиг и объекты
-        config = routine.backup_recovery(constants.CONFIG, config_backup, constants.OBJECTS_BACKUP,
-                                         constants.OBJECTS)
-        return {'causeException': str(keyboard_interrupt), 'status': 'error'}
-
-    # Интервалы успешно выделились - бекап не нужен, удаляем временную директорию
-    logger.info("p_get_interval finished")
-    # Восстанавливаем исходный конфиг и объекты, если процесс завершился с ошибкой или был прерван
-    return_code = p_get_interval.returncode
-    if return_code != 0:
-        config = routine.backup_recovery(constants.CONFIG, config_backup, constants.OBJECTS_BACKUP, constants.OBJECTS)
-        p_get_interval = None
-        return {'causeException': f"код завершения процесса {return_code}", 'status': 'success'}
-    routine.remove_recursively_objects_directory(constants.OBJECTS_BACKUP)
+    # Запуск выделения интервалов в отдельном процессе: прогресс по группам и этапам приходит через очередь
+    params = {
+        'source': args.path,
+        'destination': os.getcwd(),
+        'config_path': os.path.join(os.getcwd(), constants.CONFIG),
+        'workers': args.workers,
+        'job_dir': args.job_dir,
+        'memory_budget': args.memory_budget * 2 ** 20,
+        'roll_csv': args.roll_csv,
+        'chrome_trace': args.chrome_trace,
+        'objects': constants.OBJECTS_STAGING
+    }
+    logger.info(params)
+    context = multiprocessing.get_context('spawn')
+    progress_queue = context.Queue()
+    p_get_interval = context.Process(target=get_interval.detection_process,
+                                     args=(progress_queue, detection_cancel, params))
+    p_get_interval.start()
+
+    result = None
+    while result is None:
+        try:
+            message = progress_queue.get_nowait()
+        except queue.Empty:
+            # Процесс завершился, не сообщив статус - выделение прервано извне
+            if not p_get_interval.is_alive() and progress_queue.empty():
+                result = {'status': 'error', 'causeException': f"код завершения процесса {p_get_interval.exitcode}"}
+            socketio.sleep(0.2)
+            continue
+        if message['type'] == 'progress':
+            socketio.emit("setPercentIntervalDetection", message['percent'], to=sid)
+            socketio.emit("setStageIntervalDetection", {key: message[key] for key in ('object', 'group', 'stage')},
+                          to=sid)
+        else:
+            result = message
+    p_get_interval.join()
+    p_get_interval = None
+    logger.info(f"p_get_interval finished: {result['status']}")
+
+    # Восстанавливаем исходный конфиг и удаляем директорию выделения, если выделение завершилось с ошибкой
+    # или было отменено
+    if result['status'] == 'error':
+        config = routine.backup_recovery(constants.CONFIG, config_backup, constants.OBJECTS_STAGING)
+        return {'causeException': result['causeException'], 'status': 'error'}
+    if result['status'] == 'cancelled':
+        config = routine.backup_recovery(constants.CONFIG, config_backup, constants.OBJECTS_STAGING)
+        return {'causeException': result['causeException'], 'status': 'success'}
+
+    # Интервалы успешно выделились - применяем директорию выделения вместо директории объектов
+    routine.commit_objects_directory(constants.OBJECTS_STAGING, constants.OBJECTS, constants.OBJECTS_BACKUP)
+    # Выделение переписало roll и json интервалы групп - кэшированные фреймы сбрасываются
+    frames.invalidate()
 
     # Удаляем старые html и pdf отчеты и создаем заново директорию reports в objects
     routine.remove_reports(constants.OBJECTS)
-    p_get_interval = None
     return {'status': 'success'}
 
 
+def tail_detection(period: float) -> None:
+    """
+    Процедура фонового выделения интервалов в строках, дописанных в предикты, с отправкой новых
+    и продолжающихся интервалов всем клиентам
+    :param period: период опроса предиктов в секундах
+    :return: None
+    """
+    while True:
+        socketio.sleep(period)
+        # Позиционный аргумент: блокировка процессов не принимает blocking
+        if not detection_lock.acquire(False):
+            continue
+        try:
+            updates = get_interval.run_tail_detection(args.path, os.getcwd(),
+                                                      os.path.join(os.getcwd(), constants.CONFIG))
+        except Exception as tail_error:
+            # Ошибка одного опроса (недописанная строка, поврежденный файл) не останавливает режим дописывания
+            logger.exception(tail_error)
+            continue
+        finally:
+            detection_lock.release()
+        for update in updates:
+            try:
+                frames.invalidate(update['object'], update['group'])
+                socketio.emit("updateIntervals", update)
+            except Exception as emit_error:
+                logger.exception(emit_error)
+
+
 @socketio.on('/api/cancel_interval_detection/')
 def interval_detection_cancel() -> Dict[str, str]:
     """
     Функция отмены выделения интервалов
     :return: json объект со статусом выполненной операции: success - успешно, error - ошибка
     """
-    global config, p_get_interval, sid_proc
     sid = request.sid
 
-    if sid_proc != sid:
-        return {'status': 'error'}
+    # Отменить выделение может только запустивший его клиент, к какому бы процессу веб-приложения
+    # он ни был подключен
+    if detection_owner.value != sid.encode():
+        return {'causeException': "Выделение интервалов запущено другим клиентом", 'status': 'error'}
 
     logger.info(f"interval_detection_cancel()")
-    if p_get_interval.poll() is None:
-        p_get_interval.terminate()
-        sid_proc = None
-        logger.info("p_get_interval canceled")
+    # Отмена кооперативная: процесс завершает текущий этап, удаляет временные файлы и сообщает статус
+    detection_cancel.set()
+    logger.info("p_get_interval canceled")
     return {'status': 'success'}
 
 
@@ -395,8 +618,8 @@ def update_plotly_interval() -> Response:
         Функция обновления данных графика вероятности на всем промежутке фрейма
         :return: json графика вероятности на всем промежутки фрейма с заполненными объектами data и layout
         """
-        global roll_df, json_interval
         logger.info(f"update_plotly_interval_all()")
+        roll_df, json_interval = resolve_frames(object_selected, group_selected, 'roll', 'json_interval')
         # Заполняем данные графика
         data, layout = routine.fill_plotly_interval_all(roll_df, object_selected, group_selected, json_interval)
         return jsonify(data=data, layout=layout)
@@ -407,8 +630,8 @@ def update_plotly_interval() -> Response:
         :param interval_num: номер интервала в списке json_interval соответственно
         :return: json графика вероятности определенного интервала с заполненными объектами data и layout
         """
-        global roll_df, json_interval
         logger.info(f"update_plotly_interval_specify({interval_num})")
+        roll_df, json_interval = resolve_frames(object_selected, group_selected, 'roll', 'json_interval')
         data, layout = routine.fill_plotly_interval_specify(roll_df, object_selected, group_selected, interval_num,
                                                             json_interval)
         return jsonify(data=data, layout=layout)
@@ -432,6 +655,8 @@ def get_signals() -> Response:
     interval_selected = request.args.get('intervalSelected', type=str)
 
     logger.info(f"get_signals({object_selected}, {group_selected}, {interval_selected})")
+    kks_with_groups, json_interval = resolve_frames(object_selected, group_selected, 'kks_with_groups',
+                                                    'json_interval')
     top_list = json_interval[int(interval_selected)]["top_sensors"]
     other_list = kks_with_groups.loc[kks_with_groups['group'] == group_selected]['kks'].tolist()
     # Убираем повторы с топовыми датчиками
@@ -454,6 +679,7 @@ def get_additional_signals() -> Response:
     object_selected = request.args.get('objectSelected', type=str)
 
     logger.info(f"get_additional_signals({main_signal_kks}, {object_selected})")
+    kks_with_groups, = resolve_frames(object_selected, None, 'kks_with_groups')
     return jsonify(additionalSignals=routine.define_additional_signals(kks_with_groups,
                                                                        main_signal_kks,
                                                                        config[object_selected]['power_index'],
@@ -467,14 +693,15 @@ def update_plotly_multiple_axes() -> Response:
     Функция обновления данных многоосевого графика
     :return: json многоосевого графика с заполненными объектами data и layout
     """
-    global slices_df, json_interval
     main_signal_kks = request.args.get('mainSignal', type=str)
     object_selected = request.args.get('objectSelected', type=str)
+    group_selected = request.args.get('groupSelected', type=int)
     interval_selected = request.args.get('intervalSelected', type=int)
     signals = request.args.getlist('signals[]')
     active_signals = request.args.getlist('activeCheckbox[]')
 
-    logger.info(f"update_plotly_multiple_axes({main_signal_kks}, {object_selected}, {interval_selected}, {signals}, {active_signals})")
+    logger.info(f"update_plotly_multiple_axes({main_signal_kks}, {object_selected}, {group_selected}, "
+                f"{interval_selected}, {signals}, {active_signals})")
 
     signals.insert(0, main_signal_kks)
 
@@ -483,6 +710,7 @@ def update_plotly_multiple_axes() -> Response:
 
     # Упорядочиваем по списку порядок выбора чекбоксов сигнала
     active_signals = [signal for signal in signals if signal in active_signals]
+    slices_df, json_interval = resolve_frames(object_selected, group_selected, 'slices', 'json_interval')
     data, layout = routine.fill_plotly_multi_axes(slices_df, interval_selected,
                                                   signals, active_signals, json_interval,
                                                   params={
@@ -498,10 +726,16 @@ def update_plotly_histogram() -> Response:
     Функция обновления данных гистограммы распределния
     :return: json гистограммы распределния с заполненными объектами data и layout
     """
-    global loss_df
-    logger.info(f"update_plotly_histogram()")
+    object_selected = request.args.get('objectSelected', type=str)
+    group_selected = request.args.get('groupSelected', type=int)
+
+    logger.info(f"update_plotly_histogram({object_selected}, {group_selected})")
+    loss, = resolve_frames(object_selected, group_selected, 'loss_mean')
+    # Лосс читается, только если средний лосс не сохранен выделением интервалов
+    if loss is None:
+        loss, = resolve_frames(object_selected, group_selected, 'loss')
 
-    data, layout = routine.fill_plotly_histogram(loss_df,
+    data, layout = routine.fill_plotly_histogram(loss,
                                                  config['post_processing']['threshold_short'],
                                                  config['post_processing']['threshold_long'])
 
@@ -517,9 +751,11 @@ def common_report(object_selected: str, group_selected: int, settings: Dict[str,
     :param settings: объект параметров рендера pdf отчета
     :return: статус операции рендеринга html шаблона и pdf отчета по всем интервалам группы объекта
     """
-    global slices_df, roll_df, loss_df, kks_with_groups
     sid = request.sid
     logger.info(f"common_report({object_selected}, {group_selected}, {settings})")
+    refresh_config()
+    slices_df, kks_with_groups, roll_df, loss_df, json_interval = resolve_frames(
+        object_selected, group_selected, 'slices', 'kks_with_groups', 'roll', 'loss', 'json_interval')
 
     params = {
         'url': f"http://{args.host}:{args.port}/",
@@ -552,10 +788,12 @@ def interval_report(object_selected: str, group_selected: int, settings: Dict[st
     :param active_signals: объект активных датчиков и выбранных для отображения на многоосевых графиков сигналов
     :return: статус операции рендеринга html шаблона и pdf отчета интервала
     """
-    global slices_df, roll_df, kks_with_groups
     sid = request.sid
     logger.info(f"interval_report({object_selected}, {group_selected}, {settings}, {interval_selected}, "
                 f"{tops_order}, {others_order}, {active_signals})")
+    refresh_config()
+    slices_df, kks_with_groups, roll_df, json_interval = resolve_frames(
+        object_selected, group_selected, 'slices', 'kks_with_groups', 'roll', 'json_interval')
 
     params = {
         'url': f"http://{args.host}:{args.port}/",
@@ -580,6 +818,57 @@ def interval_report(object_selected: str, group_selected: int, settings: Dict[st
                                                params)
 
 
+def serve(port: int) -> None:
+    """
+    Процедура запуска процесса веб-приложения: объекты станций, кэш фреймов, фреймы начальной группы,
+    выделение в режиме дописывания (только в основном процессе)
+    :param port: порт процесса
+    :return: None
+    """
+    global serve_port, frames, init_objects, init_object, init_group, init_groups
+    serve_port = port
+    refresh_config()
+
+    # Инициализируем объекты станций и количество групп для старта бэкенда на Flask
+    init_objects = list(config_path.keys())
+    init_object = init_objects[0]
+    init_group = 0
+    init_groups = config[init_object]['count_of_groups']
+
+    # Инициализируем кэш и pandas фреймы, у нескольких процессов числовые фреймы отображаются в память
+    frames = frame_cache.FrameCache(args.cache_budget * 2 ** 20, mmap=args.serve_workers > 1)
+    load_object(init_object)
+    load_group(init_object, init_group)
+
+    # Фоновое выделение интервалов в дописываемых предиктах
+    if args.tail is not None and port == args.port:
+        socketio.start_background_task(tail_detection, args.tail)
+
+    logger.info(f"started on {port}")
+    socketio.run(app, host=args.host, port=port)
+
+
+def serve_worker(worker_args: argparse.Namespace, worker_config_path: dict, worker: int,
+                 queue_address: Tuple[str, int], queue_authkey: bytes, lock: Any, cancel: Any, owner: Any) -> None:
+    """
+    Процедура дополнительного процесса веб-приложения на порту port + worker
+    :param worker_args: аргументы командной строки основного процесса
+    :param worker_config_path: словарь путей всех файлов объектов
+    :param worker: номер процесса
+    :param queue_address: адрес ретранслятора локальной очереди сообщений Socket.IO
+    :param queue_authkey: ключ аутентификации соединений с ретранслятором
+    :param lock: общая для процессов блокировка выделения интервалов
+    :param cancel: общее для процессов событие отмены выделения интервалов
+    :param owner: общий для процессов sid клиента, запустившего выделение интервалов
+    :return: None
+    """
+    global args, config_path, detection_lock, detection_cancel, detection_owner
+    args, config_path, detection_lock, detection_cancel, detection_owner = worker_args, worker_config_path, lock, \
+        cancel, owner
+    serving.attach_queue(socketio.server, queue_address, queue_authkey)
+    serve(args.port + worker)
+
+
 def parse_args():
     parser = argparse.ArgumentParser(description="start flask + vue 3 ReportAuto web-application")
     parser.add_argument("-p", "--path", type=str, help="specify path of experiment", required=True)
@@ -587,6 +876,25 @@ def parse_args():
     parser.add_argument("-po", "--port", type=int, help="specify port", required=True)
     parser.add_argument("-i", "--ignore", default=False, help="flag of ignore of initial detection of intervals",
                         required=False, action="store_true")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="specify count of processes for detection of intervals of groups")
+    parser.add_argument("-j", "--job-dir", type=str, default=None,
+                        help="specify shared job directory for detection of intervals by workers on several hosts")
+    parser.add_argument("-t", "--tail", type=float, default=None,
+                        help="specify period in seconds of detection of intervals in rows appended to predicts")
+    parser.add_argument("--roll-csv", default=False, action="store_true",
+                        help="flag of export of rolled series of groups to csv next to binary roll files")
+    parser.add_argument("--chrome-trace", default=False, action="store_true",
+                        help="flag of export of detection trace to chrome trace format (trace.chrome.json)")
+    parser.add_argument("-m", "--memory-budget", type=int, default=columnar.COLUMNAR_MEMORY_BUDGET // 2 ** 20,
+                        help="specify memory budget of chunked loss ingest of each detection process in MiB")
+    parser.add_argument("-c", "--cache-budget", type=int, default=frame_cache.FRAME_CACHE_BUDGET // 2 ** 20,
+                        help="specify memory budget of cache of frames of objects and groups in MiB")
+    parser.add_argument("--prefetch-object", default=False, action="store_true",
+                        help="flag of background load of slices of next object in addition to adjacent groups")
+    parser.add_argument("-sw", "--serve-workers", type=int, default=1,
+                        help="specify count of processes of web-application on consecutive ports from port, "
+                             "frames are memory-mapped and shared by processes")
     parser.add_argument("-v", "--version", action="version", help="print version", version=f'{VERSION}')
     return parser.parse_args()
 
@@ -602,12 +910,19 @@ if __name__ == '__main__':
     # Валидация IPv4-адреса и порта
     if not deploy.validate_ip_and_port(args.host, args.port):
         exit(0)
+    # Дополнительные процессы веб-приложения занимают следующие порты
+    for worker in range(1, args.serve_workers):
+        if not deploy.validate_ip_and_port(args.host, args.port + worker):
+            exit(0)
 
     # Валидация существования пути
     if not deploy.validate_dir_path(args.path):
         logger.error(f"{args.path} not exist!")
         exit(0)
 
+    # Откат или завершение применения выделения, прерванного остановкой приложения
+    routine.recover_objects_directory(constants.OBJECTS_STAGING, constants.OBJECTS, constants.OBJECTS_BACKUP)
+
     # Деплой структуры веб-приложения
     if not deploy.application_structure():
         logger.error(f"Check sources of web-app!")
@@ -625,15 +940,14 @@ if __name__ == '__main__':
 
     # Запуск первоначального выделения интервалов, если в опциях не передан флаг на игнорирование
     if not args.ignore:
-        arguments = ["python", "./get_interval.py", "-s", args.path, "-d", os.getcwd(),
-                     "-c", os.path.join(os.getcwd(), constants.CONFIG)]
-        logger.info(' '.join(arguments))
+        logger.info(f"run_interval_detection({args.path})")
         try:
-            p_get_interval_init = subprocess.Popen(arguments, stdout=subprocess.PIPE,
-                                                   cwd=os.path.join(os.getcwd(), 'utils'))
-            p_get_interval_init.wait()
-        except subprocess.CalledProcessError as subprocess_exception:
-            logger.error(subprocess_exception)
+            get_interval.run_interval_detection(args.path, os.getcwd(), os.path.join(os.getcwd(), constants.CONFIG),
+                                                args.workers, job_dir=args.job_dir,
+                                                memory_budget=args.memory_budget * 2 ** 20, roll_csv=args.roll_csv,
+                                                chrome_trace=args.chrome_trace)
+        except OSError as os_error:
+            logger.error(os_error)
             exit(0)
         except RuntimeError as run_time_error:
             logger.error(run_time_error)
@@ -650,23 +964,26 @@ if __name__ == '__main__':
     with open(constants.WEB_API_URLS_JS, 'w') as write_file:
         write_file.write(str(api_file))
 
-    # Инициализируем объекты станций и количество групп для старта бэкенда на Flask
-    init_objects = list(config_path.keys())
-    init_object = init_objects[0]
-    init_group = 0
-    init_groups = config[init_object]['count_of_groups']
-    with open(os.path.join(config_path[init_object]['json_interval'], f'group_{init_group}.json'), 'r') as read_file:
-        init_json_interval = json.load(read_file)
-    init_intervals = [record['time'] for record in init_json_interval]
-    json_interval = init_json_interval
-
-    # Инициализируем pandas фреймы
-    slices_df = pd.read_csv(config_path[init_object]['slices'], parse_dates=['timestamp'], index_col=['timestamp'])
-    kks_with_groups = pd.read_csv(config_path[init_object]['kks_with_groups'], sep=';')
-    # Убираем Nan-ы в описании датчиков
-    kks_with_groups['name'].fillna(value='ОПИСАНИЯ НЕТ', inplace=True)
-    roll_df = pd.read_csv(os.path.join(config_path[init_object]['roll'], f'roll_{init_group}.csv'), parse_dates=['timestamp'], index_col=['timestamp'])
-    loss_df = pd.read_csv(os.path.join(config_path[init_object]['loss'], f'loss_{init_group}.csv'), parse_dates=['timestamp'], index_col=['timestamp'])
-
-    logger.info("started")
-    socketio.run(app, host=args.host, port=args.port)
+    # Событие отмены передается процессу выделения, sid запустившего выделение клиента хранится в общей памяти
+    context = multiprocessing.get_context('spawn')
+    detection_cancel = context.Event()
+    detection_owner = context.Array('c', 128)
+
+    # Несколько процессов веб-приложения: события Socket.IO доставляются через локальную очередь сообщений,
+    # выделение интервалов исключается общей блокировкой
+    if args.serve_workers > 1:
+        queue_authkey = os.urandom(16)
+        queue_address = serving.QueueRelay(queue_authkey).start()
+        detection_lock = context.Lock()
+        for worker in range(1, args.serve_workers):
+            serve_processes.append(context.Process(target=serve_worker,
+                                                   args=(args, config_path, worker, queue_address, queue_authkey,
+                                                         detection_lock, detection_cancel, detection_owner)))
+            serve_processes[-1].start()
+        serving.attach_queue(socketio.server, queue_address, queue_authkey)
+
+    try:
+        serve(args.port)
+    finally:
+        for process in serve_processes:
+            process.terminate()
@@ -37,7 +37,7 @@ def get_render_common_report(socketio: SocketIO, slices: DataFrame, roll: DataFr
     """
     Функция рендеринга отчета по всем интервалам группы
     :param socketio: объект сокета socketio для отсылки % выполнения рендера
-    :param slices: фрейм исходных данных срезов
+    :param slices: фрейм исходных данных срезов или ленивый фрейм срезов
     :param roll: фрейм сглаженных данных вероятности (предикта)
     :param loss: фрейм лосса
     :param kks_with_groups: фрейм kks, групп и описания датчиков
@@ -220,7 +220,7 @@ def get_render_interval_report(socketio: SocketIO, slices: DataFrame, roll: Data
     """
     Функция рендеринга отчета интервала
     :param socketio: объект сокета socketio для отсылки % выполнения рендера
-    :param slices: фрейм исходных данных срезов
+    :param slices: фрейм исходных данных срезов или ленивый фрейм срезов
     :param roll: фрейм сглаженных данных вероятности (предикта)
     :param kks_with_groups: фрейм kks, групп и описания датчиков
     :param tops: объект активных топовых датчиков и выбранных для многоосевых графиков сигналов
@@ -0,0 +1,61 @@
+"""
+Тесты дописывания npy файлов без перезаписи
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import utils.columnar_cache as columnar
+
+
+class AppendNpyTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temporary = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temporary.name, 'values.npy')
+
+    def tearDown(self) -> None:
+        self.temporary.cleanup()
+
+    def test_append(self) -> None:
+        """
+        Дописанный файл совпадает с объединением массивов, в том числе при росте заголовка длины
+        """
+        rng = np.random.default_rng(0)
+        expected = np.empty(0)
+        for rows in (0, 3, 100, 7, 50000, 1):
+            values = rng.random(rows)
+            columnar.append_npy(self.path, values)
+            expected = np.concatenate((expected, values))
+            np.testing.assert_array_equal(np.load(self.path), expected)
+            np.testing.assert_array_equal(np.load(self.path, mmap_mode='r'), expected)
+
+    def test_interrupted_append(self) -> None:
+        """
+        Строки за длиной из заголовка, оставшиеся от прерванного дописывания, отбрасываются
+        """
+        columnar.append_npy(self.path, np.arange(3.0))
+        with open(self.path, 'ab') as append_file:
+            append_file.write(b'\x00' * 12)
+        columnar.append_npy(self.path, np.array([5.0]))
+        np.testing.assert_array_equal(np.load(self.path), [0.0, 1.0, 2.0, 5.0])
+
+    def test_append_records(self) -> None:
+        """
+        Строки roll дописываются к записям write_records, другой тип массива не дописывается
+        """
+        roll_df = pd.DataFrame({'timestamp': pd.date_range('2024-01-01', periods=5, freq='min'),
+                                'target_value': np.arange(5.0)})
+        columnar.write_records(self.path, roll_df.iloc[:2])
+        columnar.append_records(self.path, roll_df.iloc[2:])
+        records = columnar.read_records(self.path)
+        np.testing.assert_array_equal(records['target_value'].to_numpy(), roll_df['target_value'].to_numpy())
+        np.testing.assert_array_equal(records.index.to_numpy(), roll_df['timestamp'].to_numpy())
+        with self.assertRaises(ValueError):
+            columnar.append_npy(self.path, np.zeros(2))
+
+
+if __name__ == '__main__':
+    unittest.main()
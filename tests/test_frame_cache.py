@@ -0,0 +1,141 @@
+"""
+Тесты LRU кэша фреймов: вытеснение в пределах бюджета, сброс по сигнатуре файлов, фоновая загрузка и перевод roll
+"""
+import os
+import json
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import utils.frame_cache as frame_cache
+
+
+class FrameCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temporary = tempfile.TemporaryDirectory()
+        self.directory = self.temporary.name
+        self.object_paths = {}
+        for artifact in ('roll', 'loss', 'loss_mean', 'json_interval'):
+            self.object_paths[artifact] = os.path.join(self.directory, artifact)
+            os.makedirs(self.object_paths[artifact])
+
+    def tearDown(self) -> None:
+        self.temporary.cleanup()
+
+    def write_source(self, name: str, text: str) -> str:
+        """
+        Функция записи исходного файла значения
+        :param name: имя файла
+        :param text: содержимое
+        :return: путь до файла
+        """
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as write_file:
+            write_file.write(text)
+        return path
+
+    def test_lru_eviction(self) -> None:
+        """
+        Сверх бюджета вытесняется давно не использованное значение
+        """
+        cache = frame_cache.FrameCache(budget=2 * 800)
+        for name in 'abc':
+            if name == 'c':
+                # a использовано последним, поэтому вытесняется b
+                cache.get(('obj', 'a', 'roll'), lambda: self.fail('a reloaded'), [])
+            cache.get(('obj', name, 'roll'), lambda: np.zeros(100), [])
+        self.assertTrue(cache.contains(('obj', 'a', 'roll')))
+        self.assertFalse(cache.contains(('obj', 'b', 'roll')))
+        self.assertTrue(cache.contains(('obj', 'c', 'roll')))
+        stats = cache.stats()
+        self.assertEqual((stats['entries'], stats['size'], stats['evictions']), (2, 1600, 1))
+        self.assertEqual((stats['hits'], stats['misses']), (1, 3))
+
+    def test_value_over_budget(self) -> None:
+        """
+        Значение больше бюджета возвращается, но не кэшируется и не вытесняет остальные
+        """
+        cache = frame_cache.FrameCache(budget=1000)
+        cache.get(('obj', 0, 'roll'), lambda: np.zeros(100), [])
+        self.assertEqual(len(cache.get(('obj', 1, 'roll'), lambda: np.zeros(1000), [])), 1000)
+        self.assertFalse(cache.contains(('obj', 1, 'roll')))
+        self.assertTrue(cache.contains(('obj', 0, 'roll')))
+
+    def test_signature_invalidation(self) -> None:
+        """
+        Значение перечитывается после изменения исходного файла
+        """
+        cache = frame_cache.FrameCache()
+        path = self.write_source('source.json', '[1]')
+        loaded = []
+
+        def loader() -> list:
+            with open(path, 'r') as read_file:
+                loaded.append(json.load(read_file))
+            return loaded[-1]
+
+        self.assertEqual(cache.get(('obj', 0, 'json_interval'), loader, [path]), [1])
+        self.assertEqual(cache.get(('obj', 0, 'json_interval'), loader, [path]), [1])
+        self.write_source('source.json', '[1, 2]')
+        self.assertEqual(cache.get(('obj', 0, 'json_interval'), loader, [path]), [1, 2])
+        self.assertEqual(len(loaded), 2)
+
+    def test_invalidate(self) -> None:
+        """
+        Сброс значений группы, объекта и всего кэша
+        """
+        cache = frame_cache.FrameCache()
+        for key in [('a', None, 'slices'), ('a', 0, 'roll'), ('a', 1, 'roll'), ('b', 0, 'roll')]:
+            cache.put(key, np.zeros(10), ())
+        self.assertEqual(cache.invalidate('a', 0), 1)
+        self.assertEqual(cache.invalidate('a'), 2)
+        self.assertTrue(cache.contains(('b', 0, 'roll')))
+        self.assertEqual(cache.invalidate(), 1)
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_prefetch_free_budget(self) -> None:
+        """
+        Фоновая загрузка занимает только свободную часть бюджета и не вытесняет значения
+        """
+        cache = frame_cache.FrameCache(budget=1000)
+        cache.put(('obj', 0, 'roll'), np.zeros(100), ())
+        self.assertFalse(cache.put(('obj', 1, 'roll'), np.zeros(100), (), prefetched=True))
+        self.assertTrue(cache.contains(('obj', 0, 'roll')))
+        self.assertEqual(cache.stats()['evictions'], 0)
+
+    def test_prefetch_ticket(self) -> None:
+        """
+        Фоновая загрузка прогревает группы, засчитывает попадания в них и отменяется новым билетом
+        """
+        for group in range(3):
+            with open(os.path.join(self.object_paths['json_interval'], f'group_{group}.json'), 'w') as write_file:
+                json.dump([{'group': group}], write_file)
+        cache = frame_cache.FrameCache()
+        items = [(self.object_paths, 'obj', group, 'json_interval') for group in range(3)]
+        stale = cache.cancel_prefetch()
+        cache.cancel_prefetch()
+        self.assertEqual(cache.prefetch(items, stale), 0)
+        self.assertEqual(cache.prefetch(items[:2], cache.cancel_prefetch()), 2)
+        self.assertEqual(cache.artifact(self.object_paths, 'obj', 1, 'json_interval'), [{'group': 1}])
+        stats = cache.stats()
+        self.assertEqual((stats['prefetched'], stats['prefetch_hits'], stats['misses']), (2, 1, 0))
+
+    def test_roll_csv_migration(self) -> None:
+        """
+        roll прежних версий в csv переводится в npy при первом чтении, повторное чтение берет npy
+        """
+        roll_df = pd.DataFrame({'timestamp': pd.date_range('2024-01-01', periods=5, freq='min'),
+                                'target_value': np.arange(5.0)})
+        roll_df.to_csv(os.path.join(self.object_paths['roll'], 'roll_0.csv'), index=False)
+        cache = frame_cache.FrameCache()
+        roll = cache.artifact(self.object_paths, 'obj', 0, 'roll')
+        self.assertTrue(os.path.isfile(os.path.join(self.object_paths['roll'], 'roll_0.npy')))
+        np.testing.assert_array_equal(roll['target_value'].to_numpy(), roll_df['target_value'].to_numpy())
+        np.testing.assert_array_equal(roll.index.to_numpy(), roll_df['timestamp'].to_numpy())
+        self.assertTrue(cache.artifact(self.object_paths, 'obj', 0, 'roll').equals(roll))
+
+
+if __name__ == '__main__':
+    unittest.main()
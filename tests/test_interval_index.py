@@ -0,0 +1,58 @@
+"""
+Тесты индекса интервалов: сравнение с полным перебором
+"""
+import unittest
+
+import numpy as np
+
+import utils.interval_index as interval_index
+
+
+def brute_force(idx_list: list, positions: np.ndarray) -> np.ndarray:
+    """
+    Функция попадания отсчетов в интервалы полным перебором
+    :param idx_list: список кортежей индексов интервалов [начало, конец)
+    :param positions: индексы отсчетов
+    :return: булев массив попадания
+    """
+    return np.array([any(start <= position < end for start, end in idx_list) for position in positions], dtype=bool)
+
+
+class IntervalIndexTest(unittest.TestCase):
+    def test_contains_many_matches_brute_force(self) -> None:
+        """
+        Векторизованная и поточечная проверки совпадают с перебором на пересекающихся и вложенных интервалах
+        """
+        rng = np.random.default_rng(0)
+        for _ in range(200):
+            starts = rng.integers(0, 100, rng.integers(0, 12))
+            idx_list = [(int(start), int(start + length)) for start, length in
+                        zip(starts, rng.integers(0, 30, len(starts)))]
+            positions = np.arange(-5, 140)
+            index = interval_index.build_interval_index(idx_list)
+            expected = brute_force(idx_list, positions)
+            np.testing.assert_array_equal(interval_index.index_contains_many(index, positions), expected)
+            self.assertEqual([interval_index.index_contains(index, int(position)) for position in positions],
+                             expected.tolist())
+            np.testing.assert_array_equal(interval_index.coverage_mask(idx_list, 140), expected[5:])
+
+    def test_empty_index(self) -> None:
+        """
+        Пустой индекс не содержит отсчетов
+        """
+        index = interval_index.build_interval_index([])
+        self.assertEqual(interval_index.index_contains_many(index, [0, 1, 2]).tolist(), [False] * 3)
+        self.assertFalse(interval_index.index_contains(index, 0))
+        self.assertEqual(interval_index.index_contains_many(index, []).tolist(), [])
+
+    def test_interval_end_excluded(self) -> None:
+        """
+        Конец интервала не входит в него, начало входит
+        """
+        index = interval_index.build_interval_index([(10, 20), (2, 5)])
+        self.assertEqual(interval_index.index_contains_many(index, [1, 2, 4, 5, 10, 19, 20]).tolist(),
+                         [False, True, True, False, True, True, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
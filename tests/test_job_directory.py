@@ -0,0 +1,118 @@
+"""
+Тесты общей директории заданий: захват, завершение и отмена запуска
+"""
+import os
+import time
+import tempfile
+import threading
+import unittest
+
+import utils.job_directory as jobs
+
+
+class JobDirectoryTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temporary = tempfile.TemporaryDirectory()
+        self.job_dir = self.temporary.name
+        jobs.open_run(self.job_dir)
+
+    def tearDown(self) -> None:
+        self.temporary.cleanup()
+
+    def test_claim_each_job_once(self) -> None:
+        """
+        Каждое задание захватывается ровно один раз, затем очередь пуста
+        """
+        names = {jobs.write_job(self.job_dir, {'object': 'obj', 'group': group}) for group in range(3)}
+        claimed = [jobs.claim_job(self.job_dir) for _ in range(3)]
+        self.assertEqual({name for name, _ in claimed}, names)
+        self.assertEqual(sorted(job['group'] for _, job in claimed), [0, 1, 2])
+        self.assertIsNone(jobs.claim_job(self.job_dir))
+        self.assertEqual(os.listdir(os.path.join(self.job_dir, jobs.JOBS_PENDING)), [])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.job_dir, jobs.JOBS_CLAIMED))), sorted(names))
+
+    def test_concurrent_claim(self) -> None:
+        """
+        Параллельные воркеры не захватывают одно задание дважды и не теряют заданий
+        """
+        for group in range(200):
+            jobs.write_job(self.job_dir, {'object': 'obj', 'group': group})
+        claimed, lock = [], threading.Lock()
+
+        def worker() -> None:
+            while True:
+                job = jobs.claim_job(self.job_dir)
+                if job is None:
+                    return
+                with lock:
+                    claimed.append(job[1]['group'])
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(claimed), list(range(200)))
+
+    def test_claim_without_run(self) -> None:
+        """
+        Без подготовленной директории захватывать нечего
+        """
+        with tempfile.TemporaryDirectory() as empty:
+            self.assertIsNone(jobs.claim_job(empty))
+            self.assertIsNone(jobs.read_state(empty))
+
+    def test_finish_and_collect(self) -> None:
+        """
+        Результат завершенного задания собирается один раз, дескриптор и прогресс удаляются
+        """
+        jobs.write_job(self.job_dir, {'object': 'obj', 'group': 0})
+        name, _ = jobs.claim_job(self.job_dir)
+        jobs.write_progress(self.job_dir, name, 'roll')
+        self.assertEqual(jobs.read_progress(self.job_dir), {name: 'roll'})
+        jobs.finish_job(self.job_dir, name, {'status': 'success'})
+        self.assertEqual(jobs.read_progress(self.job_dir), {})
+        self.assertEqual(os.listdir(os.path.join(self.job_dir, jobs.JOBS_CLAIMED)), [])
+        self.assertEqual(jobs.collect_results(self.job_dir), [(name, {'status': 'success'})])
+        self.assertEqual(jobs.collect_results(self.job_dir), [])
+
+    def test_requeue_stale(self) -> None:
+        """
+        Задание с истекшей арендой возвращается в очередь, продлеваемое и завершенное остаются на месте
+        """
+        for group in range(3):
+            jobs.write_job(self.job_dir, {'object': 'obj', 'group': group})
+        stale, alive, done = [jobs.claim_job(self.job_dir)[0] for _ in range(3)]
+        jobs.write_progress(self.job_dir, stale, 'roll')
+        jobs.write_json(os.path.join(self.job_dir, jobs.JOBS_DONE, done), {'status': 'success'})
+        past = time.time() - 10
+        for name in (stale, alive, done):
+            os.utime(os.path.join(self.job_dir, jobs.JOBS_CLAIMED, name), (past, past))
+        finished = threading.Event()
+        heartbeat = threading.Thread(target=jobs.keep_claim, args=(self.job_dir, alive, finished, 0.01))
+        heartbeat.start()
+        time.sleep(0.1)
+        self.assertEqual(jobs.requeue_stale(self.job_dir, lease=5), [stale])
+        finished.set()
+        heartbeat.join()
+        self.assertEqual(jobs.read_progress(self.job_dir), {})
+        self.assertEqual(jobs.claim_job(self.job_dir)[0], stale)
+        self.assertEqual(jobs.requeue_stale(self.job_dir, lease=5), [])
+
+    def test_cancel_flag(self) -> None:
+        """
+        Флаг отмены следует состоянию координатора, новый запуск его сбрасывает
+        """
+        cancel = jobs.CancelFlag(self.job_dir)
+        self.assertEqual(jobs.read_state(self.job_dir), jobs.STATE_RUNNING)
+        self.assertFalse(cancel.is_set())
+        jobs.set_state(self.job_dir, jobs.STATE_CANCELLED)
+        self.assertTrue(cancel.is_set())
+        jobs.write_job(self.job_dir, {'object': 'obj', 'group': 0})
+        jobs.open_run(self.job_dir)
+        self.assertFalse(cancel.is_set())
+        self.assertIsNone(jobs.claim_job(self.job_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
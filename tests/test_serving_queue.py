@@ -0,0 +1,94 @@
+"""
+Тесты локальной очереди сообщений Socket.IO: рассылка ретранслятором всем слушателям
+"""
+import os
+import time
+import threading
+import unittest
+
+import utils.serving_queue as serving_queue
+
+# Предельное время ожидания регистрации слушателей и доставки сообщений, с
+TIMEOUT = 5.0
+
+
+class QueueRelayTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.authkey = os.urandom(16)
+        self.relay = serving_queue.QueueRelay(self.authkey)
+        self.address = self.relay.start()
+        self.managers = [serving_queue.LocalQueueManager(self.address, self.authkey) for _ in range(3)]
+
+    def tearDown(self) -> None:
+        self.relay.listener.close()
+
+    def wait_listeners(self, count: int) -> None:
+        """
+        Процедура ожидания регистрации слушателей ретранслятором
+        :param count: количество слушателей
+        :return: None
+        """
+        deadline = time.monotonic() + TIMEOUT
+        while len(self.relay.listeners) < count:
+            self.assertLess(time.monotonic(), deadline, 'listeners are not registered')
+            time.sleep(0.01)
+
+    def receive(self, connection) -> object:
+        """
+        Функция получения сообщения слушателем с ограничением времени ожидания
+        :param connection: соединение слушателя
+        :return: сообщение
+        """
+        self.assertTrue(connection.poll(TIMEOUT), 'message is not delivered')
+        return connection.recv()
+
+    def test_fan_out(self) -> None:
+        """
+        Сообщение каждого издателя получают все слушатели, включая процесс издателя, в порядке публикации
+        """
+        listeners = [manager.connect(serving_queue.ROLE_LISTEN) for manager in self.managers]
+        self.wait_listeners(len(listeners))
+        first = {'method': 'emit', 'event': 'setPercentIntervalDetection', 'data': 42}
+        second = {'method': 'emit', 'event': 'setPercentIntervalDetection', 'data': 43}
+        self.managers[0]._publish(first)
+        self.managers[0]._publish(second)
+        for connection in listeners:
+            self.assertEqual([self.receive(connection), self.receive(connection)], [first, second])
+        self.managers[2]._publish(first)
+        for connection in listeners:
+            self.assertEqual(self.receive(connection), first)
+
+    def test_closed_listener_removed(self) -> None:
+        """
+        Завершившийся слушатель снимается с рассылки, остальные продолжают получать сообщения
+        """
+        closed, alive = [manager.connect(serving_queue.ROLE_LISTEN) for manager in self.managers[:2]]
+        self.wait_listeners(2)
+        closed.close()
+        deadline = time.monotonic() + TIMEOUT
+        while len(self.relay.listeners) > 1:
+            self.assertLess(time.monotonic(), deadline, 'closed listener is not removed')
+            self.managers[2]._publish({'method': 'emit'})
+            time.sleep(0.01)
+        self.managers[2]._publish({'method': 'emit', 'data': 'last'})
+        # Слушатель получает все пробные сообщения и за ними последнее
+        message = self.receive(alive)
+        while message == {'method': 'emit'}:
+            message = self.receive(alive)
+        self.assertEqual(message, {'method': 'emit', 'data': 'last'})
+
+    def test_listen_generator(self) -> None:
+        """
+        Генератор _listen менеджера отдает опубликованные сообщения
+        """
+        messages, received = self.managers[1]._listen(), []
+        thread = threading.Thread(target=lambda: received.append(next(messages)), daemon=True)
+        thread.start()
+        self.wait_listeners(1)
+        self.managers[0]._publish({'method': 'emit', 'data': 1})
+        thread.join(TIMEOUT)
+        self.assertEqual(received, [{'method': 'emit', 'data': 1}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,256 @@
+"""
+Модуль содержит бенчмарк этапов выделения интервалов на синтетическом testsuite с проверкой эталонных результатов
+"""
+import os
+import sys
+import time
+import json
+import hashlib
+import argparse
+import tempfile
+import yaml
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from typing import Dict, List, Callable, Any
+
+# Скрипт запускается из директории utils, добавляем корень приложения для импорта модулей utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.get_interval as get_interval
+import utils.interval_engine as engine
+import utils.columnar_cache as columnar
+import utils.correct_deploy as deploy
+import utils.synthetic_data as synthetic
+
+# Эталонные дайджесты интервалов групп синтетического testsuite размера по умолчанию
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_golden.json')
+
+# Этапы выделения интервалов группы в порядке выполнения
+BENCHMARK_STAGES = ('read', 'roll', 'zero_fill', 'get_interval', 'ranking', 'json_write')
+
+# Точность сравнения средних лосса с эталоном
+GOLDEN_DECIMALS = 9
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="start benchmark of interval detection")
+    parser.add_argument("-s", "--source", type=str, default=None,
+                        help="specify existing testsuite (directory with config_station.yaml and Archive), "
+                             "synthetic testsuite is generated by default")
+    parser.add_argument("-r", "--rows", type=int, default=20000, help="specify count of rows of synthetic data")
+    parser.add_argument("-n", "--sensors", type=int, default=10, help="specify count of sensors in group")
+    parser.add_argument("-g", "--groups", type=int, default=3, help="specify count of groups of object")
+    parser.add_argument("-b", "--objects", type=int, default=2, help="specify count of objects")
+    parser.add_argument("--repeat", type=int, default=3, help="specify count of repeats of each stage")
+    parser.add_argument("--reference", default=False, action="store_true",
+                        help="flag of check of numpy engine against reference python loop")
+    parser.add_argument("--update-golden", default=False, action="store_true",
+                        help="flag of rewrite of golden digests by current results")
+    return parser.parse_args()
+
+
+def timed(timings: Dict[str, List[float]], stage: str, repeat: int, function: Callable, *args) -> Any:
+    """
+    Функция замера этапа: лучшее время из repeat запусков
+    :param timings: словарь этап - список времен
+    :param stage: наименование этапа
+    :param repeat: количество запусков
+    :param function: функция этапа
+    :param args: аргументы функции
+    :return: результат последнего запуска
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    timings.setdefault(stage, []).append(best)
+    return result
+
+
+def group_digest(records: List[dict]) -> str:
+    """
+    Функция дайджеста интервалов группы: время, индексы, топ датчиков и округленные средние лосса
+    :param records: записи json интервалов группы
+    :return: строка sha1
+    """
+    normalized = [[list(record['time']), list(record['index']), record['top_sensors'],
+                   [round(value, GOLDEN_DECIMALS) for value in record['measurement']]] for record in records]
+    return hashlib.sha1(json.dumps(normalized).encode()).hexdigest()
+
+
+def benchmark_group(predict_path: str, loss_path: str, json_path: str, object_config: dict, post_processing: dict,
+                    power_low: np.ndarray, timings: Dict[str, List[float]], repeat: int = 3,
+                    reference: bool = False, power: pd.Series = None, columnar_cache_dir: str = None) -> List[dict]:
+    """
+    Функция замера этапов выделения интервалов одной группы
+    :param predict_path: путь до csv предикта
+    :param loss_path: путь до csv лосса
+    :param json_path: путь сохранения json интервалов
+    :param object_config: конфиг объекта
+    :param post_processing: параметры постобработки
+    :param power_low: маска низкой мощности (True - в окне есть мощность ниже отсечки)
+    :param timings: словарь этап - список времен
+    :param repeat: количество запусков каждого этапа
+    :param reference: сравнить интервалы numpy движка с эталонным циклом
+    :param power: серия мощности для эталонного цикла
+    :param columnar_cache_dir: директория поколоночного кэша csv (первый запуск чтения строит кэш)
+    :return: записи json интервалов группы
+    """
+    # Лосс читается блоками на этапе ранжирования, как при выделении
+    predict_df, loss_columns = timed(timings, 'read', repeat,
+                                     lambda: (columnar.read_frame(predict_path, columnar_cache_dir).reset_index(),
+                                              pd.Index(columnar.read_columns(loss_path, columnar_cache_dir))))
+
+    roll_df = timed(timings, 'roll', repeat, lambda: get_interval.rolling_probability(
+        predict_df.copy(), post_processing['roll_in_hours'], object_config['number_of_sample']))
+    target_value = roll_df['target_value'].to_numpy(dtype=float, copy=True)
+    target_value[np.isnan(target_value)] = 0
+    target_value = timed(timings, 'zero_fill', repeat, engine.fill_zero_runs, target_value,
+                         24 * object_config['number_of_sample'])
+
+    params = {
+        'threshold_short': post_processing['threshold_short'],
+        'threshold_long': post_processing['threshold_long'],
+        'len_long': post_processing['len_long'],
+        'len_short': post_processing['len_short'],
+        'count_continue_short': post_processing['count_continue_short'],
+        'count_continue_long': post_processing['count_continue_long']
+    }
+    _, idx_list, _ = timed(timings, 'get_interval', repeat, lambda: engine.get_interval(
+        target_value, power=None, power_limit=object_config['power_limit'], power_low=power_low,
+        **params))
+    if reference:
+        _, reference_idx, _ = get_interval.get_interval_reference(
+            pd.Series(target_value), power=power, power_limit=object_config['power_limit'],
+            left_power_shift=object_config['left_power_shift'],
+            right_power_shift=object_config['right_power_shift'], **params)
+        assert list(map(tuple, reference_idx)) == idx_list, f"{predict_path}: numpy engine differs from reference"
+
+    ranking, _ = timed(timings, 'ranking', repeat, lambda: engine.rank_top_sensors_chunked(
+        columnar.iter_chunks(loss_path, columnar_cache_dir), idx_list, post_processing['count_top']))
+    if reference:
+        loss_values = columnar.read_frame(loss_path, columnar_cache_dir).to_numpy(dtype=float)
+        for (top_index, top_mean), (expected_index, expected_mean) in zip(
+                ranking, engine.rank_top_sensors(loss_values, idx_list, post_processing['count_top'])):
+            assert np.array_equal(top_index, expected_index) and \
+                np.array_equal(top_mean, expected_mean, equal_nan=True), \
+                f"{loss_path}: chunked ranking differs from full matrix ranking"
+
+    timestamps = roll_df['timestamp']
+    records = [{
+        "time": (str(timestamps[j[0]]), str(timestamps[min(j[1], len(timestamps) - 1)])),
+        "len": j[1] - j[0],
+        "index": j,
+        "top_sensors": loss_columns[top_index].to_list(),
+        "measurement": top_mean.tolist()
+    } for j, (top_index, top_mean) in zip(idx_list, ranking)]
+
+    def write_json() -> None:
+        with open(json_path, 'w') as json_write:
+            json.dump(records, json_write, indent=4)
+    timed(timings, 'json_write', repeat, write_json)
+    return records
+
+
+def run_benchmark(testsuite: str, repeat: int = 3, reference: bool = False) -> Dict[str, Any]:
+    """
+    Функция бенчмарка этапов по всем группам testsuite и сквозного выделения get_interval.py
+    :param testsuite: директория testsuite с config_station.yaml, config_exp.yaml и Archive
+    :param repeat: количество запусков каждого этапа
+    :param reference: сравнить интервалы numpy движка с эталонным циклом
+    :return: словарь с таблицей времен этапов, временем сквозного выделения и дайджестами групп
+    """
+    with open(os.path.join(testsuite, 'config_station.yaml'), 'r') as read_file:
+        config_station = yaml.safe_load(read_file)
+    with open(os.path.join(testsuite, 'config_exp.yaml'), 'r') as read_file:
+        config_exp = yaml.safe_load(read_file)
+    config = deploy.application_create_config(config_station['Station'], config_exp, testsuite + os.sep)
+    source = os.path.join(testsuite, 'Archive')
+
+    timings = {}
+    digests = {}
+    with tempfile.TemporaryDirectory() as destination:
+        for object_name in sorted(os.listdir(source)):
+            object_config = config[object_name]
+            columnar_cache_dir = os.path.join(destination, get_interval.COLUMNAR_CACHE)
+            power, power_low = get_interval.load_object_power(object_config, columnar_cache_dir)
+            for group in range(object_config['count_of_groups']):
+                records = benchmark_group(
+                    os.path.join(source, object_name, 'csv_predict', f"predict_{group}.csv"),
+                    os.path.join(source, object_name, 'csv_loss', f"loss_{group}.csv"),
+                    os.path.join(destination, f"{object_name}_group_{group}.json"),
+                    object_config, config['post_processing'], power_low, timings, repeat, reference, power,
+                    columnar_cache_dir)
+                digests[f"{object_name}/{group}"] = group_digest(records)
+
+        # Сквозное выделение: результаты должны совпасть с поэтапным прогоном
+        config_path = os.path.join(destination, 'config.yaml')
+        with open(config_path, 'w') as write_file:
+            yaml.dump(config, write_file)
+        start = time.perf_counter()
+        get_interval.run_interval_detection(source, destination, config_path, force=True)
+        end_to_end = time.perf_counter() - start
+        for key in digests:
+            object_name, group = key.split('/')
+            with open(os.path.join(destination, 'objects', object_name, 'data', 'json_interval',
+                                   f"group_{group}.json"), 'r') as read_file:
+                assert group_digest(json.load(read_file)) == digests[key], f"{key}: detection differs from stages"
+
+    table = pd.DataFrame({stage: [sum(timings[stage]), float(np.mean(timings[stage]))]
+                          for stage in BENCHMARK_STAGES}, index=['total, s', 'per group, s']).T
+    return {'stages': table, 'end_to_end': end_to_end, 'digests': digests}
+
+
+def check_golden(digests: Dict[str, str], key: str, update: bool = False) -> bool:
+    """
+    Функция проверки дайджестов групп по эталону размера testsuite
+    :param digests: словарь группа - дайджест
+    :param key: ключ эталона (размер и зерно синтетического testsuite)
+    :param update: перезаписать эталон текущими дайджестами
+    :return: True если эталона нет или дайджесты совпали
+    """
+    try:
+        with open(GOLDEN, 'r') as read_file:
+            golden = json.load(read_file)
+    except OSError:
+        golden = {}
+    if update:
+        golden[key] = digests
+        with open(GOLDEN, 'w') as write_file:
+            json.dump(golden, write_file, indent=4, sort_keys=True)
+        logger.info(f"golden {key} updated")
+        return True
+    if key not in golden:
+        logger.warning(f"golden {key} not found, run with --update-golden")
+        return True
+    mismatched = [group for group, digest in digests.items() if golden[key].get(group) != digest]
+    for group in mismatched:
+        logger.error(f"golden mismatch: {group}")
+    return not mismatched
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        if args.source is None:
+            testsuite = os.path.join(directory, 'testsuite')
+            synthetic.generate_testsuite(testsuite, args.rows, args.sensors, args.groups, args.objects)
+            golden_key = f"rows={args.rows},sensors={args.sensors},groups={args.groups},objects={args.objects}"
+        else:
+            testsuite = os.path.abspath(args.source)
+            golden_key = None
+        result = run_benchmark(testsuite, args.repeat, args.reference)
+
+    logger.info(f"stages:\n{result['stages'].to_string(float_format='{:.4f}'.format)}")
+    logger.info(f"end to end get_interval: {result['end_to_end']:.3f} s")
+    if golden_key is not None and not check_golden(result['digests'], golden_key, args.update_golden):
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,521 @@
+"""
+Модуль содержит бинарный поколоночный кэш исходных csv (срезы, предикты, лоссы): индекс времени int64
+в наносекундах эпохи и числовые столбцы в отдельных npy файлах, которые можно отображать в память
+"""
+import os
+import io
+import json
+import shutil
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from typing import Union, Tuple, List, Dict, Iterator
+
+# Метаданные кэша: сигнатура исходного csv, столбцы и их файлы
+COLUMNAR_META = 'meta.json'
+# Файл индекса времени
+COLUMNAR_TIMESTAMP = 'timestamp.npy'
+# Суффикс метки csv, который не конвертируется в кэш: сигнатура csv и ошибка конвертации
+COLUMNAR_FAILED = '.failed.json'
+
+# Бюджет памяти потокового чтения csv по умолчанию, байт
+COLUMNAR_MEMORY_BUDGET = 256 * 2 ** 20
+# Во сколько раз промежуточные массивы обработки блока (разбор csv, маски Nan, накопленные суммы)
+# больше самого блока float64
+CHUNK_OVERHEAD = 10
+# Количество последних запрошенных столбцов, которые ленивый фрейм держит в памяти
+HOT_COLUMNS = 32
+
+
+def source_signature(source: str) -> Dict[str, int]:
+    """
+    Функция сигнатуры исходного csv: размер и время изменения
+    :param source: путь до csv
+    :return: словарь с размером и временем изменения файла в наносекундах
+    """
+    stat = os.stat(source)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def cache_path(source: str, cache_dir: str) -> str:
+    """
+    Функция директории кэша исходного csv
+    :param source: путь до csv
+    :param cache_dir: директория кэша
+    :return: путь до директории кэша csv
+    """
+    key = hashlib.sha1(os.path.abspath(source).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{os.path.splitext(os.path.basename(source))[0]}_{key}")
+
+
+def is_current(meta: Union[dict, None], signature: Dict[str, int]) -> bool:
+    """
+    Функция проверки соответствия метаданных кэша (или метки ошибки) сигнатуре исходного csv
+    :param meta: словарь метаданных или None
+    :param signature: сигнатура исходного csv
+    :return: True если размер и время изменения совпадают
+    """
+    return meta is not None and meta['size'] == signature['size'] and meta['mtime_ns'] == signature['mtime_ns']
+
+
+def read_failure(directory: str) -> Union[dict, None]:
+    """
+    Функция чтения метки ошибки конвертации csv
+    :param directory: директория кэша csv
+    :return: словарь с сигнатурой csv и ошибкой или None, если метки нет
+    """
+    try:
+        with open(f"{directory}{COLUMNAR_FAILED}", 'r') as read_file:
+            return json.load(read_file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_failure(directory: str, signature: Dict[str, int], error: str) -> None:
+    """
+    Процедура атомарной записи метки ошибки конвертации csv
+    :param directory: директория кэша csv
+    :param signature: сигнатура исходного csv
+    :param error: текст ошибки конвертации
+    :return: None
+    """
+    temporary = f"{directory}{COLUMNAR_FAILED}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary, 'w') as write_file:
+        json.dump({**signature, 'error': error}, write_file)
+    os.replace(temporary, f"{directory}{COLUMNAR_FAILED}")
+
+
+def read_meta(directory: str) -> Union[dict, None]:
+    """
+    Функция чтения метаданных кэша
+    :param directory: директория кэша csv
+    :return: словарь метаданных или None, если кэша нет или он поврежден
+    """
+    try:
+        with open(os.path.join(directory, COLUMNAR_META), 'r') as read_file:
+            return json.load(read_file)
+    except (OSError, ValueError):
+        return None
+
+
+def chunk_rows(columns: int, memory_budget: int = COLUMNAR_MEMORY_BUDGET) -> int:
+    """
+    Функция количества строк блока потокового чтения, при котором блок и его промежуточные массивы
+    укладываются в бюджет памяти
+    :param columns: количество столбцов
+    :param memory_budget: бюджет памяти в байтах
+    :return: количество строк блока
+    """
+    return max(memory_budget // (max(columns, 1) * np.dtype(np.float64).itemsize * CHUNK_OVERHEAD), 1)
+
+
+def storage_dtype(kinds: set, lossless_float32: bool) -> np.dtype:
+    """
+    Функция типа хранения столбца по типам его блоков: целые и булевы остаются такими, вещественные хранятся
+    в float32, если все значения представимы без потерь
+    :param kinds: множество видов типов numpy блоков столбца
+    :param lossless_float32: значения столбца совпадают со своим приведением к float32
+    :return: тип хранения
+    """
+    if kinds and kinds <= {'b'}:
+        return np.dtype(bool)
+    if kinds and kinds <= {'i', 'u', 'b'}:
+        return np.dtype(np.int64)
+    return np.dtype(np.float32 if lossless_float32 else np.float64)
+
+
+def write_npy(raw_path: str, path: str, rows: int, raw_dtype: np.dtype, dtype: np.dtype, block: int) -> None:
+    """
+    Процедура потоковой записи npy файла из сырого бинарного файла с приведением типа блоками
+    :param raw_path: путь до сырого файла значений
+    :param path: путь до npy файла
+    :param rows: количество значений
+    :param raw_dtype: тип значений сырого файла
+    :param dtype: тип значений npy файла
+    :param block: количество значений блока
+    :return: None
+    """
+    with open(raw_path, 'rb') as read_file, open(path, 'wb') as write_file:
+        np.lib.format.write_array_header_1_0(write_file, {'descr': np.lib.format.dtype_to_descr(dtype),
+                                                          'fortran_order': False, 'shape': (rows,)})
+        for _ in range(0, rows, block):
+            write_file.write(np.fromfile(read_file, dtype=raw_dtype, count=block).astype(dtype).tobytes())
+    os.remove(raw_path)
+
+
+def build(source: str, directory: str, memory_budget: int = COLUMNAR_MEMORY_BUDGET) -> dict:
+    """
+    Функция конвертации csv в поколоночный кэш: csv читается блоками строк в пределах бюджета памяти,
+    запись идет во временную директорию, которая затем переименовывается
+    :param source: путь до csv со столбцом timestamp и числовыми столбцами
+    :param directory: директория кэша csv
+    :param memory_budget: бюджет памяти конвертации в байтах
+    :return: словарь метаданных
+    """
+    logger.info(f"columnar_cache.build({source})")
+    signature = source_signature(source)
+    columns = pd.read_csv(source, nrows=0).columns.drop('timestamp').to_list()
+    meta = {'source': os.path.abspath(source), **signature, 'rows': 0,
+            'columns': {column: f"c{number}.npy" for number, column in enumerate(columns)}}
+    block = chunk_rows(len(columns) + 1, memory_budget)
+
+    # Кэш могут строить одновременно несколько процессов и потоков веб-приложения
+    temporary = f"{directory}.{os.getpid()}.{threading.get_ident()}.tmp"
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+    raw = {column: os.path.join(temporary, f"{meta['columns'][column]}.raw") for column in columns}
+    kinds = {column: set() for column in columns}
+    lossless_float32 = dict.fromkeys(columns, True)
+    try:
+        # Значения столбцов дописываются в сырые файлы как float64, тип хранения выбирается по всем блокам
+        with open(os.path.join(temporary, f"{COLUMNAR_TIMESTAMP}.raw"), 'wb') as timestamp_file:
+            for chunk in pd.read_csv(source, chunksize=block):
+                timestamp = pd.to_datetime(chunk['timestamp']).to_numpy(dtype='datetime64[ns]').view(np.int64)
+                timestamp_file.write(timestamp.tobytes())
+                for column in columns:
+                    values = chunk[column].to_numpy()
+                    if values.dtype.kind not in 'fiub':
+                        raise ValueError(f"{source}: column {column} is not numeric")
+                    kinds[column].add(values.dtype.kind)
+                    values = values.astype(np.float64)
+                    if lossless_float32[column]:
+                        lossless_float32[column] = np.array_equal(values.astype(np.float32), values,
+                                                                  equal_nan=True)
+                    with open(raw[column], 'ab') as raw_file:
+                        raw_file.write(values.tobytes())
+                meta['rows'] += len(chunk)
+
+        write_npy(os.path.join(temporary, f"{COLUMNAR_TIMESTAMP}.raw"), os.path.join(temporary, COLUMNAR_TIMESTAMP),
+                  meta['rows'], np.dtype(np.int64), np.dtype(np.int64), block)
+        for column in columns:
+            if not os.path.isfile(raw[column]):
+                open(raw[column], 'wb').close()
+            write_npy(raw[column], os.path.join(temporary, meta['columns'][column]), meta['rows'],
+                      np.dtype(np.float64), storage_dtype(kinds[column], lossless_float32[column]), block)
+        with open(os.path.join(temporary, COLUMNAR_META), 'w') as write_file:
+            json.dump(meta, write_file)
+    except Exception:
+        shutil.rmtree(temporary, ignore_errors=True)
+        raise
+
+    # Кэш той же версии csv мог построить параллельный процесс или поток: его файлы уже могут читать ленивые
+    # фреймы и отображения в память, поэтому актуальный кэш не заменяется
+    current = read_meta(directory)
+    if is_current(current, signature):
+        shutil.rmtree(temporary, ignore_errors=True)
+        return current
+
+    # Устаревший кэш убирается в сторону, чтобы переименование новой директории было атомарным
+    if os.path.isdir(directory):
+        stale = f"{directory}.{os.getpid()}.{threading.get_ident()}.stale"
+        os.rename(directory, stale)
+        shutil.rmtree(stale, ignore_errors=True)
+    try:
+        os.rename(temporary, directory)
+    except OSError:
+        # Кэш того же csv уже построен параллельным процессом
+        shutil.rmtree(temporary, ignore_errors=True)
+    return meta
+
+
+def ensure(source: str, cache_dir: str, memory_budget: int = COLUMNAR_MEMORY_BUDGET) -> Tuple[str, dict]:
+    """
+    Функция актуального кэша csv: строится заново, если размер или время изменения csv изменились.
+    Ошибка конвертации запоминается меткой, и та же версия csv повторно не разбирается
+    :param source: путь до csv
+    :param cache_dir: директория кэша
+    :param memory_budget: бюджет памяти конвертации в байтах
+    :return: кортеж из директории кэша csv и метаданных
+    """
+    directory = cache_path(source, cache_dir)
+    meta = read_meta(directory)
+    signature = source_signature(source)
+    if is_current(meta, signature):
+        return directory, meta
+    failure = read_failure(directory)
+    if is_current(failure, signature):
+        raise ValueError(failure['error'])
+    os.makedirs(cache_dir, exist_ok=True)
+    try:
+        meta = build(source, directory, memory_budget)
+    except ValueError as convert_error:
+        write_failure(directory, signature, str(convert_error))
+        raise
+    return directory, meta
+
+
+def ensure_or_none(source: str, cache_dir: Union[str, None],
+                   memory_budget: int = COLUMNAR_MEMORY_BUDGET) -> Union[Tuple[str, dict], None]:
+    """
+    Функция актуального кэша csv для читателей: None, если кэш не задан или csv не конвертируется
+    (есть не числовые столбцы), тогда читается сам csv
+    :param source: путь до csv
+    :param cache_dir: директория кэша
+    :param memory_budget: бюджет памяти конвертации в байтах
+    :return: кортеж из директории кэша csv и метаданных или None
+    """
+    if cache_dir is None:
+        return None
+    try:
+        return ensure(source, cache_dir, memory_budget)
+    except ValueError as convert_error:
+        logger.warning(convert_error)
+        return None
+
+
+def read_timestamps(source: str, cache_dir: str = None, mmap: bool = False) -> np.ndarray:
+    """
+    Функция чтения индекса времени csv через кэш
+    :param source: путь до csv
+    :param cache_dir: директория кэша, если None - столбец читается из csv
+    :param mmap: отобразить файл в память вместо чтения
+    :return: массив int64 наносекунд эпохи
+    """
+    cached = ensure_or_none(source, cache_dir)
+    if cached is None:
+        timestamp = pd.to_datetime(pd.read_csv(source, usecols=['timestamp'])['timestamp'])
+        return timestamp.to_numpy(dtype='datetime64[ns]').view(np.int64)
+    return np.load(os.path.join(cached[0], COLUMNAR_TIMESTAMP), mmap_mode='r' if mmap else None)
+
+
+def read_column(source: str, column: str, cache_dir: str = None, mmap: bool = False) -> np.ndarray:
+    """
+    Функция чтения одного столбца csv через кэш
+    :param source: путь до csv
+    :param column: наименование столбца
+    :param cache_dir: директория кэша, если None - столбец читается из csv
+    :param mmap: отобразить файл в память вместо чтения
+    :return: массив значений столбца
+    """
+    cached = ensure_or_none(source, cache_dir)
+    if cached is None:
+        return pd.read_csv(source, usecols=[column])[column].to_numpy()
+    directory, meta = cached
+    return np.load(os.path.join(directory, meta['columns'][column]), mmap_mode='r' if mmap else None)
+
+
+def read_frame(source: str, cache_dir: str = None, columns: List[str] = None, mmap: bool = False) -> pd.DataFrame:
+    """
+    Функция чтения csv через кэш во фрейм с индексом времени, как pd.read_csv(parse_dates=['timestamp'],
+    index_col=['timestamp'])
+    :param source: путь до csv
+    :param cache_dir: директория кэша, если None - читается csv
+    :param columns: читаемые столбцы, если None - все
+    :param mmap: отобразить файлы в память вместо чтения (столбцы фрейма только для чтения)
+    :return: фрейм с индексом timestamp
+    """
+    cached = ensure_or_none(source, cache_dir)
+    if cached is None:
+        usecols = None if columns is None else ['timestamp'] + list(columns)
+        return pd.read_csv(source, usecols=usecols, parse_dates=['timestamp'], index_col=['timestamp'])
+    directory, meta = cached
+    mmap_mode = 'r' if mmap else None
+    index = pd.DatetimeIndex(np.load(os.path.join(directory, COLUMNAR_TIMESTAMP),
+                                     mmap_mode=mmap_mode).view('datetime64[ns]'), name='timestamp')
+    columns = list(meta['columns']) if columns is None else list(columns)
+    data = {column: np.load(os.path.join(directory, meta['columns'][column]), mmap_mode=mmap_mode)
+            for column in columns}
+    return pd.DataFrame(data, index=index, columns=columns, copy=not mmap)
+
+
+def read_columns(source: str, cache_dir: str = None) -> List[str]:
+    """
+    Функция списка числовых столбцов csv (без timestamp) через кэш
+    :param source: путь до csv
+    :param cache_dir: директория кэша, если None - читается заголовок csv
+    :return: список наименований столбцов
+    """
+    cached = ensure_or_none(source, cache_dir)
+    if cached is None:
+        return pd.read_csv(source, nrows=0).columns.drop('timestamp').to_list()
+    return list(cached[1]['columns'])
+
+
+def iter_chunks(source: str, cache_dir: str = None,
+                memory_budget: int = COLUMNAR_MEMORY_BUDGET) -> Iterator[np.ndarray]:
+    """
+    Генератор блоков строк числовых столбцов csv в пределах бюджета памяти: из кэша файлы столбцов
+    отображаются в память только на время копирования блока, без кэша csv читается блоками
+    :param source: путь до csv
+    :param cache_dir: директория кэша, если None - читается csv
+    :param memory_budget: бюджет памяти в байтах
+    :return: матрицы блоков (строки x столбцы) в общем типе хранения столбцов
+    """
+    cached = ensure_or_none(source, cache_dir, memory_budget)
+    if cached is None:
+        columns = read_columns(source)
+        for chunk in pd.read_csv(source, chunksize=chunk_rows(len(columns) + 1, memory_budget)):
+            yield chunk[columns].to_numpy()
+        return
+
+    directory, meta = cached
+    paths = [os.path.join(directory, name) for name in meta['columns'].values()]
+    block = chunk_rows(len(paths), memory_budget)
+    for begin in range(0, meta['rows'], block):
+        mapped = [np.load(path, mmap_mode='r') for path in paths]
+        chunk = np.empty((min(block, meta['rows'] - begin), len(paths)),
+                         dtype=np.result_type(*mapped) if mapped else np.float64)
+        for number, values in enumerate(mapped):
+            chunk[:, number] = values[begin:begin + block]
+        del mapped
+        yield chunk
+
+
+def frame_records(frame: pd.DataFrame) -> np.ndarray:
+    """
+    Функция массива структурного типа из фрейма со столбцом timestamp (время в наносекундах эпохи int64)
+    :param frame: фрейм со столбцом timestamp
+    :return: массив записей
+    """
+    columns = frame.columns.drop('timestamp')
+    records = np.empty(len(frame), dtype=[('timestamp', np.int64)] +
+                                         [(column, frame[column].to_numpy().dtype) for column in columns])
+    records['timestamp'] = pd.to_datetime(frame['timestamp']).to_numpy(dtype='datetime64[ns]').view(np.int64)
+    for column in columns:
+        records[column] = frame[column].to_numpy()
+    return records
+
+
+def write_records(path: str, frame: pd.DataFrame) -> None:
+    """
+    Процедура записи фрейма со столбцом timestamp и числовыми столбцами в один npy файл структурного типа
+    (время в наносекундах эпохи int64), который читается без разбора текста и отображается в память
+    :param path: путь до npy файла (для атомарной замены - временный путь)
+    :param frame: фрейм со столбцом timestamp
+    :return: None
+    """
+    with open(path, 'wb') as write_file:
+        np.save(write_file, frame_records(frame))
+
+
+def append_npy(path: str, array: np.ndarray) -> None:
+    """
+    Процедура дописывания одномерного массива в конец npy файла без его перезаписи: данные дописываются
+    после строк, указанных в заголовке, затем на месте переписывается длина в заголовке. Если заголовок
+    новой длины не помещается в прежний, файл переписывается целиком с атомарной заменой
+    :param path: путь до npy файла, если его нет - он создается
+    :param array: одномерный массив того же типа, что и в файле
+    :return: None
+    """
+    if not os.path.isfile(path):
+        with open(f"{path}.{os.getpid()}.tmp", 'wb') as write_file:
+            np.save(write_file, array)
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+        return
+
+    with open(path, 'r+b') as append_file:
+        version = np.lib.format.read_magic(append_file)
+        read_header, write_header = (np.lib.format.read_array_header_1_0, np.lib.format.write_array_header_1_0) \
+            if version == (1, 0) else (np.lib.format.read_array_header_2_0, np.lib.format.write_array_header_2_0)
+        shape, fortran_order, dtype = read_header(append_file)
+        if len(shape) != 1 or dtype != array.dtype:
+            raise ValueError(f"{path}: {dtype}{shape} can not be appended with {array.dtype}")
+        data_offset = append_file.tell()
+        header = io.BytesIO()
+        write_header(header, {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': fortran_order,
+                              'shape': (shape[0] + len(array),)})
+        if len(header.getvalue()) == data_offset:
+            # Строки за длиной из заголовка остались от прерванного дописывания и отбрасываются
+            append_file.seek(data_offset + shape[0] * dtype.itemsize)
+            append_file.truncate()
+            append_file.write(np.ascontiguousarray(array).tobytes())
+            append_file.flush()
+            append_file.seek(0)
+            append_file.write(header.getvalue())
+            return
+
+    existing = np.load(path)
+    with open(f"{path}.{os.getpid()}.tmp", 'wb') as write_file:
+        np.save(write_file, np.concatenate((existing, array)))
+    os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+
+def append_records(path: str, frame: pd.DataFrame) -> None:
+    """
+    Процедура дописывания строк фрейма со столбцом timestamp в npy файл write_records без его перезаписи
+    :param path: путь до npy файла
+    :param frame: фрейм со столбцом timestamp
+    :return: None
+    """
+    append_npy(path, frame_records(frame))
+
+
+def read_records(path: str, mmap: bool = False) -> pd.DataFrame:
+    """
+    Функция чтения npy файла write_records во фрейм с индексом времени
+    :param path: путь до npy файла
+    :param mmap: отобразить файл в память вместо чтения (столбцы фрейма только для чтения)
+    :return: фрейм с индексом timestamp
+    """
+    records = np.load(path, mmap_mode='r' if mmap else None)
+    index = pd.DatetimeIndex(np.asarray(records['timestamp']).view('datetime64[ns]'), name='timestamp')
+    columns = [column for column in records.dtype.names if column != 'timestamp']
+    return pd.DataFrame({column: records[column] for column in columns}, index=index, columns=columns,
+                        copy=not mmap)
+
+
+class ColumnarFrame:
+    """
+    Ленивый фрейм csv через кэш: при создании читается только индекс времени, столбцы читаются по запросу
+    и в памяти остаются hot_columns последних запрошенных. Выборка frame[kks] или frame[[kks, ...]]
+    возвращает серию или фрейм с индексом timestamp, как у read_frame. Если mmap, столбцы отображаются
+    в память и их страницы общие для всех процессов, читающих тот же кэш
+    """
+    def __init__(self, source: str, cache_dir: str = None, hot_columns: int = HOT_COLUMNS,
+                 mmap: bool = False) -> None:
+        self.source = source
+        self.cache_dir = cache_dir
+        self.hot_columns = hot_columns
+        self.mmap = mmap
+        self.cached = ensure_or_none(source, cache_dir)
+        self.index = pd.DatetimeIndex(read_timestamps(source, cache_dir).view('datetime64[ns]'), name='timestamp')
+        self.columns = pd.Index(read_columns(source, cache_dir))
+        self.hot = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, key: Union[str, List[str]]) -> Union[pd.Series, pd.DataFrame]:
+        if isinstance(key, str):
+            return pd.Series(self.column(key), index=self.index, name=key)
+        return pd.DataFrame({column: self.column(column) for column in key}, index=self.index, columns=list(key))
+
+    @property
+    def capacity(self) -> int:
+        """
+        Наибольший размер фрейма в памяти: индекс и hot_columns столбцов float64
+        :return: размер в байтах
+        """
+        return self.index.nbytes * (1 + self.hot_columns)
+
+    def column(self, column: str) -> np.ndarray:
+        """
+        Функция значений столбца: из памяти, если он запрашивался недавно, иначе из кэша
+        :param column: наименование столбца
+        :return: массив значений столбца (только для чтения)
+        """
+        with self.lock:
+            values = self.hot.get(column)
+            if values is not None:
+                self.hot.move_to_end(column)
+                return values
+        if column not in self.columns:
+            raise KeyError(column)
+        if self.cached is None:
+            values = read_column(self.source, column)
+        else:
+            directory, meta = self.cached
+            values = np.load(os.path.join(directory, meta['columns'][column]), mmap_mode='r' if self.mmap else None)
+        values.flags.writeable = False
+        with self.lock:
+            self.hot[column] = values
+            while len(self.hot) > self.hot_columns:
+                self.hot.popitem(last=False)
+        return values
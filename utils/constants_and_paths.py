@@ -11,6 +11,10 @@ CONFIG_EXP = f'config_exp.yaml'
 DATA_DIRECTORY = f'data{os.sep}'
 DATA_CSV_ROLLED = f'{DATA_DIRECTORY}csv_roll{os.sep}'
 DATA_JSON_INTERVAL = f'{DATA_DIRECTORY}json_interval{os.sep}'
+DATA_LOSS_MEAN = f'{DATA_DIRECTORY}loss_mean{os.sep}'
+DATA_ROLL_CACHE = f'{DATA_DIRECTORY}cache{os.sep}'
+
+COLUMNAR_CACHE = f'columnar{os.sep}'
 
 JINJA = f'jinja{os.sep}'
 
@@ -33,6 +37,8 @@ JINJA_TEMPLATE_SOURCE_FOOTER = f'{JINJA_TEMPLATE_SOURCE}footer.html'
 
 OBJECTS = f'objects{os.sep}'
 OBJECTS_BACKUP = f'objects_backup{os.sep}'
+# Директория выделения интервалов, применяемая к директории объектов переименованием
+OBJECTS_STAGING = f'objects_staging{os.sep}'
 
 PALETTE = {
     "main": '#1f77b4',
@@ -116,6 +116,8 @@ def application_create_config(config_station: dict, config_experiment: dict, tes
             'data': os.path.join(testsuite_path, station_data['data']),
             'power_index': station_data['power_index'],
             'power_limit': station_data['power_limit'],
+            'left_power_shift': station_data.get('left_power_shift', 15),
+            'right_power_shift': station_data.get('right_power_shift', 15),
             'number_of_sample': station_data['number_of_sample'],
             'count_of_groups': validate_count_of_groups(os.path.join(testsuite_path, station_data['kks']))
         }
@@ -152,6 +154,8 @@ def application_create_path_dict(config: dict, name: str, data: dict, testsuite_
         'loss': os.path.join(archive_path, name, 'csv_loss'),
         'roll': os.path.join(constants.OBJECTS, name, constants.DATA_CSV_ROLLED),
         'json_interval': os.path.join(constants.OBJECTS, name, constants.DATA_JSON_INTERVAL),
+        'loss_mean': os.path.join(constants.OBJECTS, name, constants.DATA_LOSS_MEAN),
+        'roll_cache': os.path.join(constants.OBJECTS, name, constants.DATA_ROLL_CACHE),
         'reports': os.path.join(constants.OBJECTS, name, constants.REPORTS_DIRECTORY)
     }
 
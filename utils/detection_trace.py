@@ -0,0 +1,195 @@
+"""
+Модуль содержит трассировку выделения интервалов: время и пик памяти по группам и этапам, экспорт в формат
+Chrome trace (chrome://tracing, Perfetto)
+"""
+import os
+import time
+import json
+import threading
+
+from contextlib import contextmanager
+
+from typing import Union, List, Dict, Iterator
+
+try:
+    import resource
+except ImportError:
+    # Пик памяти процесса на Windows не отслеживается
+    resource = None
+
+# Трасса последнего выделения в директории результатов и ее экспорт в формат Chrome trace
+TRACE = 'trace.json'
+TRACE_CHROME = 'trace.chrome.json'
+
+# Текущая резидентная память процесса (Linux) и период ее опроса во время этапа, с
+PROC_STATM = '/proc/self/statm'
+RSS_SAMPLE_INTERVAL = 0.01
+
+
+def peak_rss() -> Union[int, None]:
+    """
+    Функция пика резидентной памяти процесса за все время его работы (не уменьшается между этапами)
+    :return: пик памяти в байтах или None, если платформа его не сообщает
+    """
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def current_rss() -> Union[int, None]:
+    """
+    Функция текущей резидентной памяти процесса
+    :return: память в байтах или None, если платформа ее не сообщает
+    """
+    try:
+        with open(PROC_STATM, 'r') as read_file:
+            return int(read_file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class RssSampler:
+    """
+    Опрос текущей резидентной памяти процесса в фоновом потоке: максимум за время работы - пик этапа
+    """
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        """
+        :param interval: период опроса, с
+        """
+        self.interval = interval
+        self.start_rss = current_rss()
+        self.peak = self.start_rss
+        self.stopped = threading.Event()
+        self.thread = None
+        if self.start_rss is not None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def sample(self) -> None:
+        """
+        Процедура обновления пика текущей памятью
+        :return: None
+        """
+        rss = current_rss()
+        if rss is not None and rss > self.peak:
+            self.peak = rss
+
+    def run(self) -> None:
+        """
+        Процедура фонового опроса до остановки
+        :return: None
+        """
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self) -> Union[int, None]:
+        """
+        Функция остановки опроса
+        :return: пик памяти за время опроса в байтах или None, если платформа ее не сообщает
+        """
+        if self.thread is None:
+            return None
+        self.stopped.set()
+        self.thread.join()
+        self.sample()
+        return self.peak
+
+
+@contextmanager
+def traced(trace: Union[List[dict], None], stage: str) -> Iterator[None]:
+    """
+    Контекст замера этапа: время начала, длительность, пик резидентной памяти процесса за время этапа и его
+    прирост к памяти на начале этапа (опрос RssSampler, пики малой длительности между опросами не видны)
+    :param trace: список этапов группы, если None - этап не замеряется
+    :param stage: наименование этапа
+    :return: None
+    """
+    if trace is None:
+        yield
+        return
+    start, sampler = time.time(), RssSampler()
+    begin = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - begin
+        peak = sampler.stop()
+        trace.append({
+            'stage': stage,
+            'start': start,
+            'duration': duration,
+            'peak_rss': peak,
+            'peak_rss_growth': peak - sampler.start_rss if peak is not None else None
+        })
+
+
+def group_trace(object_name: str, group: int, stages: List[dict]) -> Dict[str, Union[str, int, float, list]]:
+    """
+    Функция трассы группы по ее этапам
+    :param object_name: наименование объекта
+    :param group: номер группы
+    :param stages: список этапов traced
+    :return: словарь трассы группы: объект, группа, процесс, начало, длительность, пик памяти и этапы
+    """
+    start = min((stage['start'] for stage in stages), default=time.time())
+    end = max((stage['start'] + stage['duration'] for stage in stages), default=start)
+    return {
+        'object': object_name,
+        'group': group,
+        'pid': os.getpid(),
+        'start': start,
+        'duration': end - start,
+        'peak_rss': max((stage['peak_rss'] for stage in stages if stage['peak_rss'] is not None), default=None),
+        'stages': stages
+    }
+
+
+def chrome_trace(trace: dict) -> Dict[str, list]:
+    """
+    Функция экспорта трассы выделения в формат Chrome trace: группы и этапы - завершенные события процессов
+    :param trace: словарь трассы выделения
+    :return: словарь с traceEvents
+    """
+    events = []
+    for group in trace['groups']:
+        name = f"{group['object']}/{group['group']}"
+        events.append({'name': name, 'cat': 'group', 'ph': 'X', 'pid': group['pid'], 'tid': group['pid'],
+                       'ts': group['start'] * 1e6, 'dur': group['duration'] * 1e6,
+                       'args': {'peak_rss': group['peak_rss']}})
+        for stage in group['stages']:
+            events.append({'name': stage['stage'], 'cat': name, 'ph': 'X', 'pid': group['pid'], 'tid': group['pid'],
+                           'ts': stage['start'] * 1e6, 'dur': stage['duration'] * 1e6,
+                           'args': {'peak_rss': stage['peak_rss'], 'peak_rss_growth': stage['peak_rss_growth']}})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def write_trace(destination: str, trace: dict, chrome: bool = False) -> None:
+    """
+    Процедура атомарной записи трассы выделения в директорию результатов
+    :param destination: директория результатов выделения
+    :param trace: словарь трассы выделения
+    :param chrome: дополнительно записать трассу в формате Chrome trace
+    :return: None
+    """
+    files = {TRACE: trace}
+    if chrome:
+        files[TRACE_CHROME] = chrome_trace(trace)
+    for name, data in files.items():
+        path = os.path.join(destination, name)
+        with open(f"{path}.{os.getpid()}.tmp", 'w') as write_file:
+            json.dump(data, write_file, indent=4)
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+
+def read_trace(destination: str) -> Union[dict, None]:
+    """
+    Функция чтения трассы последнего выделения
+    :param destination: директория результатов выделения
+    :return: словарь трассы или None, если трассы нет
+    """
+    try:
+        with open(os.path.join(destination, TRACE), 'r') as read_file:
+            return json.load(read_file)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,316 @@
+"""
+Модуль содержит LRU кэш фреймов объектов и групп веб-приложения с бюджетом памяти: срезы, kks с группами, roll,
+лосс, средний лосс и json интервалы по ключу (объект, группа, артефакт)
+"""
+import os
+import json
+import threading
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+import utils.columnar_cache as columnar
+import utils.routine_operations as routine
+import utils.constants_and_paths as constants
+
+# Бюджет памяти кэша фреймов по умолчанию
+FRAME_CACHE_BUDGET = 1024 * 2 ** 20
+
+# Артефакты объекта, общие для всех его групп, хранятся под группой None
+OBJECT_ARTIFACTS = ('slices', 'kks_with_groups')
+GROUP_ARTIFACTS = ('roll', 'loss', 'loss_mean', 'json_interval')
+
+# Артефакты, которые фоновая загрузка прогревает для соседних групп
+PREFETCH_ARTIFACTS = ('roll', 'loss', 'json_interval')
+
+
+def value_size(value: Any) -> int:
+    """
+    Функция оценки занимаемой значением памяти
+    :param value: фрейм, серия, массив или json объект
+    :return: размер в байтах
+    """
+    if value is None:
+        return 0
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, columnar.ColumnarFrame):
+        return value.capacity
+    # json объекты в памяти занимают порядка нескольких размеров своей сериализации
+    return 4 * len(json.dumps(value, default=str))
+
+
+def file_signature(paths: List[str]) -> Tuple[Union[Tuple[int, int], None], ...]:
+    """
+    Функция сигнатуры исходных файлов значения: размер и время изменения, None - файла нет
+    :param paths: список путей исходных файлов
+    :return: кортеж сигнатур файлов
+    """
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            signature.append(None)
+            continue
+        signature.append((stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+def artifact_sources(object_paths: Dict[str, str], group: Union[int, None], artifact: str) -> List[str]:
+    """
+    Функция путей исходных файлов артефакта, по сигнатуре которых проверяется актуальность кэша
+    :param object_paths: словарь путей объекта из config_path
+    :param group: номер группы, None для артефактов объекта
+    :param artifact: наименование артефакта
+    :return: список путей исходных файлов
+    """
+    if artifact in OBJECT_ARTIFACTS:
+        return [object_paths[artifact]]
+    loss = os.path.join(object_paths['loss'], f'loss_{group}.csv')
+    return {
+        # roll прежних версий хранился в csv, он переводится в npy при первом чтении
+        'roll': [os.path.join(object_paths['roll'], f'roll_{group}.npy'),
+                 os.path.join(object_paths['roll'], f'roll_{group}.csv')],
+        'loss': [loss],
+        'loss_mean': [os.path.join(object_paths['loss_mean'], f'loss_mean_{group}.npy'), loss],
+        'json_interval': [os.path.join(object_paths['json_interval'], f'group_{group}.json')]
+    }[artifact]
+
+
+def migrate_roll(roll_csv: str, roll_npy: str) -> None:
+    """
+    Процедура однократного перевода roll группы из csv прежних версий в бинарный npy с атомарной заменой
+    :param roll_csv: путь до csv roll
+    :param roll_npy: путь до npy roll
+    :return: None
+    """
+    logger.info(f"migrate_roll({roll_csv})")
+    roll_df = pd.read_csv(roll_csv, parse_dates=['timestamp'])
+    temporary = f"{roll_npy}.{os.getpid()}.{threading.get_ident()}.tmp"
+    columnar.write_records(temporary, roll_df)
+    os.replace(temporary, roll_npy)
+
+
+def load_artifact(object_paths: Dict[str, str], group: Union[int, None], artifact: str, mmap: bool = False) -> Any:
+    """
+    Функция чтения артефакта объекта или группы с диска
+    :param object_paths: словарь путей объекта из config_path
+    :param group: номер группы, None для артефактов объекта
+    :param artifact: наименование артефакта
+    :param mmap: отобразить числовые столбцы в память только для чтения вместо чтения
+    :return: фрейм (срезы - ленивый фрейм), массив среднего лосса (None, если он не актуален) или json интервалы
+    """
+    sources = artifact_sources(object_paths, group, artifact)
+    if artifact == 'slices':
+        # Срезы читаются по столбцам по запросу: графики и отчеты используют единицы датчиков объекта
+        return columnar.ColumnarFrame(sources[0], constants.COLUMNAR_CACHE, mmap=mmap)
+    if artifact == 'kks_with_groups':
+        kks_with_groups = pd.read_csv(sources[0], sep=';')
+        # Убираем Nan-ы в описании датчиков
+        kks_with_groups['name'] = kks_with_groups['name'].fillna(value='ОПИСАНИЯ НЕТ')
+        return kks_with_groups
+    if artifact == 'roll':
+        if not os.path.isfile(sources[0]) and os.path.isfile(sources[1]):
+            migrate_roll(sources[1], sources[0])
+        return columnar.read_records(sources[0], mmap=mmap)
+    if artifact == 'loss':
+        return columnar.read_frame(sources[0], constants.COLUMNAR_CACHE, mmap=mmap)
+    if artifact == 'loss_mean':
+        return routine.read_loss_mean(*sources, mmap=mmap)
+    with open(sources[0], 'r') as read_file:
+        return json.load(read_file)
+
+
+class FrameCache:
+    """
+    Потокобезопасный LRU кэш значений по ключу (объект, группа, артефакт) с бюджетом памяти. Значение
+    перечитывается, если изменилась сигнатура его исходных файлов. Кэшированные фреймы общие для всех
+    обработчиков и не изменяются ими. Фоновая загрузка занимает только свободную часть бюджета и
+    отменяется следующей загрузкой. Если mmap, числовые фреймы отображают файлы в память только для чтения,
+    и процессы веб-приложения делят одни и те же страницы
+    """
+    def __init__(self, budget: int = FRAME_CACHE_BUDGET, mmap: bool = False) -> None:
+        self.budget = budget
+        self.mmap = mmap
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.prefetched = 0
+        self.prefetch_hits = 0
+        self.prefetch_ticket = 0
+        self.lock = threading.RLock()
+
+    def get(self, key: Tuple[str, Union[int, None], str], loader: Callable[[], Any], sources: List[str]) -> Any:
+        """
+        Функция значения из кэша или загрузки при промахе
+        :param key: ключ (объект, группа, артефакт)
+        :param loader: функция загрузки значения
+        :param sources: пути исходных файлов значения
+        :return: значение
+        """
+        signature = file_signature(sources)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry['signature'] == signature:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                if entry.pop('prefetched', False):
+                    self.prefetch_hits += 1
+                return entry['value']
+            self.misses += 1
+        value = loader()
+        self.put(key, value, signature)
+        return value
+
+    def put(self, key: Tuple[str, Union[int, None], str], value: Any, signature: tuple,
+            prefetched: bool = False) -> bool:
+        """
+        Функция добавления значения с вытеснением давно не использованных значений сверх бюджета
+        :param key: ключ (объект, группа, артефакт)
+        :param value: значение
+        :param signature: сигнатура исходных файлов значения
+        :param prefetched: значение фоновой загрузки - добавляется только в свободную часть бюджета
+        :return: True если значение добавлено
+        """
+        size = value_size(value)
+        with self.lock:
+            self.discard(key)
+            # Значение больше бюджета не кэшируется и не вытесняет остальные
+            if size > self.budget:
+                logger.warning(f"{key} ({size} bytes) exceeds frame cache budget")
+                return False
+            if prefetched and self.size + size > self.budget:
+                return False
+            while self.entries and self.size + size > self.budget:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted['size']
+                self.evictions += 1
+            self.entries[key] = {'value': value, 'size': size, 'signature': signature, 'prefetched': prefetched}
+            self.size += size
+            return True
+
+    def discard(self, key: Tuple[str, Union[int, None], str]) -> None:
+        """
+        Процедура удаления значения из кэша
+        :param key: ключ (объект, группа, артефакт)
+        :return: None
+        """
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.size -= entry['size']
+
+    def contains(self, key: Tuple[str, Union[int, None], str]) -> bool:
+        """
+        Функция проверки наличия значения в кэше без учета его использования
+        :param key: ключ (объект, группа, артефакт)
+        :return: True если значение в кэше
+        """
+        with self.lock:
+            return key in self.entries
+
+    def invalidate(self, object_name: str = None, group: int = None) -> int:
+        """
+        Функция сброса значений объекта, группы или всего кэша
+        :param object_name: объект, None - все объекты
+        :param group: группа, None - все группы и артефакты объекта
+        :return: количество сброшенных значений
+        """
+        with self.lock:
+            keys = [key for key in self.entries if (object_name is None or key[0] == object_name) and
+                    (group is None or key[1] == group)]
+            for key in keys:
+                self.discard(key)
+        return len(keys)
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """
+        Функция статистики кэша
+        :return: словарь: количество значений, занятая память и бюджет, попадания, промахи, вытеснения, доля
+        попаданий, загруженные в фоне значения и попадания в них
+        """
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'size': self.size,
+                'budget': self.budget,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'prefetched': self.prefetched,
+                'prefetch_hits': self.prefetch_hits
+            }
+
+    def artifact(self, object_paths: Dict[str, str], object_name: str, group: Union[int, None], artifact: str) -> Any:
+        """
+        Функция артефакта объекта или группы через кэш
+        :param object_paths: словарь путей объекта из config_path
+        :param object_name: наименование объекта
+        :param group: номер группы, для артефактов объекта не учитывается
+        :param artifact: наименование артефакта
+        :return: значение артефакта
+        """
+        group = None if artifact in OBJECT_ARTIFACTS else group
+        return self.get((object_name, group, artifact), lambda: load_artifact(object_paths, group, artifact, self.mmap),
+                        artifact_sources(object_paths, group, artifact))
+
+    def cancel_prefetch(self) -> int:
+        """
+        Функция отмены текущей фоновой загрузки
+        :return: билет следующей фоновой загрузки
+        """
+        with self.lock:
+            self.prefetch_ticket += 1
+            return self.prefetch_ticket
+
+    def prefetch(self, items: List[Tuple[Dict[str, str], str, Union[int, None], str]], ticket: int) -> int:
+        """
+        Функция фоновой загрузки артефактов в свободную часть бюджета, прерывается, если выдан новый билет
+        :param items: список (словарь путей объекта, объект, группа, артефакт) в порядке загрузки
+        :param ticket: билет загрузки из cancel_prefetch
+        :return: количество загруженных значений
+        """
+        loaded = 0
+        for object_paths, object_name, group, artifact in items:
+            if ticket != self.prefetch_ticket:
+                logger.info(f"prefetch {ticket} cancelled")
+                break
+            group = None if artifact in OBJECT_ARTIFACTS else group
+            key = (object_name, group, artifact)
+            sources = artifact_sources(object_paths, group, artifact)
+            signature = file_signature(sources)
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None and entry['signature'] == signature:
+                    continue
+                if self.size >= self.budget:
+                    break
+            try:
+                value = load_artifact(object_paths, group, artifact, self.mmap)
+            except (OSError, ValueError, KeyError) as prefetch_error:
+                logger.warning(prefetch_error)
+                continue
+            # Загрузка отменена, пока значение читалось: пользователь уже ушел к другим группам
+            if ticket != self.prefetch_ticket:
+                logger.info(f"prefetch {ticket} cancelled")
+                break
+            if not self.put(key, value, signature, prefetched=True):
+                break
+            loaded += 1
+            with self.lock:
+                self.prefetched += 1
+        return loaded
@@ -1,32 +1,108 @@
 import os
+import io
+import sys
+import time
+import glob
 import errno
+import hashlib
+import threading
+import multiprocessing
 import argparse
-import shutil
 import json
 import yaml
 
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
 import pandas as pd
 from loguru import logger
 
-from typing import Union, Tuple, List
+from typing import Union, Tuple, List, Dict, Iterator, Callable, Any
+
+# Скрипт запускается из директории utils, добавляем корень приложения для импорта модулей utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.interval_engine as engine
+import utils.interval_index as interval_index
+import utils.job_directory as job_directory
+import utils.columnar_cache as columnar
+import utils.detection_trace as tracing
 
 OBJECTS = f'objects{os.sep}'
+COLUMNAR_CACHE = f'columnar{os.sep}'
 
 CSV_PREDICT = f'csv_predict{os.sep}'
 CSV_LOSS = f'csv_loss{os.sep}'
 CSV_ROLL = f'csv_roll{os.sep}'
 JSON_INTERVAL = f'json_interval{os.sep}'
+LOSS_MEAN = f'loss_mean{os.sep}'
+MANIFEST = 'manifest.json'
+ROLL_CACHE = f'cache{os.sep}'
+TAIL_STATE = f'tail{os.sep}'
+
+# Количество хранимых в кэше вариантов сглаживания на группу
+ROLL_CACHE_SIZE = 4
+
+# Допустимое количество возвратов задания общей директории в очередь после истечения аренды
+JOB_MAX_REQUEUES = 2
+
+# Шаг строк лосса, смещения которых сохраняются в состоянии режима дописывания
+TAIL_CHECKPOINT = 1024
+
+# Доля выполнения группы к началу каждого этапа выделения
+DETECTION_STAGES = {
+    'roll': 0.0,
+    'interval': 0.4,
+    'ranking': 0.6,
+    'json': 0.9
+}
+
+# Серии мощности и маски объектов, очередь событий этапов и событие отмены, общие для заданий процесса
+shared_power = {}
+shared_stage_queue = None
+shared_cancel = None
+
+
+class DetectionCancelled(Exception):
+    """
+    Исключение кооперативной отмены выделения интервалов
+    """
+    pass
 
 
 def parse_args():
     parser = argparse.ArgumentParser(description="start interval detection")
-    parser.add_argument("-s", "--source", type=str, help="specify source of experiment", required=True)
+    parser.add_argument("-s", "--source", type=str, help="specify source of experiment")
     parser.add_argument("-d", "--destination", type=str, help="specify destination directory "
                                                               "which will contain rolled csv and json intervals "
-                                                              "by finded objects in experiment",
-                        required=True)
+                                                              "by finded objects in experiment")
     parser.add_argument("-c", "--config", type=str, help="specify config.yaml of experiment")
-    return parser.parse_args()
+    parser.add_argument("-f", "--force", default=False, action="store_true",
+                        help="flag of detection of all groups regardless of manifest of previous detection")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="specify count of processes for parallel detection of groups")
+    parser.add_argument("-e", "--engine", type=str, default="numpy", choices=["numpy", "reference"],
+                        help="specify engine of interval detection: vectorized numpy or reference python loop")
+    parser.add_argument("-j", "--job-dir", type=str, default=None,
+                        help="specify shared job directory: coordinator writes job per group, "
+                             "workers on any host claim them")
+    parser.add_argument("--worker", default=False, action="store_true",
+                        help="flag of worker mode: claim and detect jobs of shared job directory")
+    parser.add_argument("-t", "--tail", default=False, action="store_true",
+                        help="flag of tail mode: detect intervals only in rows appended since previous tail run")
+    parser.add_argument("--roll-csv", default=False, action="store_true",
+                        help="flag of export of rolled series to csv next to binary roll files")
+    parser.add_argument("--chrome-trace", default=False, action="store_true",
+                        help="flag of export of detection trace to chrome trace format (trace.chrome.json)")
+    parser.add_argument("-m", "--memory-budget", type=int, default=columnar.COLUMNAR_MEMORY_BUDGET // 2 ** 20,
+                        help="specify memory budget of chunked loss ingest of each process in MiB")
+    args = parser.parse_args()
+    if args.worker and args.job_dir is None:
+        parser.error("--worker requires --job-dir")
+    if not args.worker and (args.source is None or args.destination is None):
+        parser.error("the following arguments are required: -s/--source, -d/--destination")
+    return args
 
 
 def rolling_probability(df: pd.DataFrame, roll_in_hours: int, number_of_samples: int) -> pd.DataFrame:
@@ -52,17 +128,7 @@ def fill_zeros_with_last_value(df: pd.DataFrame, count_next: int = 288) -> None:
     :param count_next: количество индексов в сутках в фрейме
     :return: None
     """
-    count = 0
-    for index, row in df.iterrows():
-        if row['target_value'] == 0:
-            if count == 0:
-                start_index = index
-                last_value = df.iloc[index - 1]['target_value']
-            count += 1
-        if row['target_value'] != 0 and count != 0:
-            if count < count_next:
-                df.loc[start_index:index - 1, 'target_value'] = last_value
-            count = 0
+    df['target_value'] = engine.fill_zero_runs(df['target_value'].to_numpy(dtype=float), count_next)
 
 
 def get_interval(target_value: pd.Series,
@@ -73,7 +139,11 @@ def get_interval(target_value: pd.Series,
                  power: pd.Series,
                  power_limit: Union[int, float],
                  count_continue_short: int = 10,
-                 count_continue_long: int = 15) -> Tuple[List[List[str]], List[Tuple[int, int]]]:
+                 count_continue_long: int = 15,
+                 left_power_shift: int = 15,
+                 right_power_shift: int = 15,
+                 power_low: np.ndarray = None,
+                 engine_mode: str = 'numpy') -> Tuple[List[List[float]], List[Tuple[int, int]]]:
     """
     Функция выделения аномальных интервалов по параметрам постобработки
     :param target_value: серия target_value
@@ -85,7 +155,59 @@ def get_interval(target_value: pd.Series,
     :param power_limit: отсечка по мощности
     :param count_continue_short: количество отсчетов для прерывания короткого интервала
     :param count_continue_long: количество отсчетов для прерывания длинного интервала
-    :return: Кортеж из списка строк интервалов и списка кортежей индексов
+    :param left_power_shift: количество отсчетов окна мощности слева от текущего
+    :param right_power_shift: количество отсчетов окна мощности справа от текущего
+    :param power_low: заранее вычисленная маска низкой мощности (используется движком numpy)
+    :param engine_mode: движок выделения: numpy - векторизованный, reference - исходный цикл по отсчетам
+    :return: Кортеж из списка значений интервалов и списка кортежей индексов
+    """
+    params = {
+        'target_value': target_value,
+        'threshold_short': threshold_short,
+        'threshold_long': threshold_long,
+        'len_long': len_long,
+        'len_short': len_short,
+        'power': power,
+        'power_limit': power_limit,
+        'count_continue_short': count_continue_short,
+        'count_continue_long': count_continue_long,
+        'left_power_shift': left_power_shift,
+        'right_power_shift': right_power_shift
+    }
+    if engine_mode == 'numpy':
+        interval_list, idx_list, sum_anomaly = engine.get_interval(**params, power_low=power_low)
+    else:
+        interval_list, idx_list, sum_anomaly = get_interval_reference(**params)
+
+    logger.info(f'Sum anomaly {sum_anomaly}, part of anomaly {round(sum_anomaly / len(target_value), 3)}')
+    return interval_list, idx_list
+
+
+def get_interval_reference(target_value: pd.Series,
+                           threshold_short: int,
+                           threshold_long: int,
+                           len_long: int,
+                           len_short: int,
+                           power: pd.Series,
+                           power_limit: Union[int, float],
+                           count_continue_short: int = 10,
+                           count_continue_long: int = 15,
+                           left_power_shift: int = 15,
+                           right_power_shift: int = 15) -> Tuple[List[List[float]], List[Tuple[int, int]], int]:
+    """
+    Функция выделения аномальных интервалов циклом по отсчетам (эталон для сравнения с векторизованным движком)
+    :param target_value: серия target_value
+    :param threshold_short: порог коротких интервалов
+    :param threshold_long: порог длинных интервалов
+    :param len_long: минимальное расстояние обнаружения длинного интервала
+    :param len_short: минимальное расстояние обнаружения короткого интервала
+    :param power: серия мощности power
+    :param power_limit: отсечка по мощности
+    :param count_continue_short: количество отсчетов для прерывания короткого интервала
+    :param count_continue_long: количество отсчетов для прерывания длинного интервала
+    :param left_power_shift: количество отсчетов окна мощности слева от текущего
+    :param right_power_shift: количество отсчетов окна мощности справа от текущего
+    :return: Кортеж из списка значений интервалов, списка кортежей индексов и суммарной длины аномалий
     """
     long_interval_list = []
     short_interval_list = []
@@ -98,7 +220,7 @@ def get_interval(target_value: pd.Series,
     for val in target_value:
 
         i += 1
-        if val > threshold_long and check_power(power, i, power_limit):
+        if val > threshold_long and check_power(power, i - 1, power_limit, left_power_shift, right_power_shift):
             target_value_interval.append(val)
             count = 0
         else:
@@ -106,7 +228,7 @@ def get_interval(target_value: pd.Series,
             target_value_interval.append(val)
             if count > count_continue_long:
                 if len(target_value_interval) > len_long:
-                    long_interval_list.append(target_value_interval)
+                    long_interval_list.append(list(target_value_interval))
                     if i - len(target_value_interval) > 0:
                         long_idx_list.append((i - len(target_value_interval), i))
                     else:
@@ -115,6 +237,7 @@ def get_interval(target_value: pd.Series,
                 count = 0
                 target_value_interval.clear()
     i = 0
+    long_index = interval_index.build_interval_index(long_idx_list)
     for val in target_value:
         i += 1
         if val > threshold_short:
@@ -125,9 +248,9 @@ def get_interval(target_value: pd.Series,
             target_value_interval.append(val)
             if count > count_continue_short:
                 if len(target_value_interval) > len_short:
-                    isInLong = any(start <= i - len(target_value_interval) < end for start, end in long_idx_list)
+                    isInLong = interval_index.index_contains(long_index, i - len(target_value_interval))
                     if not isInLong:
-                        short_interval_list.append(target_value_interval)
+                        short_interval_list.append(list(target_value_interval))
                         if i - len(target_value_interval) > 0:
                             short_idx_list.append((i - len(target_value_interval), i))
                         else:
@@ -136,8 +259,7 @@ def get_interval(target_value: pd.Series,
                 count = 0
                 target_value_interval.clear()
 
-    logger.info(f'Sum anomaly {sum_anomaly}, part of anomaly {round(sum_anomaly / len(target_value), 3)}')
-    return long_interval_list + short_interval_list, long_idx_list + short_idx_list
+    return long_interval_list + short_interval_list, long_idx_list + short_idx_list, sum_anomaly
 
 
 def check_power(power: pd.Series, index: int, power_limit: Union[int, float],
@@ -147,159 +269,1232 @@ def check_power(power: pd.Series, index: int, power_limit: Union[int, float],
     :param power: серия мощности power
     :param index: текущий индекс поиска интервалов
     :param power_limit: отсечка по мощности
-    :param left_power_shift: сдвиг влево индексов
-    :param right_power_shift: сдвиг вправо индексов
-    :return: True если хотя бы одно значение на интервале меньше отсечки по мощности
+    :param left_power_shift: количество отсчетов окна слева от текущего
+    :param right_power_shift: количество отсчетов окна справа от текущего
+    :return: True если хотя бы одно значение на интервале [index - left_power_shift, index + right_power_shift)
+    меньше отсечки по мощности
     """
-    return any(val < power_limit for val in power[index - left_power_shift:right_power_shift + 15])
+    return any(val < power_limit for val in power.iloc[max(index - left_power_shift, 0):index + right_power_shift])
 
 
-def main():
+def temporary_path(path: str) -> str:
+    """
+    Функция пути временного файла рядом с результирующим для атомарной записи через os.replace
+    :param path: путь результирующего файла
+    :return: путь временного файла, уникальный для процесса
+    """
+    return f"{path}.{os.getpid()}.tmp"
+
+
+@lru_cache(maxsize=None)
+def load_power(data_path: str, power_index: str, cache_dir: str = None) -> pd.Series:
+    """
+    Функция чтения серии мощности из файла срезов с кэшированием на время работы процесса
+    :param data_path: путь до файла срезов объекта
+    :param power_index: kks датчика мощности
+    :param cache_dir: директория поколоночного кэша csv, если None - читается сам csv
+    :return: серия мощности power
+    """
+    logger.info(f"load_power({data_path}, {power_index})")
+    return pd.Series(columnar.read_column(data_path, power_index, cache_dir), name=power_index)
+
+
+def roll_predict(roll_df: pd.DataFrame, post_processing: dict, object_config: dict,
+                 trace: List[dict] = None) -> pd.DataFrame:
+    """
+    Функция сглаживания предикта группы: сглаживание, заполнение пропусков и спадов вероятности
+    :param roll_df: фрейм предикта
+    :param post_processing: параметры постобработки
+    :param object_config: конфиг объекта
+    :param trace: список замеров этапов группы, если None - этапы не замеряются
+    :return: фрейм со сглаженным target_value
+    """
+    # Сглаживание
+    with tracing.traced(trace, 'roll'):
+        if post_processing['roll_in_hours'] >= 0:
+            roll_df = rolling_probability(roll_df, post_processing['roll_in_hours'],
+                                          object_config['number_of_sample'])
+
+    with tracing.traced(trace, 'zero_fill'):
+        # Заполняем пропуски нулями
+        target_value = roll_df['target_value'].to_numpy(dtype=float, copy=True)
+        target_value[np.isnan(target_value)] = 0
+
+        # Заполняем значениями, если есть спад вероятности в сутках (на месте в буфере numpy)
+        engine.fill_zero_runs(target_value, count_next=24 * object_config['number_of_sample'], inplace=True)
+        roll_df['target_value'] = target_value
+    return roll_df
+
+
+def interval_detection_group(paths: Dict[str, str], object_config: dict, post_processing: dict,
+                             power: pd.Series, power_low: np.ndarray, engine_mode: str = 'numpy',
+                             roll_current: bool = False, report_stage: Callable[[str], None] = None,
+                             memory_budget: int = columnar.COLUMNAR_MEMORY_BUDGET,
+                             trace: List[dict] = None) -> None:
+    """
+    Процедура выделения интервалов одной группы объекта: сглаживание, выделение, сохранение roll, json
+    и среднего лосса по отсчетам для гистограммы
+    :param paths: словарь путей predict, loss, roll, json_interval, loss_mean, roll_cache группы,
+    columnar кэша csv и roll_csv (экспорт roll в csv, если не None)
+    :param object_config: конфиг объекта
+    :param post_processing: параметры постобработки
+    :param power: серия мощности power объекта
+    :param power_low: маска низкой мощности объекта (True - в окне есть мощность ниже отсечки)
+    :param engine_mode: движок выделения интервалов
+    :param roll_current: roll файл группы уже сглажен с текущими параметрами сглаживания
+    :param report_stage: процедура сообщения о начале этапа, может прервать выделение исключением отмены
+    :param memory_budget: бюджет памяти потокового чтения лосса в байтах
+    :param trace: список замеров этапов группы (время и пик памяти), если None - этапы не замеряются
+    :return: None
+    """
+    report_stage = report_stage if report_stage is not None else (lambda stage: None)
+
+    # Результаты группы пишутся во временные файлы и атомарно переименовываются по завершении
+    roll_temp = temporary_path(paths['roll'])
+    json_temp = temporary_path(paths['json_interval'])
+    loss_mean_temp = temporary_path(paths['loss_mean'])
+    roll_csv = paths.get('roll_csv')
+
+    # Сглаженный ряд зависит только от предикта и параметров сглаживания, поэтому берется из кэша, если есть,
+    # иначе сглаживается прямо из предикта; roll пишется один раз в бинарном виде
+    report_stage('roll')
+    with tracing.traced(trace, 'read'):
+        roll_df = read_roll_cache(paths['roll_cache'])
+        predict_df = columnar.read_frame(paths['predict'], paths.get('columnar')).reset_index() \
+            if roll_df is None else None
+    if roll_df is None:
+        roll_df = roll_predict(predict_df, post_processing, object_config, trace)
+        roll_current = False
+    with tracing.traced(trace, 'roll_write'):
+        if predict_df is not None:
+            write_roll_cache(paths['roll_cache'], roll_df)
+        if not roll_current:
+            # roll файл отсутствует или был сглажен с другими параметрами
+            columnar.write_records(roll_temp, roll_df)
+        if roll_csv is not None and (not roll_current or not os.path.isfile(roll_csv)):
+            roll_df.to_csv(temporary_path(roll_csv), index=False)
+
+    # Подготовка фреймов к выделению интервалов
+    roll_df.index = roll_df['timestamp']
+    roll_df = roll_df.drop(columns=['timestamp'])
+
+    # Запуск выделения интервалов
+    report_stage('interval')
+    with tracing.traced(trace, 'get_interval'):
+        interval_list, idx_list = get_interval(target_value=roll_df['target_value'],
+                                               threshold_short=post_processing['threshold_short'],
+                                               threshold_long=post_processing['threshold_long'],
+                                               len_long=post_processing['len_long'],
+                                               len_short=post_processing['len_short'],
+                                               count_continue_short=post_processing['count_continue_short'],
+                                               count_continue_long=post_processing['count_continue_long'],
+                                               power=power,
+                                               power_limit=object_config['power_limit'],
+                                               left_power_shift=object_config['left_power_shift'],
+                                               right_power_shift=object_config['right_power_shift'],
+                                               power_low=power_low,
+                                               engine_mode=engine_mode)
+
+    # Ранжируем датчики по среднему лоссу на интервалах: лосс читается блоками строк в пределах бюджета памяти,
+    # от него остаются только префиксные суммы в границах интервалов и средний лосс по отсчетам
+    report_stage('ranking')
+    with tracing.traced(trace, 'ranking'):
+        loss_columns = pd.Index(columnar.read_columns(paths['loss'], paths.get('columnar')))
+        ranking, loss_mean = engine.rank_top_sensors_chunked(
+            columnar.iter_chunks(paths['loss'], paths.get('columnar'), memory_budget), idx_list,
+            post_processing['count_top'])
+
+    # Формируем и сохраняем json-файл группы
+    report_stage('json')
+    with tracing.traced(trace, 'json_write'):
+        dict_list = []
+        for j, (top_index, top_mean) in zip(idx_list, ranking):
+            report_dict = {
+                "time": (str(roll_df.index[j[0]]), str(roll_df.index[j[1]])),
+                "len": j[1] - j[0],
+                "index": j,
+                "top_sensors": loss_columns[top_index].to_list(),
+                "measurement": top_mean.tolist()
+            }
+            dict_list.append(report_dict)
+
+        with open(json_temp, "w") as json_write:
+            json.dump(dict_list, json_write, indent=4)
+        with open(loss_mean_temp, "wb") as loss_mean_write:
+            np.save(loss_mean_write, loss_mean)
+
+        if os.path.isfile(roll_temp):
+            os.replace(roll_temp, paths['roll'])
+        if roll_csv is not None and os.path.isfile(temporary_path(roll_csv)):
+            os.replace(temporary_path(roll_csv), roll_csv)
+        os.replace(loss_mean_temp, paths['loss_mean'])
+        os.replace(json_temp, paths['json_interval'])
+
+
+def roll_cache_key(signature: dict) -> str:
+    """
+    Функция ключа кэша сглаженного ряда: хэш сигнатуры предикта и параметров сглаживания
+    :param signature: словарь сигнатуры группы
+    :return: строка ключа кэша
+    """
+    roll_signature = {
+        'predict': signature['predict'],
+        'roll_in_hours': signature['post_processing']['roll_in_hours'],
+        'number_of_sample': signature['object_config']['number_of_sample']
+    }
+    return hashlib.sha1(json.dumps(roll_signature, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def read_roll_cache(path: str) -> Union[pd.DataFrame, None]:
+    """
+    Функция чтения сглаженного ряда из кэша
+    :param path: путь до файла кэша
+    :return: фрейм с timestamp и target_value или None, если в кэше нет записи
+    """
+    if not os.path.isfile(path):
+        return None
+    with np.load(path) as cache:
+        timestamp = cache['timestamp']
+        # Время хранится в наносекундах эпохи, кэши прежних версий - строками
+        if timestamp.dtype.kind == 'i':
+            timestamp = timestamp.view('datetime64[ns]')
+        return pd.DataFrame({'timestamp': timestamp, 'target_value': cache['target_value']})
+
+
+def write_roll_cache(path: str, roll_df: pd.DataFrame) -> None:
+    """
+    Процедура атомарной записи сглаженного ряда в кэш с вытеснением старых вариантов сглаживания группы
+    :param path: путь до файла кэша вида roll_{группа}_{ключ}.npz
+    :param roll_df: фрейм с timestamp и target_value
+    :return: None
+    """
+    with open(temporary_path(path), 'wb') as write_file:
+        timestamp = pd.to_datetime(roll_df['timestamp']).to_numpy(dtype='datetime64[ns]').view(np.int64)
+        np.savez(write_file, timestamp=timestamp,
+                 target_value=roll_df['target_value'].to_numpy(dtype=float))
+    os.replace(temporary_path(path), path)
+
+    group_prefix = path[:path.rindex('_') + 1]
+    entries = sorted(glob.glob(f"{glob.escape(group_prefix)}*.npz"), key=os.path.getmtime, reverse=True)
+    for entry in entries[ROLL_CACHE_SIZE:]:
+        os.remove(entry)
+
+
+def file_signature(path: str) -> Dict[str, int]:
+    """
+    Функция сигнатуры файла для манифеста: размер и время изменения
+    :param path: путь до файла
+    :return: словарь с размером и временем изменения файла в наносекундах
+    """
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def group_signature(job: dict) -> dict:
+    """
+    Функция сигнатуры группы: сигнатуры входных файлов и параметры, от которых зависят roll и json группы
+    :param job: словарь задания группы
+    :return: словарь сигнатуры группы
+    """
+    return {
+        'predict': file_signature(job['paths']['predict']),
+        'loss': file_signature(job['paths']['loss']),
+        'data': file_signature(job['object_config']['data']),
+        'object_config': {key: value for key, value in job['object_config'].items() if key != 'count_of_groups'},
+        'post_processing': dict(job['post_processing'])
+    }
+
+
+def read_manifest(path: str) -> dict:
+    """
+    Функция чтения манифеста объекта
+    :param path: путь до манифеста
+    :return: словарь манифеста, пустой если манифеста нет или он поврежден
+    """
     try:
-        args = parse_args()
-    except SystemExit:
-        logger.info("finished")
-        exit(0)
+        with open(path, 'r') as read_file:
+            manifest = json.load(read_file)
+    except (OSError, ValueError):
+        manifest = {}
+    manifest.setdefault('groups', {})
+    return manifest
 
-    # Создание директории для сохранения объектов
+
+def write_manifest(path: str, manifest: dict) -> None:
+    """
+    Процедура атомарной записи манифеста объекта
+    :param path: путь до манифеста
+    :param manifest: словарь манифеста
+    :return: None
+    """
+    with open(temporary_path(path), 'w') as write_file:
+        json.dump(manifest, write_file, indent=4)
+    os.replace(temporary_path(path), path)
+
+
+def is_group_unchanged(manifest: dict, job: dict) -> bool:
+    """
+    Функция проверки актуальности результатов группы по манифесту
+    :param manifest: словарь манифеста объекта
+    :param job: словарь задания группы с сигнатурой
+    :return: True если входы и параметры группы не изменились и результаты существуют
+    """
+    return manifest['groups'].get(str(job['group'])) == job['signature'] and \
+        os.path.isfile(job['paths']['roll']) and os.path.isfile(job['paths']['json_interval']) and \
+        (job['paths']['roll_csv'] is None or os.path.isfile(job['paths']['roll_csv']))
+
+
+def init_worker(power_by_object: Dict[str, Tuple[pd.Series, np.ndarray]], stage_queue: Any = None,
+                cancel: Any = None) -> None:
+    """
+    Процедура инициализации процесса пула: сохраняет общие серии мощности, очередь этапов и событие отмены
+    :param power_by_object: словарь объект - (серия мощности, маска низкой мощности)
+    :param stage_queue: очередь событий этапов выделения для главного процесса
+    :param cancel: событие кооперативной отмены выделения
+    :return: None
+    """
+    global shared_power, shared_stage_queue, shared_cancel
+    shared_power = power_by_object
+    shared_stage_queue = stage_queue
+    shared_cancel = cancel
+
+
+def interval_detection_job(job: dict, on_stage: Callable[[dict], None] = None) -> dict:
+    """
+    Функция выполнения задания выделения интервалов одной группы в текущем процессе
+    :param job: словарь задания: объект, группа, пути файлов группы, конфиг объекта, постобработка, движок
+    :param on_stage: обработчик событий этапов, если None - события отправляются в очередь процесса пула
+    :return: выполненное задание с трассой группы
+    """
+    def report_stage(stage: str) -> None:
+        """
+        Процедура сообщения о начале этапа группы и проверки кооперативной отмены
+        :param stage: наименование этапа
+        :return: None
+        """
+        if shared_cancel is not None and shared_cancel.is_set():
+            raise DetectionCancelled(f"{job['object']}, группа {job['group']}: выделение отменено")
+        event = {'object': job['object'], 'group': job['group'], 'stage': stage}
+        if on_stage is not None:
+            on_stage(event)
+        elif shared_stage_queue is not None:
+            shared_stage_queue.put(event)
+
+    power, power_low = shared_power[job['object']]
+    trace = []
+    try:
+        interval_detection_group(job['paths'], job['object_config'], job['post_processing'],
+                                 power, power_low, job['engine'], job['roll_current'], report_stage,
+                                 job['memory_budget'], trace)
+    except Exception:
+        # Недописанные временные файлы группы не должны оставаться рядом с результатами
+        for path in (job['paths']['roll'], job['paths']['roll_csv'], job['paths']['json_interval'],
+                     job['paths']['loss_mean']):
+            if path is not None and os.path.isfile(temporary_path(path)):
+                os.remove(temporary_path(path))
+        raise
+    job['trace'] = tracing.group_trace(job['object'], job['group'], trace)
+    return job
+
+
+def load_object_power(object_config: dict, cache_dir: str = None) -> Tuple[pd.Series, np.ndarray]:
+    """
+    Функция загрузки серии мощности объекта и вычисления маски низкой мощности
+    :param object_config: конфиг объекта
+    :param cache_dir: директория поколоночного кэша csv
+    :return: кортеж из серии мощности и маски низкой мощности
+    """
+    power = load_power(object_config['data'], object_config['power_index'], cache_dir)
+    return power, engine.power_low_mask(power, object_config['power_limit'], object_config['left_power_shift'],
+                                        object_config['right_power_shift'])
+
+
+def serve_jobs(job_dir: str, wait_run: bool = False, poll_interval: float = 1.0) -> None:
+    """
+    Процедура воркера общей директории заданий: захватывает задания групп, пока координатор не завершит запуск
+    :param job_dir: путь до общей директории заданий
+    :param wait_run: ожидать начала запуска координатора, если он еще не начат
+    :param poll_interval: период опроса очереди заданий в секундах
+    :return: None
+    """
+    # Серии мощности загружаются воркером по мере появления заданий объекта
+    init_worker({}, cancel=job_directory.CancelFlag(job_dir))
+    running = not wait_run
+    while True:
+        claimed = job_directory.claim_job(job_dir)
+        if claimed is None:
+            state = job_directory.read_state(job_dir)
+            running = running or state == job_directory.STATE_RUNNING
+            if running and state != job_directory.STATE_RUNNING:
+                return
+            time.sleep(poll_interval)
+            continue
+
+        name, job = claimed
+        logger.info(f"{name} claimed")
+        finished = threading.Event()
+        threading.Thread(target=job_directory.keep_claim, args=(job_dir, name, finished), daemon=True).start()
+        try:
+            if job['object'] not in shared_power:
+                shared_power[job['object']] = load_object_power(job['object_config'], job['paths']['columnar'])
+            job = interval_detection_job(job, lambda event: job_directory.write_progress(job_dir, name,
+                                                                                         event['stage']))
+        except DetectionCancelled as cancelled:
+            logger.warning(cancelled)
+            return
+        except Exception as detection_error:
+            logger.exception(detection_error)
+            job_directory.finish_job(job_dir, name, {'status': 'error', 'causeException': str(detection_error)})
+        else:
+            job_directory.finish_job(job_dir, name, {'status': 'success', 'trace': job['trace']})
+        finally:
+            finished.set()
+
+
+def run_job_directory(jobs: List[dict], job_dir: str, workers: int = 1, on_stage: Callable[[dict], None] = None,
+                      cancel: Any = None, lease: float = job_directory.JOB_LEASE,
+                      max_requeues: int = JOB_MAX_REQUEUES) -> Iterator[dict]:
+    """
+    Генератор координатора общей директории заданий: пишет дескрипторы заданий групп, запускает локальных
+    воркеров и собирает этапы и результаты, записанные воркерами любых хостов. Задания завершившихся воркеров
+    возвращаются в очередь по истечении аренды, запуск прерывается, если задание возвращалось чаще max_requeues
+    раз или все локальные воркеры завершились (при workers > 0 внешние воркеры не ожидаются)
+    :param jobs: список заданий по группам
+    :param job_dir: путь до общей директории заданий
+    :param workers: количество локальных воркеров, 0 - задания выполняют только внешние воркеры
+    :param on_stage: обработчик событий этапов групп
+    :param cancel: событие кооперативной отмены выделения
+    :param lease: время аренды захваченного задания в секундах
+    :param max_requeues: допустимое количество возвратов задания в очередь
+    :return: выполненные задания по мере их завершения
+    """
+    on_stage = on_stage if on_stage is not None else (lambda event: None)
+
+    os.makedirs(job_dir, exist_ok=True)
+    job_directory.open_run(job_dir)
+    by_name = {job_directory.write_job(job_dir, job): job for job in jobs}
+    processes = [multiprocessing.Process(target=serve_jobs, args=(job_dir,))
+                 for _ in range(workers if jobs else 0)]
+    for process in processes:
+        process.start()
+
+    stages, requeues = {}, {}
+    state = job_directory.STATE_CANCELLED
+    try:
+        while by_name:
+            if cancel is not None and cancel.is_set():
+                raise DetectionCancelled("выделение отменено")
+            # Состояние воркеров читается до сбора результатов, чтобы не потерять записанные перед выходом
+            workers_exited = bool(processes) and not any(process.is_alive() for process in processes)
+            for name in job_directory.requeue_stale(job_dir, lease):
+                requeues[name] = requeues.get(name, 0) + 1
+                stages.pop(name, None)
+                logger.warning(f"{name}: аренда истекла, задание возвращено в очередь")
+                if requeues[name] > max_requeues:
+                    raise RuntimeError(f"{name}: воркеры завершаются, не выполнив задание")
+            for name, stage in job_directory.read_progress(job_dir).items():
+                if name in by_name and stages.get(name) != stage:
+                    stages[name] = stage
+                    on_stage({'object': by_name[name]['object'], 'group': by_name[name]['group'], 'stage': stage})
+            for name, result in job_directory.collect_results(job_dir):
+                job = by_name.pop(name, None)
+                if job is None:
+                    continue
+                if result['status'] != 'success':
+                    raise RuntimeError(f"{name}: {result['causeException']}")
+                job['trace'] = result.get('trace')
+                yield job
+            if by_name and workers_exited:
+                raise RuntimeError(f"локальные воркеры завершились, не выполнено заданий: {len(by_name)}")
+            if by_name:
+                time.sleep(0.2)
+        state = job_directory.STATE_FINISHED
+    finally:
+        # Воркеры завершаются по состоянию запуска: после отмены или ошибки незахваченные задания не выполняются
+        job_directory.set_state(job_dir, state)
+        for process in processes:
+            process.join()
+
+
+def run_interval_detection_jobs(jobs: List[dict], power_by_object: Dict[str, Tuple[pd.Series, np.ndarray]],
+                                workers: int = 1, on_stage: Callable[[dict], None] = None,
+                                cancel: Any = None) -> Iterator[dict]:
+    """
+    Генератор выполнения заданий выделения интервалов последовательно или в пуле процессов
+    :param jobs: список заданий по группам
+    :param power_by_object: словарь объект - (серия мощности, маска низкой мощности)
+    :param workers: количество процессов
+    :param on_stage: обработчик событий этапов групп, вызывается в текущем процессе
+    :param cancel: событие кооперативной отмены выделения
+    :return: выполненные задания по мере их завершения
+    """
+    on_stage = on_stage if on_stage is not None else (lambda event: None)
+
+    if workers <= 1:
+        init_worker(power_by_object, cancel=cancel)
+        for job in jobs:
+            yield interval_detection_job(job, on_stage)
+        return
+
+    stage_queue = multiprocessing.get_context().Queue()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(power_by_object, stage_queue, cancel)) as pool:
+        pending = {pool.submit(interval_detection_job, job) for job in jobs}
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                # События этапов из процессов пула передаются обработчику по мере поступления
+                while not stage_queue.empty():
+                    on_stage(stage_queue.get())
+                for future in done:
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def make_directory(path: str) -> None:
+    """
+    Процедура создания директории, если ее еще нет
+    :param path: путь директории
+    :return: None
+    """
     try:
-        os.mkdir(os.path.join(args.destination, OBJECTS))
+        os.mkdir(path)
     except OSError as e:
         if e.errno != errno.EEXIST:
             logger.error(e)
-            exit(0)
+            raise
+
+
+def run_interval_detection(source: str, destination: str, config_path: str, workers: int = 1,
+                           engine_mode: str = 'numpy', force: bool = False,
+                           progress: Callable[[dict], None] = None, cancel: Any = None,
+                           job_dir: str = None, memory_budget: int = columnar.COLUMNAR_MEMORY_BUDGET,
+                           roll_csv: bool = False, chrome_trace: bool = False, objects: str = OBJECTS) -> None:
+    """
+    Процедура выделения интервалов по всем объектам эксперимента
+    :param source: путь до эксперимента
+    :param destination: директория, в которой сохраняются сглаженные csv и json интервалы объектов
+    :param config_path: путь до config.yaml
+    :param workers: количество процессов для параллельного выделения групп
+    :param engine_mode: движок выделения интервалов
+    :param force: выделять все группы независимо от манифеста предыдущего выделения
+    :param progress: обработчик событий прогресса: объект, группа, этап и общий процент выполнения
+    :param cancel: событие кооперативной отмены выделения (threading.Event или multiprocessing.Event)
+    :param job_dir: общая директория заданий, если задана - группы выполняют воркеры директории на любых хостах
+    :param memory_budget: бюджет памяти потокового чтения лосса каждого процесса в байтах
+    :param roll_csv: дополнительно экспортировать roll групп в csv
+    :param chrome_trace: дополнительно записать трассу выделения в формате Chrome trace
+    :param objects: директория объектов в destination, в которую сохраняются результаты
+    :return: None
+    """
+    progress = progress if progress is not None else (lambda event: None)
+    # Пути заданий должны быть одинаково доступны воркерам на других хостах и в других директориях
+    source, destination = os.path.abspath(source), os.path.abspath(destination)
+
+    # Создание директории для сохранения объектов
+    make_directory(os.path.join(destination, objects))
 
     # Считываем конфиг с константами и постобработкой
-    with open(args.config, 'r') as read_file:
+    with open(config_path, 'r') as read_file:
         config = yaml.safe_load(read_file)
 
-    # Общее количество групп и счетчик группы для определения % выполнения
-    groups_sum = sum([config[key]['count_of_groups'] if key != 'post_processing' else 0 for key in config])
-    group_number = 0
-
-    with open('complete.log', 'w') as write_file:
-        write_file.write("0%")
+    # Задания выделения по группам всех объектов и общие для групп объекта серии мощности
+    jobs = []
+    power_by_object = {}
+    manifests = {}
+    skipped = 0
 
-    for object_directory in os.listdir(args.source):
+    for object_directory in os.listdir(source):
         logger.info(object_directory)
 
         # Создание директорий для сохранения файлов
-        data_path = os.path.join(OBJECTS, object_directory, 'data')
-        try:
-            os.mkdir(os.path.join(args.destination, os.path.join(OBJECTS, object_directory)))
-        except OSError as e:
-            if e.errno != errno.EEXIST:
-                logger.error(e)
-                exit(0)
-
-        try:
-            os.mkdir(os.path.join(args.destination, data_path))
-        except OSError as e:
-            if e.errno != errno.EEXIST:
-                logger.error(e)
-                exit(0)
-
-        try:
-            os.mkdir(os.path.join(args.destination, data_path, CSV_ROLL))
-        except OSError as e:
-            if e.errno != errno.EEXIST:
-                logger.error(e)
-                exit(0)
-
-        try:
-            os.mkdir(os.path.join(args.destination, data_path, JSON_INTERVAL))
-        except OSError as e:
-            if e.errno != errno.EEXIST:
-                logger.error(e)
-                exit(0)
+        data_path = os.path.join(objects, object_directory, 'data')
+        make_directory(os.path.join(destination, os.path.join(objects, object_directory)))
+        make_directory(os.path.join(destination, data_path))
+        make_directory(os.path.join(destination, data_path, CSV_ROLL))
+        make_directory(os.path.join(destination, data_path, JSON_INTERVAL))
+        make_directory(os.path.join(destination, data_path, LOSS_MEAN))
+        make_directory(os.path.join(destination, data_path, ROLL_CACHE))
 
         # Выделение интервалов
         # Проверяем равенство количества файлов предиктов и лоссов для групп
-        predict_path = os.path.join(args.source, object_directory, CSV_PREDICT)
-        loss_path = os.path.join(args.source, object_directory, CSV_LOSS)
+        predict_path = os.path.join(source, object_directory, CSV_PREDICT)
+        loss_path = os.path.join(source, object_directory, CSV_LOSS)
 
         predict_len = len(os.listdir(predict_path))
         loss_len = len(os.listdir(loss_path))
 
         assert predict_len == loss_len, "count of predicts csv not equals count of loss csv"
 
-        # Непосредственное выделение
+        # Манифест входов и параметров предыдущего выделения объекта
+        manifest_path = os.path.join(destination, data_path, MANIFEST)
+        manifests[object_directory] = read_manifest(manifest_path)
+
         for i in range(config[object_directory]['count_of_groups']):
-            predict = os.path.join(predict_path, f"predict_{i}.csv")
-            loss = os.path.join(loss_path, f"loss_{i}.csv")
-            roll = os.path.join(args.destination, data_path, f"{CSV_ROLL}roll_{i}.csv")
-            json_interval = os.path.join(args.destination, data_path, f"{JSON_INTERVAL}group_{i}.json")
-
-            # Копируем не сглаженный предикт в ролл, чтобы не изменять оригинал
-            shutil.copy(predict, roll)
-
-            roll_df = pd.read_csv(roll)
-
-            # Сглаживание
-            if config['post_processing']['roll_in_hours'] >= 0:
-                roll_df = rolling_probability(roll_df, config['post_processing']['roll_in_hours'],
-                                              config[object_directory]['number_of_sample'])
-
-            # Заполняем пропуски нулями
-            roll_df.fillna(value={"target_value": 0}, inplace=True)
-
-            # Заполняем значениями, если есть спад вероятности в сутках
-            fill_zeros_with_last_value(roll_df, count_next=24 * config[object_directory]['number_of_sample'])
-
-            # Сохраняем сглаженный фрейм
-            roll_df.to_csv(roll, index=False)
-
-            # Подготовка фреймов к выделению интервалов
-            roll_df.index = roll_df['timestamp']
-            roll_df = roll_df.drop(columns=['timestamp'])
-
-            loss_df = pd.read_csv(loss)
-            loss_df.index = loss_df['timestamp']
-            loss_df = loss_df.drop(columns=['timestamp'])
-
-            # Фрейм с данными, из которой берем серию мощности
-            power_df = pd.read_csv(config[object_directory]['data'], usecols=[config[object_directory]['power_index']])
-
-            # Запуск выделения интервалов
-            interval_list, idx_list = get_interval(target_value=roll_df['target_value'],
-                                                   threshold_short=config['post_processing']['threshold_short'],
-                                                   threshold_long=config['post_processing']['threshold_long'],
-                                                   len_long=config['post_processing']['len_long'],
-                                                   len_short=config['post_processing']['len_short'],
-                                                   count_continue_short=config['post_processing'][
-                                                       'count_continue_short'],
-                                                   count_continue_long=config['post_processing']['count_continue_long'],
-                                                   power=power_df[config[object_directory]['power_index']],
-                                                   power_limit=config[object_directory]['power_limit'])
-
-            # Формируем и сохраняем json-файл группы
-            dict_list = []
-            for j in idx_list:
-                top_list = loss_df[j[0]:j[1]].mean().sort_values(ascending=False) \
-                               .index[:config['post_processing']['count_top']].to_list()
-                mean_measurement = list(
-                    loss_df[j[0]:j[1]].mean().sort_values(ascending=False).values[:config['post_processing']['count_top']]
-                )
-
-                report_dict = {
-                    "time": (str(roll_df.index[j[0]]), str(roll_df.index[j[1]])),
-                    "len": j[1] - j[0],
-                    "index": j,
-                    "top_sensors": top_list,
-                    "measurement": mean_measurement
-                }
-                dict_list.append(report_dict)
-
-            with open(json_interval, "w") as json_write:
-                json.dump(dict_list, json_write, indent=4)
+            job = {
+                'object': object_directory,
+                'group': i,
+                'manifest': manifest_path,
+                'paths': {
+                    'predict': os.path.join(predict_path, f"predict_{i}.csv"),
+                    'loss': os.path.join(loss_path, f"loss_{i}.csv"),
+                    'roll': os.path.join(destination, data_path, f"{CSV_ROLL}roll_{i}.npy"),
+                    'roll_csv': os.path.join(destination, data_path, f"{CSV_ROLL}roll_{i}.csv") if roll_csv else None,
+                    'json_interval': os.path.join(destination, data_path, f"{JSON_INTERVAL}group_{i}.json"),
+                    'loss_mean': os.path.join(destination, data_path, f"{LOSS_MEAN}loss_mean_{i}.npy"),
+                    'columnar': os.path.join(destination, COLUMNAR_CACHE)
+                },
+                'object_config': config[object_directory],
+                'post_processing': config['post_processing'],
+                'engine': engine_mode,
+                'memory_budget': memory_budget
+            }
+            job['signature'] = group_signature(job)
+            job['paths']['roll_cache'] = os.path.join(destination, data_path,
+                                                      f"{ROLL_CACHE}roll_{i}_{roll_cache_key(job['signature'])}.npz")
+
+            # roll файл актуален, если предыдущее выделение сглаживало тот же предикт с теми же параметрами
+            previous = manifests[object_directory]['groups'].get(str(i))
+            job['roll_current'] = previous is not None and os.path.isfile(job['paths']['roll']) and \
+                roll_cache_key(previous) == roll_cache_key(job['signature'])
+
+            # Группа пропускается, если ее входы и параметры не изменились с предыдущего выделения
+            if not force and is_group_unchanged(manifests[object_directory], job):
+                logger.info(f"{job['paths']['json_interval']} is up to date")
+                skipped += 1
+                continue
+            jobs.append(job)
+
+        # Серия мощности и маска низкой мощности загружаются один раз на объект и общие для всех его групп,
+        # воркеры общей директории загружают их сами
+        if job_dir is None and any(job['object'] == object_directory for job in jobs):
+            power_by_object[object_directory] = load_object_power(config[object_directory],
+                                                                  os.path.join(destination, COLUMNAR_CACHE))
+
+    # Прогресс: завершенные группы и доля выполненных этапов групп, находящихся в работе
+    groups_sum = len(jobs) + skipped
+    group_number = skipped
+    in_progress = {}
+
+    def percent() -> int:
+        """
+        Функция общего процента выполнения выделения
+        :return: процент выполнения
+        """
+        return int((group_number + sum(in_progress.values())) / groups_sum * 100) if groups_sum else 100
 
+    def on_stage(event: dict) -> None:
+        """
+        Процедура учета события этапа группы и передачи прогресса обработчику
+        :param event: событие этапа: объект, группа, этап
+        :return: None
+        """
+        in_progress[(event['object'], event['group'])] = DETECTION_STAGES[event['stage']]
+        progress({**event, 'percent': percent()})
+
+    # Трасса выделенных групп пишется в директорию результатов и при прерванном выделении
+    started = time.time()
+    traces = []
+
+    def save_trace(status: str) -> None:
+        """
+        Процедура записи трассы выделения
+        :param status: статус выделения
+        :return: None
+        """
+        tracing.write_trace(destination, {
+            'status': status,
+            'start': started,
+            'duration': time.time() - started,
+            'workers': workers,
+            'job_dir': job_dir,
+            'groups_skipped': skipped,
+            # Пик памяти главного процесса за все время его работы
+            'peak_rss': tracing.peak_rss(),
+            'groups': traces
+        }, chrome_trace)
+
+    progress({'object': None, 'group': None, 'stage': 'start', 'percent': percent()})
+
+    # Непосредственное выделение: последовательно, пулом процессов или воркерами общей директории,
+    # прогресс считает только главный процесс
+    if job_dir is None:
+        finished_jobs = run_interval_detection_jobs(jobs, power_by_object, workers, on_stage, cancel)
+    else:
+        finished_jobs = run_job_directory(jobs, job_dir, workers, on_stage, cancel)
+    try:
+        for job in finished_jobs:
             group_number += 1
+            in_progress.pop((job['object'], job['group']), None)
+            if job.get('trace') is not None:
+                traces.append(job['trace'])
+
+            # Манифест обновляется после каждой группы, чтобы прерванный запуск не терял выполненные группы
+            manifests[job['object']]['groups'][str(job['group'])] = job['signature']
+            write_manifest(job['manifest'], manifests[job['object']])
+
+            logger.info(f"{job['paths']['json_interval']} has been saved")
+            logger.info(f"{percent()}% completed")
+            progress({'object': job['object'], 'group': job['group'], 'stage': 'done', 'percent': percent()})
+
+            if cancel is not None and cancel.is_set():
+                raise DetectionCancelled("выделение отменено")
+    except DetectionCancelled:
+        save_trace('cancelled')
+        raise
+    except Exception:
+        save_trace('error')
+        raise
+    save_trace('success')
 
-            logger.info(f'{json_interval} has been saved')
-            logger.info(f"{int(group_number / groups_sum * 100)}% completed")
 
-            with open('complete.log', 'w') as write_file:
-                write_file.write(f"{int(group_number / groups_sum * 100)}%")
+def read_appended_rows(path: str, offset: int, columns: List[str] = None, max_rows: int = None,
+                       usecols: List[str] = None) -> Tuple[pd.DataFrame, int, List[str]]:
+    """
+    Функция чтения строк csv, дописанных после смещения: читаются только полные строки
+    :param path: путь до csv
+    :param offset: смещение в байтах, с которого начинаются непрочитанные строки (0 - с заголовка)
+    :param columns: столбцы csv, если None - читаются из заголовка
+    :param max_rows: максимальное количество читаемых строк
+    :param usecols: разбираемые столбцы, если None - все
+    :return: кортеж из фрейма дописанных строк, смещения после прочитанных строк и столбцов csv
+    """
+    with open(path, 'rb') as read_file:
+        if offset == 0:
+            header = read_file.readline()
+            if not header.endswith(b'\n'):
+                return pd.DataFrame(columns=columns), 0, columns
+            columns = header.decode().strip().split(',')
+            offset = len(header)
+        read_file.seek(offset)
+        data = read_file.read()
+
+    # Последняя строка может быть дописана не полностью
+    line_ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord('\n'))
+    if max_rows is not None:
+        line_ends = line_ends[:max(max_rows, 0)]
+    if not len(line_ends):
+        return pd.DataFrame(columns=columns if usecols is None else usecols), offset, columns
+    end = int(line_ends[-1]) + 1
+    return pd.read_csv(io.BytesIO(data[:end]), header=None, names=columns, usecols=usecols), offset + end, columns
+
+
+def line_offset(path: str, lines: int, block: int = 16 * 2 ** 20) -> Union[int, None]:
+    """
+    Функция смещения после заданного количества переводов строки, файл читается блоками
+    :param path: путь до файла
+    :param lines: количество строк (с заголовком)
+    :param block: размер блока чтения в байтах
+    :return: смещение в байтах или None, если строк в файле меньше
+    """
+    offset, found = 0, 0
+    with open(path, 'rb') as read_file:
+        while found < lines:
+            data = read_file.read(block)
+            if not data:
+                return None
+            line_ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord('\n'))
+            if found + len(line_ends) >= lines:
+                return offset + int(line_ends[lines - found - 1]) + 1
+            found += len(line_ends)
+            offset += len(data)
+    return offset
+
+
+def read_power_tail(data: str, power_index: str, paths: Dict[str, str]) -> np.ndarray:
+    """
+    Функция серии мощности объекта в режиме дописывания: из файла срезов разбираются только строки, дописанные
+    после предыдущего вызова, и дописываются в npy серии мощности. Начальная серия берется из поколоночного
+    кэша срезов один раз, ее последняя строка перечитывается, так как могла быть дописана не полностью
+    :param data: путь до файла срезов объекта
+    :param power_index: kks датчика мощности
+    :param paths: словарь путей состояния power_tail, серии power_values и поколоночного кэша columnar
+    :return: серия мощности, отображенная в память
+    """
+    parameters = {'data': os.path.abspath(data), 'power_index': power_index}
+    try:
+        with open(paths['power_tail'], 'r') as read_file:
+            state = json.load(read_file)
+        if state['parameters'] != parameters or os.path.getsize(data) < state['offset'] or \
+                len(np.load(paths['power_values'], mmap_mode='r')) != state['rows']:
+            state = None
+    except (OSError, ValueError, KeyError):
+        state = None
+
+    if state is None:
+        values = columnar.read_column(data, power_index, paths['columnar']).astype(float)
+        rows = max(len(values) - 1, 0)
+        offset = line_offset(data, rows + 1)
+        if offset is None:
+            raise ValueError(f"{data} is shorter than its columnar cache")
+        with open(data, 'rb') as read_file:
+            columns = read_file.readline().decode().strip().split(',')
+        with open(temporary_path(paths['power_values']), 'wb') as write_file:
+            np.save(write_file, values[:rows])
+        os.replace(temporary_path(paths['power_values']), paths['power_values'])
+        state = {'parameters': parameters, 'offset': offset, 'columns': columns, 'rows': rows}
+
+    appended, state['offset'], state['columns'] = read_appended_rows(data, state['offset'], state['columns'],
+                                                                     usecols=[power_index])
+    if len(appended):
+        columnar.append_npy(paths['power_values'], appended[power_index].to_numpy(dtype=float))
+        state['rows'] += len(appended)
+    with open(temporary_path(paths['power_tail']), 'w') as write_file:
+        json.dump(state, write_file)
+    os.replace(temporary_path(paths['power_tail']), paths['power_tail'])
+    return np.load(paths['power_values'], mmap_mode='r')
+
+
+def count_appended_rows(path: str, state: dict) -> None:
+    """
+    Процедура подсчета дописанных строк csv лосса с сохранением смещений каждой TAIL_CHECKPOINT строки
+    :param path: путь до csv лосса
+    :param state: состояние лосса: смещение, количество строк, столбцы и смещения контрольных строк
+    :return: None
+    """
+    with open(path, 'rb') as read_file:
+        if state['offset'] == 0:
+            header = read_file.readline()
+            if not header.endswith(b'\n'):
+                return
+            state['columns'] = header.decode().strip().split(',')
+            state['offset'] = len(header)
+        read_file.seek(state['offset'])
+        data = read_file.read()
+
+    line_starts = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord('\n')) + 1
+    rows = state['rows'] + np.arange(len(line_starts))
+    # Строка с номером rows[k] + 1 начинается после k-го перевода строки
+    checkpoints = (rows + 1) % TAIL_CHECKPOINT == 0
+    state['checkpoints'] += (state['offset'] + line_starts[checkpoints]).tolist()
+    state['rows'] += len(line_starts)
+    state['offset'] += int(line_starts[-1]) if len(line_starts) else 0
+
+
+def read_loss_rows(path: str, state: dict, begin: int, end: int) -> pd.DataFrame:
+    """
+    Функция чтения строк лосса [begin, end) от ближайшей контрольной строки без чтения всего файла
+    :param path: путь до csv лосса
+    :param state: состояние лосса count_appended_rows
+    :param begin: индекс первой строки
+    :param end: индекс строки после последней
+    :return: фрейм строк лосса
+    """
+    checkpoint = begin // TAIL_CHECKPOINT
+    with open(path, 'rb') as read_file:
+        if checkpoint == 0:
+            read_file.readline()
+        else:
+            read_file.seek(state['checkpoints'][checkpoint - 1])
+        base = checkpoint * TAIL_CHECKPOINT
+        loss_df = pd.read_csv(read_file, header=None, names=state['columns'], nrows=end - base)
+    return loss_df.iloc[begin - base:].reset_index(drop=True)
+
+
+def tail_parameters(object_config: dict, post_processing: dict) -> dict:
+    """
+    Функция параметров, при изменении которых состояние выделения в режиме дописывания строится заново
+    :param object_config: конфиг объекта
+    :param post_processing: параметры постобработки
+    :return: словарь параметров
+    """
+    return {
+        'object_config': {key: value for key, value in object_config.items() if key != 'count_of_groups'},
+        'post_processing': dict(post_processing)
+    }
+
+
+def read_tail_state(path: str, paths: Dict[str, str], parameters: dict) -> Union[dict, None]:
+    """
+    Функция чтения состояния выделения в режиме дописывания, если оно соответствует файлам и параметрам группы
+    :param path: путь до состояния
+    :param paths: словарь путей predict, loss, roll и json_interval группы
+    :param parameters: параметры tail_parameters
+    :return: состояние группы или None, если состояния нет, предикт переписан, параметры или результаты изменились
+    """
+    try:
+        with open(path, 'r') as read_file:
+            state = json.load(read_file)
+    except (OSError, ValueError):
+        return None
+
+    def outputs_unchanged() -> bool:
+        return all(os.path.isfile(paths[name]) and os.stat(paths[name]).st_mtime_ns == state['outputs'][name]
+                   for name in ('roll', 'json_interval'))
+
+    if state['parameters'] == parameters and os.path.getsize(paths['predict']) >= state['predict']['offset'] and \
+            os.path.getsize(paths['loss']) >= state['loss']['offset'] and outputs_unchanged():
+        return state
+    return None
+
+
+def write_tail_state(path: str, state: dict, paths: Dict[str, str]) -> None:
+    """
+    Процедура атомарной записи состояния выделения в режиме дописывания с временем изменения результатов группы
+    :param path: путь до состояния
+    :param state: состояние группы
+    :param paths: словарь путей roll и json_interval группы
+    :return: None
+    """
+    state['outputs'] = {name: os.stat(paths[name]).st_mtime_ns for name in ('roll', 'json_interval')}
+    with open(temporary_path(path), 'w') as write_file:
+        json.dump(state, write_file)
+    os.replace(temporary_path(path), path)
+
+
+def bootstrap_tail_state(paths: Dict[str, str], object_config: dict, post_processing: dict,
+                         parameters: dict, power_low: np.ndarray) -> Union[dict, None]:
+    """
+    Функция начального состояния выделения в режиме дописывания по результатам пакетного выделения группы:
+    roll и json группы не переписываются, состояние сглаживания, серий нулей и незавершенных отрезков
+    восстанавливается по roll, как если бы его строки обработал режим дописывания
+    :param paths: словарь путей predict, loss, roll и json_interval группы
+    :param object_config: конфиг объекта
+    :param post_processing: параметры постобработки
+    :param parameters: параметры tail_parameters
+    :param power_low: маска низкой мощности объекта (True - в окне есть мощность ниже отсечки)
+    :return: состояние группы или None, если строк предикта меньше, чем строк roll (предикт переписан)
+    """
+    values = columnar.read_records(paths['roll'])['target_value'].to_numpy(dtype=float)
+    rows = len(values)
+
+    # Смещение после строк предикта, вошедших в roll, и несглаженный хвост для окна сглаживания
+    with open(paths['predict'], 'rb') as read_file:
+        data = read_file.read()
+    line_ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord('\n'))
+    if len(line_ends) < rows + 1:
+        return None
+    columns = data[:line_ends[0]].decode().strip().split(',')
+    offset = int(line_ends[rows]) + 1
+    raw_tail = []
+    if post_processing['roll_in_hours'] >= 0:
+        tail_rows = min(max(post_processing['roll_in_hours'] * object_config['number_of_sample'] - 1, 0), rows)
+        if tail_rows:
+            raw_tail = pd.read_csv(io.BytesIO(data[int(line_ends[rows - tail_rows]) + 1:offset]), header=None,
+                                   names=columns)['target_value'].to_numpy(dtype=float).tolist()
+
+    loss = {'offset': 0, 'columns': None, 'rows': 0, 'checkpoints': []}
+    count_appended_rows(paths['loss'], loss)
+
+    # Пакетный проход коротких интервалов начинается с незавершенного отрезка длинного прохода
+    long_hit = (values > post_processing['threshold_long']) & engine.align_mask(power_low, rows)
+    _, _, long_len, long_count = engine.scan_pass(long_hit, post_processing['count_continue_long'])
+    _, _, detection = engine.get_interval_tail(
+        values,
+        threshold_short=post_processing['threshold_short'],
+        threshold_long=post_processing['threshold_long'],
+        len_long=post_processing['len_long'],
+        len_short=post_processing['len_short'],
+        power_low=engine.align_mask(power_low, rows),
+        state={'short_carry': (long_len, long_count)},
+        count_continue_short=post_processing['count_continue_short'],
+        count_continue_long=post_processing['count_continue_long'])
+    # Короткие интервалы, ожидающие завершения длинного отрезка, пакетное выделение уже записало в json
+    detection['short_pending'] = []
+
+    return {
+        'parameters': parameters,
+        'predict': {'offset': offset, 'columns': columns, 'rows': rows},
+        'loss': loss,
+        'raw_tail': raw_tail,
+        'pending': None,
+        'last_value': float(values[-1]) if rows else None,
+        'detection': detection,
+        'deferred': [],
+        'outputs': None
+    }
+
+
+def ensure_batch_outputs(paths: Dict[str, str], group: int, object_config: dict, post_processing: dict,
+                         power: pd.Series, power_low: np.ndarray) -> None:
+    """
+    Процедура пакетного выделения группы, если ее результаты отсутствуют или получены с другими параметрами
+    по манифесту объекта: режим дописывания продолжает результаты пакетного выделения
+    :param paths: словарь путей группы tail_detection_group
+    :param group: номер группы
+    :param object_config: конфиг объекта
+    :param post_processing: параметры постобработки
+    :param power: серия мощности объекта
+    :param power_low: маска низкой мощности объекта (True - в окне есть мощность ниже отсечки)
+    :return: None
+    """
+    parameters = tail_parameters(object_config, post_processing)
+    manifest = read_manifest(paths['manifest'])
+    previous = manifest['groups'].get(str(group))
+    if previous is not None and all(previous.get(key) == value for key, value in parameters.items()) and \
+            os.path.isfile(paths['roll']) and os.path.isfile(paths['json_interval']):
+        return
+
+    job = {'group': group, 'paths': dict(paths), 'object_config': object_config, 'post_processing': post_processing}
+    job['signature'] = group_signature(job)
+    job['paths']['roll_cache'] = os.path.join(paths['roll_cache'],
+                                              f"roll_{group}_{roll_cache_key(job['signature'])}.npz")
+    job['paths']['roll_csv'] = paths['roll_csv'] if os.path.isfile(paths['roll_csv']) else None
+    logger.info(f"{paths['json_interval']} is not up to date, batch detection")
+    interval_detection_group(job['paths'], object_config, post_processing, power, power_low)
+    manifest['groups'][str(group)] = job['signature']
+    write_manifest(paths['manifest'], manifest)
+
+
+def tail_detection_group(paths: Dict[str, str], group: int, object_config: dict, post_processing: dict,
+                         power: Callable[[], np.ndarray]) -> Union[dict, None]:
+    """
+    Функция выделения интервалов группы в режиме дописывания: обрабатываются только строки, дописанные
+    в предикт после предыдущего вызова, состояние сглаживания, серий нулей и незавершенных интервалов
+    сохраняется между вызовами, roll группы дополняется, новые интервалы дописываются в конец json группы.
+    Начальное состояние строится по результатам пакетного выделения, их нумерация интервалов не меняется
+    :param paths: словарь путей predict, loss, roll, roll_csv, json_interval, loss_mean, columnar, tail группы,
+    директории кэша сглаженных рядов roll_cache и манифеста объекта
+    :param group: номер группы
+    :param object_config: конфиг объекта
+    :param post_processing: параметры постобработки
+    :param power: функция серии мощности объекта, вызывается, только если в группу дописаны строки
+    :return: словарь новых интервалов и незавершенного интервала группы или None, если строк не дописано
+    """
+    parameters = tail_parameters(object_config, post_processing)
+    state = read_tail_state(paths['tail'], paths, parameters)
+    if state is None:
+        power_low = engine.power_low_mask(power(), object_config['power_limit'], object_config['left_power_shift'],
+                                          object_config['right_power_shift'])
+        ensure_batch_outputs(paths, group, object_config, post_processing, pd.Series(power()), power_low)
+        state = bootstrap_tail_state(paths, object_config, post_processing, parameters, power_low)
+        if state is None:
+            raise ValueError(f"{paths['predict']} is shorter than {paths['roll']}")
+        write_tail_state(paths['tail'], state, paths)
+
+    # Предикт читается не дальше строк, уже дописанных в лосс; без новых строк мощность не читается
+    count_appended_rows(paths['loss'], state['loss'])
+    if state['loss']['rows'] <= state['predict']['rows']:
+        return None
+    predict_df, state['predict']['offset'], state['predict']['columns'] = read_appended_rows(
+        paths['predict'], state['predict']['offset'], state['predict']['columns'],
+        state['loss']['rows'] - state['predict']['rows'])
+    if not len(predict_df):
+        return None
+
+    # Сглаживание дописанных строк с окном, продолжающим сохраненный хвост предыдущих строк
+    window = post_processing['roll_in_hours'] * object_config['number_of_sample']
+    raw = predict_df['target_value'].to_numpy(dtype=float)
+    rolled = raw.copy()
+    if post_processing['roll_in_hours'] >= 0:
+        extended = np.concatenate((state['raw_tail'], raw))
+        rolled = pd.Series(extended).rolling(window=window, min_periods=1).mean().to_numpy(copy=True)
+        rolled = rolled[len(state['raw_tail']):]
+        # Первые window строк ряда не сглаживаются, как в rolling_probability
+        head = max(min(window - state['predict']['rows'], len(raw)), 0)
+        rolled[:head] = raw[:head]
+        state['raw_tail'] = extended[len(extended) - max(window - 1, 0):].tolist()
+    state['predict']['rows'] += len(predict_df)
+    rolled[np.isnan(rolled)] = 0
+    predict_df['target_value'] = rolled
+
+    # Незаполненная серия нулей в конце ряда ждет следующих строк: она заполняется, если ее прервет
+    # ненулевое значение раньше count_next отсчетов
+    count_next = 24 * object_config['number_of_sample']
+    if state['pending'] is not None:
+        predict_df = pd.concat((pd.DataFrame(state['pending']), predict_df), ignore_index=True)
+    values = predict_df['target_value'].to_numpy(dtype=float, copy=True)
+    predecessor = [] if state['last_value'] is None else [state['last_value']]
+    values = engine.fill_zero_runs(np.concatenate((predecessor, values)), count_next)[len(predecessor):]
+    predict_df['target_value'] = values
+
+    nonzero = np.flatnonzero(values != 0)
+    run_start = int(nonzero[-1]) + 1 if len(nonzero) else 0
+    run_open = run_start < len(values) and len(values) - run_start < count_next and \
+        (run_start > 0 or state['last_value'] is not None)
+    commit = run_start if run_open else len(values)
+    state['pending'] = predict_df.iloc[commit:].to_dict('list') if commit < len(values) else None
+    roll_append = predict_df.iloc[:commit]
+    if commit:
+        state['last_value'] = float(values[commit - 1])
+
+    # Маска низкой мощности считается только по окну зафиксированных строк: окну отсчета k нужны значения
+    # мощности [k - left_power_shift, k + right_power_shift)
+    offset = state['detection'].get('offset', 0)
+    power_start = max(offset - object_config['left_power_shift'], 0)
+    power_stop = offset + commit + max(object_config['right_power_shift'], 0)
+    power_low = engine.power_low_mask(power()[power_start:power_stop], object_config['power_limit'],
+                                      object_config['left_power_shift'], object_config['right_power_shift'])
+
+    # Инкрементальное выделение по зафиксированным строкам
+    long_new, short_new, state['detection'] = engine.get_interval_tail(
+        roll_append['target_value'].to_numpy(dtype=float),
+        threshold_short=post_processing['threshold_short'],
+        threshold_long=post_processing['threshold_long'],
+        len_long=post_processing['len_long'],
+        len_short=post_processing['len_short'],
+        power_low=engine.align_mask(power_low, offset + commit - power_start)[offset - power_start:],
+        state=state['detection'],
+        count_continue_short=post_processing['count_continue_short'],
+        count_continue_long=post_processing['count_continue_long'])
+
+    # Время конца интервала - время строки после него, поэтому интервал до последней строки лосса откладывается
+    intervals = state['deferred'] + [list(interval) for interval in long_new + short_new]
+    state['deferred'] = [interval for interval in intervals if interval[1] >= state['loss']['rows']]
+    intervals = [interval for interval in intervals if interval[1] < state['loss']['rows']]
+
+    # Незавершенный длинный (или короткий) отрезок уже длиннее порога - интервал продолжается
+    processed = state['detection']['offset']
+    open_interval = None
+    for carry, min_len in ((state['detection']['long_carry'], post_processing['len_long']),
+                           (state['detection']['short_carry'], post_processing['len_short'])):
+        if carry[0] > min_len and processed > 0:
+            open_interval = [max(processed - carry[0], 0), processed]
+            break
+
+    # Ранжирование датчиков по строкам лосса, покрывающим новые интервалы
+    records = []
+    ranged = intervals + ([open_interval] if open_interval is not None else [])
+    if ranged:
+        begin = min(interval[0] for interval in ranged)
+        end = max(min(interval[1] + 1, state['loss']['rows']) for interval in ranged)
+        loss_df = read_loss_rows(paths['loss'], state['loss'], begin, end)
+        timestamps = loss_df['timestamp'].astype(str).to_numpy()
+        loss_df = loss_df.drop(columns=['timestamp'])
+        ranking = engine.rank_top_sensors(loss_df.to_numpy(dtype=float),
+                                          [(start - begin, stop - begin) for start, stop in ranged],
+                                          post_processing['count_top'])
+        for (start, stop), (top_index, top_mean) in zip(ranged, ranking):
+            records.append({
+                "time": (timestamps[start - begin], timestamps[min(stop, end - 1) - begin]),
+                "len": stop - start,
+                "index": (start, stop),
+                "top_sensors": loss_df.columns[top_index].to_list(),
+                "measurement": top_mean.tolist()
+            })
+    open_record = records.pop() if open_interval is not None else None
+
+    # Зафиксированные строки дописываются в конец roll группы и его экспорта в csv, если он есть, без перезаписи.
+    # Новые интервалы дописываются в конец json с атомарной заменой, чтобы номера показанных интервалов
+    # не менялись
+    if len(roll_append):
+        columnar.append_records(paths['roll'], roll_append)
+        if os.path.isfile(paths['roll_csv']):
+            roll_append.to_csv(paths['roll_csv'], mode='a', header=False, index=False)
+    if records:
+        with open(paths['json_interval'], 'r') as read_file:
+            json_interval = json.load(read_file)
+        json_interval += records
+        with open(temporary_path(paths['json_interval']), 'w') as json_write:
+            json.dump(json_interval, json_write, indent=4)
+        os.replace(temporary_path(paths['json_interval']), paths['json_interval'])
+    write_tail_state(paths['tail'], state, paths)
+
+    return {'intervals': records, 'open': open_record}
+
+
+def run_tail_detection(source: str, destination: str, config_path: str) -> List[dict]:
+    """
+    Функция выделения интервалов по всем объектам эксперимента в режиме дописывания
+    :param source: путь до эксперимента
+    :param destination: директория, в которой сохраняются сглаженные csv и json интервалы объектов
+    :param config_path: путь до config.yaml
+    :return: список обновлений групп: объект, группа, новые интервалы и незавершенный интервал
+    """
+    with open(config_path, 'r') as read_file:
+        config = yaml.safe_load(read_file)
+
+    updates = []
+    for object_directory in os.listdir(source):
+        object_config = config[object_directory]
+        data_path = os.path.join(destination, OBJECTS, object_directory, 'data')
+        for directory in (OBJECTS, os.path.join(OBJECTS, object_directory), data_path,
+                          os.path.join(data_path, CSV_ROLL), os.path.join(data_path, JSON_INTERVAL),
+                          os.path.join(data_path, LOSS_MEAN), os.path.join(data_path, ROLL_CACHE),
+                          os.path.join(data_path, TAIL_STATE)):
+            make_directory(os.path.join(destination, directory))
+
+        # Серия мощности дописывается один раз на объект и только для групп с дописанными строками: файл
+        # срезов тоже дописывается, из него разбираются только новые строки
+        loaded = {}
+        power_paths = {'power_tail': os.path.join(data_path, f"{TAIL_STATE}power.json"),
+                       'power_values': os.path.join(data_path, f"{TAIL_STATE}power.npy"),
+                       'columnar': os.path.join(destination, COLUMNAR_CACHE)}
+
+        def power() -> np.ndarray:
+            """
+            Функция серии мощности объекта, дописываемой при первом обращении
+            :return: массив значений мощности
+            """
+            if 'power' not in loaded:
+                loaded['power'] = read_power_tail(object_config['data'], object_config['power_index'],
+                                                  power_paths)
+            return loaded['power']
+
+        for i in range(object_config['count_of_groups']):
+            paths = {
+                'predict': os.path.join(source, object_directory, CSV_PREDICT, f"predict_{i}.csv"),
+                'loss': os.path.join(source, object_directory, CSV_LOSS, f"loss_{i}.csv"),
+                'roll': os.path.join(data_path, f"{CSV_ROLL}roll_{i}.npy"),
+                'roll_csv': os.path.join(data_path, f"{CSV_ROLL}roll_{i}.csv"),
+                'json_interval': os.path.join(data_path, f"{JSON_INTERVAL}group_{i}.json"),
+                'loss_mean': os.path.join(data_path, f"{LOSS_MEAN}loss_mean_{i}.npy"),
+                'roll_cache': os.path.join(data_path, ROLL_CACHE),
+                'columnar': os.path.join(destination, COLUMNAR_CACHE),
+                'manifest': os.path.join(data_path, MANIFEST),
+                'tail': os.path.join(data_path, f"{TAIL_STATE}tail_{i}.json")
+            }
+            update = tail_detection_group(paths, i, object_config, config['post_processing'], power)
+            if update is not None:
+                logger.info(f"{paths['json_interval']}: {len(update['intervals'])} new intervals")
+                updates.append({'object': object_directory, 'group': i, **update})
+    return updates
+
+
+def detection_process(queue: Any, cancel: Any, params: dict) -> None:
+    """
+    Процедура выделения интервалов в отдельном процессе с передачей прогресса через очередь
+    :param queue: очередь событий прогресса и итогового статуса
+    :param cancel: событие кооперативной отмены выделения
+    :param params: аргументы run_interval_detection
+    :return: None
+    """
+    try:
+        run_interval_detection(**params, progress=lambda event: queue.put({'type': 'progress', **event}),
+                               cancel=cancel)
+    except DetectionCancelled as cancelled:
+        logger.warning(cancelled)
+        queue.put({'type': 'status', 'status': 'cancelled', 'causeException': str(cancelled)})
+    except Exception as detection_error:
+        logger.exception(detection_error)
+        queue.put({'type': 'status', 'status': 'error', 'causeException': str(detection_error)})
+    else:
+        queue.put({'type': 'status', 'status': 'success'})
+
+
+def main():
+    try:
+        args = parse_args()
+    except SystemExit:
+        logger.info("finished")
+        exit(0)
+
+    def write_complete_log(event: dict) -> None:
+        """
+        Процедура записи процента выполнения в complete.log
+        :param event: событие прогресса
+        :return: None
+        """
+        with open('complete.log', 'w') as write_file:
+            write_file.write(f"{event['percent']}%")
+
+    if args.worker:
+        serve_jobs(args.job_dir, wait_run=True)
+        return
+
+    if args.tail:
+        run_tail_detection(args.source, args.destination, args.config)
+        return
+
+    try:
+        run_interval_detection(args.source, args.destination, args.config, args.workers, args.engine, args.force,
+                               progress=write_complete_log, job_dir=args.job_dir,
+                               memory_budget=args.memory_budget * 2 ** 20, roll_csv=args.roll_csv,
+                               chrome_trace=args.chrome_trace)
+    except OSError:
+        exit(0)
 
     os.remove('complete.log')
 
@@ -0,0 +1,380 @@
+"""
+Модуль содержит векторизованный (NumPy) движок выделения аномальных интервалов
+"""
+import numpy as np
+import pandas as pd
+
+import utils.interval_index as interval_index
+
+from typing import Union, Tuple, List, Optional, Iterable
+
+# Относительный допуск равенства средних лосса: средние из разностей префиксных сумм отличаются от прямого
+# среднего на ошибку округления, поэтому средние в пределах допуска считаются равными
+MEANS_RTOL = 1e-9
+
+
+def power_low_mask(power: Union[pd.Series, np.ndarray], power_limit: Union[int, float],
+                   left_power_shift: int = 15, right_power_shift: int = 15) -> np.ndarray:
+    """
+    Функция вычисления маски низкой мощности для всех отсчетов за один проход по префиксным суммам. Длинный
+    интервал продолжается только в отсчетах, где маска True, то есть рядом с мощностью ниже отсечки
+    :param power: серия мощности power
+    :param power_limit: отсечка по мощности
+    :param left_power_shift: количество отсчетов окна слева от текущего
+    :param right_power_shift: количество отсчетов окна справа от текущего
+    :return: булев массив, элемент k которого True, если в окне [k - left_power_shift, k + right_power_shift)
+    хотя бы одно значение мощности меньше отсечки
+    """
+    power_values = np.asarray(power, dtype=float)
+    power_len = len(power_values)
+    # Префиксное количество отсчетов мощности ниже отсечки
+    low_count = np.concatenate(([0], np.cumsum(power_values < power_limit)))
+
+    # Окна отсчетов за концом серии мощности еще пересекаются с ее хвостом на left_power_shift отсчетов
+    positions = np.arange(power_len + max(left_power_shift, 0))
+    start = np.clip(positions - left_power_shift, 0, power_len)
+    stop = np.clip(positions + right_power_shift, 0, power_len)
+    return low_count[stop] - low_count[np.minimum(start, stop)] > 0
+
+
+def align_mask(mask: np.ndarray, length: int) -> np.ndarray:
+    """
+    Функция приведения маски к количеству отсчетов target_value: недостающие отсчеты считаются False
+    :param mask: булев массив маски
+    :param length: количество отсчетов target_value
+    :return: булев массив длины length
+    """
+    if len(mask) == length:
+        return mask
+    aligned = np.zeros(length, dtype=bool)
+    aligned[:min(length, len(mask))] = mask[:length]
+    return aligned
+
+
+def fill_zero_runs(values: np.ndarray, count_next: int = 288, inplace: bool = False) -> np.ndarray:
+    """
+    Функция заполнения серий нулей короче count_next предшествующим серии значением
+    :param values: массив target_value
+    :param count_next: количество индексов в сутках
+    :param inplace: заполнять переданный буфер без копирования
+    :return: массив с заполненными сериями нулей
+    """
+    if not inplace:
+        values = values.copy()
+    length = len(values)
+
+    # Кодирование серий нулей длинами: границы серий по перепадам маски
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], values == 0, [0])).astype(np.int8)))
+    starts, ends = edges[::2], edges[1::2]
+
+    # Заполняются только серии, за которыми следует ненулевое значение и перед которыми есть значение
+    fill = (ends - starts < count_next) & (starts > 0) & (ends < length)
+    fill_mask = interval_index.coverage_mask(zip(starts[fill], ends[fill]), length)
+
+    # Индекс последнего незаполняемого отсчета для каждого отсчета
+    positions = np.arange(length)
+    last = np.maximum.accumulate(np.where(fill_mask, 0, positions))
+    values[fill_mask] = values[last[fill_mask]]
+    return values
+
+
+def scan_pass(hit: np.ndarray, count_continue: int, carry_len: int = 0,
+              carry_count: int = 0) -> Tuple[np.ndarray, np.ndarray, int, int]:
+    """
+    Функция одного прохода поиска интервалов: находит отсчеты обрыва интервала и длины накопленных отрезков
+    :param hit: булев массив отсчетов, превысивших порог
+    :param count_continue: количество отсчетов для прерывания интервала
+    :param carry_len: длина отрезка, накопленного до начала прохода
+    :param carry_count: счетчик отсчетов ниже порога, накопленный до начала прохода
+    :return: кортеж из индексов обрыва, длин отрезков на обрыве, длины и счетчика незавершенного отрезка
+    """
+    length = len(hit)
+    period = count_continue + 1
+    positions = np.arange(length)
+
+    # Номер отсчета ниже порога внутри серии таких отсчетов (счетчик count без учета обрывов)
+    last_hit = np.maximum.accumulate(np.where(hit, positions, -1)) if length else positions
+    run_pos = positions - last_hit
+
+    # В ведущей серии счетчик продолжается с carry_count, поэтому первый обрыв наступает раньше
+    first_reset = max(period - carry_count, 1)
+    leading = last_hit < 0
+    reset = np.where(leading,
+                     (run_pos >= first_reset) & ((run_pos - first_reset) % period == 0),
+                     run_pos % period == 0) & ~hit
+    reset_idx = np.flatnonzero(reset)
+
+    # Длина отрезка на обрыве - расстояние до предыдущего обрыва (или до начала с учетом перенесенного отрезка)
+    previous = np.concatenate(([-1 - carry_len], reset_idx[:-1]))
+    lengths = reset_idx - previous
+
+    # Состояние незавершенного отрезка в конце прохода
+    end_len = int(length - 1 - reset_idx[-1]) if len(reset_idx) else length + carry_len
+    last_event = max(int(last_hit[-1]) if length else -1, int(reset_idx[-1]) if len(reset_idx) else -1)
+    end_count = length - 1 - last_event if last_event >= 0 else carry_count + length
+
+    return reset_idx, lengths, end_len, end_count
+
+
+def get_interval(target_value: pd.Series,
+                 threshold_short: int,
+                 threshold_long: int,
+                 len_long: int,
+                 len_short: int,
+                 power: pd.Series,
+                 power_limit: Union[int, float],
+                 count_continue_short: int = 10,
+                 count_continue_long: int = 15,
+                 left_power_shift: int = 15,
+                 right_power_shift: int = 15,
+                 power_low: np.ndarray = None) -> Tuple[List[List[float]], List[Tuple[int, int]], int]:
+    """
+    Функция векторизованного выделения аномальных интервалов по параметрам постобработки
+    :param target_value: серия target_value
+    :param threshold_short: порог коротких интервалов
+    :param threshold_long: порог длинных интервалов
+    :param len_long: минимальное расстояние обнаружения длинного интервала
+    :param len_short: минимальное расстояние обнаружения короткого интервала
+    :param power: серия мощности power
+    :param power_limit: отсечка по мощности
+    :param count_continue_short: количество отсчетов для прерывания короткого интервала
+    :param count_continue_long: количество отсчетов для прерывания длинного интервала
+    :param left_power_shift: количество отсчетов окна мощности слева от текущего
+    :param right_power_shift: количество отсчетов окна мощности справа от текущего
+    :param power_low: заранее вычисленная маска низкой мощности power_low_mask, если None - вычисляется по power
+    :return: Кортеж из списка значений интервалов, списка кортежей индексов и суммарной длины аномалий
+    """
+    values = np.asarray(target_value, dtype=float)
+    length = len(values)
+
+    # Проход длинных интервалов
+    if power_low is None:
+        power_low = power_low_mask(power, power_limit, left_power_shift, right_power_shift)
+    long_hit = (values > threshold_long) & align_mask(power_low, length)
+    long_reset, long_lengths, carry_len, carry_count = scan_pass(long_hit, count_continue_long)
+    long_keep = long_lengths > len_long
+    long_ends = long_reset[long_keep] + 1
+    long_starts_raw = long_ends - long_lengths[long_keep]
+    long_starts = np.maximum(long_starts_raw, 0)
+
+    # Проход коротких интервалов продолжается с незавершенным отрезком длинного прохода
+    short_hit = values > threshold_short
+    short_reset, short_lengths, _, _ = scan_pass(short_hit, count_continue_short, carry_len, carry_count)
+    short_ends = short_reset + 1
+    short_starts_raw = short_ends - short_lengths
+    in_long = interval_index.index_contains_many(
+        interval_index.build_interval_index(zip(long_starts, long_ends)), short_starts_raw)
+    short_keep = (short_lengths > len_short) & ~in_long
+    short_ends = short_ends[short_keep]
+    short_starts_raw = short_starts_raw[short_keep]
+    short_starts = np.maximum(short_starts_raw, 0)
+
+    # Значения интервалов: отрезок короткого прохода может начинаться в хвосте длинного прохода
+    extended = np.concatenate((values[length - carry_len:], values))
+    interval_list = [values[start:end].tolist() for start, end in zip(long_starts_raw, long_ends)] + \
+                    [extended[start + carry_len:end + carry_len].tolist()
+                     for start, end in zip(short_starts_raw, short_ends)]
+    idx_list = [(int(start), int(end)) for start, end in zip(long_starts, long_ends)] + \
+               [(int(start), int(end)) for start, end in zip(short_starts, short_ends)]
+    sum_anomaly = int(long_lengths[long_keep].sum() + short_lengths[short_keep].sum())
+
+    return interval_list, idx_list, sum_anomaly
+
+
+def get_interval_tail(target_value: np.ndarray,
+                      threshold_short: int,
+                      threshold_long: int,
+                      len_long: int,
+                      len_short: int,
+                      power_low: np.ndarray,
+                      state: dict,
+                      count_continue_short: int = 10,
+                      count_continue_long: int = 15) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]], dict]:
+    """
+    Функция инкрементального выделения интервалов по дописанным отсчетам: проходы длинных и коротких интервалов
+    продолжаются с незавершенных отрезков предыдущего вызова
+    :param target_value: массив дописанных отсчетов target_value
+    :param threshold_short: порог коротких интервалов
+    :param threshold_long: порог длинных интервалов
+    :param len_long: минимальное расстояние обнаружения длинного интервала
+    :param len_short: минимальное расстояние обнаружения короткого интервала
+    :param power_low: маска низкой мощности power_low_mask дописанных отсчетов
+    :param state: состояние предыдущего вызова (пустой словарь для первого вызова)
+    :param count_continue_short: количество отсчетов для прерывания короткого интервала
+    :param count_continue_long: количество отсчетов для прерывания длинного интервала
+    :return: кортеж из новых длинных интервалов, новых коротких интервалов и состояния для следующего вызова
+    """
+    values = np.asarray(target_value, dtype=float)
+    offset = state.get('offset', 0)
+    length = len(values)
+
+    # Проход длинных интервалов с незавершенного длинного отрезка
+    long_hit = (values > threshold_long) & align_mask(power_low, length)
+    long_reset, long_lengths, long_len, long_count = scan_pass(long_hit, count_continue_long,
+                                                               *state.get('long_carry', (0, 0)))
+    long_keep = long_lengths > len_long
+    long_ends = long_reset[long_keep] + 1 + offset
+    long_new = [(int(max(end - size, 0)), int(end)) for end, size in zip(long_ends, long_lengths[long_keep])]
+    long_intervals = [tuple(interval) for interval in state.get('long_intervals', [])] + long_new
+
+    # Проход коротких интервалов с незавершенного короткого отрезка
+    short_reset, short_lengths, short_len, short_count = scan_pass(values > threshold_short, count_continue_short,
+                                                                   *state.get('short_carry', (0, 0)))
+    short_keep = short_lengths > len_short
+    short_ends = short_reset[short_keep] + 1 + offset
+    candidates = [tuple(candidate) for candidate in state.get('short_pending', [])] + \
+        [(int(end - size), int(end)) for end, size in zip(short_ends, short_lengths[short_keep])]
+
+    # Отрезки длинного прохода разбивают ряд, поэтому короткий интервал решен, если его начало раньше
+    # незавершенного длинного отрезка, иначе он ждет завершения этого отрезка
+    open_long_start = offset + length - long_len
+    starts = np.array([start for start, _ in candidates], dtype=np.int64)
+    in_long = interval_index.index_contains_many(interval_index.build_interval_index(long_intervals), starts)
+    resolved = starts < open_long_start
+    short_new = [(max(start, 0), end) for (start, end), inside, done in zip(candidates, in_long, resolved)
+                 if done and not inside]
+
+    state = {
+        'offset': offset + length,
+        'long_carry': (long_len, long_count),
+        'short_carry': (short_len, short_count),
+        'long_intervals': long_intervals,
+        'short_pending': [candidate for candidate, done in zip(candidates, resolved) if not done]
+    }
+    return long_new, short_new, state
+
+
+def loss_prefix_sums(loss_values: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Функция построения префиксных сумм матрицы лосса для вычисления средних на любом интервале
+    :param loss_values: матрица лосса (отсчеты x датчики)
+    :return: кортеж из префиксных сумм значений без Nan и префиксного количества не Nan значений
+    (None, если Nan в матрице нет)
+    """
+    nan_mask = np.isnan(loss_values)
+    has_nan = nan_mask.any()
+    prefix_sum = np.zeros((loss_values.shape[0] + 1, loss_values.shape[1]), dtype=np.float64)
+    np.cumsum(np.where(nan_mask, 0, loss_values) if has_nan else loss_values, axis=0, out=prefix_sum[1:])
+    prefix_count = None
+    if has_nan:
+        prefix_count = np.zeros(prefix_sum.shape, dtype=np.int64)
+        np.cumsum(~nan_mask, axis=0, out=prefix_count[1:])
+    return prefix_sum, prefix_count
+
+
+def interval_means(prefix: Tuple[np.ndarray, Optional[np.ndarray]], begin: int, end: int) -> np.ndarray:
+    """
+    Функция вычисления среднего лосса датчиков на интервале [begin, end) по префиксным суммам за O(датчиков)
+    :param prefix: префиксные суммы loss_prefix_sums
+    :param begin: индекс начала интервала
+    :param end: индекс конца интервала
+    :return: массив средних по датчикам (Nan для датчиков без значений на интервале)
+    """
+    prefix_sum, prefix_count = prefix
+    length = prefix_sum.shape[0] - 1
+    begin, end = min(max(begin, 0), length), min(max(end, 0), length)
+    end = max(begin, end)
+    count = prefix_count[end] - prefix_count[begin] if prefix_count is not None \
+        else np.full(prefix_sum.shape[1], end - begin)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, (prefix_sum[end] - prefix_sum[begin]) / np.maximum(count, 1), np.nan)
+
+
+def top_sensors(means: np.ndarray, count_top: int, rtol: float = MEANS_RTOL) -> np.ndarray:
+    """
+    Функция выбора count_top датчиков с наибольшим средним лоссом без полной сортировки
+    :param means: массив средних по датчикам
+    :param count_top: количество топовых датчиков
+    :param rtol: допуск равенства средних относительно наибольшего по модулю среднего
+    :return: индексы топовых датчиков по убыванию среднего (Nan в конце, равные в пределах допуска - в порядке
+    столбцов)
+    """
+    count_top = min(count_top, len(means))
+    if count_top <= 0:
+        return np.array([], dtype=np.int64)
+    key = np.where(np.isnan(means), -np.inf, means)
+    finite = key[np.isfinite(key)]
+    tolerance = rtol * np.abs(finite).max() if len(finite) else 0.0
+
+    # Частичный отбор с добором датчиков, равных пороговому значению в пределах допуска
+    threshold = key[np.argpartition(-key, count_top - 1)[:count_top]].min()
+    candidates = np.flatnonzero(key >= threshold - tolerance)
+    candidates = candidates[np.lexsort((candidates, -key[candidates]))]
+
+    # Соседние по убыванию средние в пределах допуска образуют группу равных, упорядоченную по столбцам
+    values = key[candidates]
+    with np.errstate(invalid='ignore'):
+        groups = np.cumsum(np.concatenate(([True], values[:-1] - values[1:] > tolerance)))
+    return candidates[np.lexsort((candidates, groups))][:count_top]
+
+
+def rank_top_sensors(loss_values: np.ndarray, idx_list: List[Tuple[int, int]],
+                     count_top: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Функция ранжирования датчиков по среднему лоссу для всех интервалов группы
+    :param loss_values: матрица лосса (отсчеты x датчики)
+    :param idx_list: список кортежей индексов интервалов
+    :param count_top: количество топовых датчиков
+    :return: список кортежей из индексов топовых датчиков и их средних для каждого интервала
+    """
+    prefix = loss_prefix_sums(loss_values)
+    ranking = []
+    for begin, end in idx_list:
+        means = interval_means(prefix, begin, end)
+        top = top_sensors(means, count_top)
+        ranking.append((top, means[top]))
+    return ranking
+
+
+def rank_top_sensors_chunked(chunks: Iterable[np.ndarray], idx_list: List[Tuple[int, int]],
+                             count_top: int) -> Tuple[List[Tuple[np.ndarray, np.ndarray]], np.ndarray]:
+    """
+    Функция ранжирования датчиков по среднему лоссу по блокам строк матрицы лосса: префиксные суммы
+    накапливаются последовательно через границы блоков и сохраняются только в границах интервалов,
+    поэтому средние совпадают с rank_top_sensors, а память не зависит от длины лосса
+    :param chunks: блоки строк матрицы лосса (строки x датчики) по порядку
+    :param idx_list: список кортежей индексов интервалов
+    :param count_top: количество топовых датчиков
+    :return: кортеж из списка индексов топовых датчиков и их средних для каждого интервала и среднего
+    лосса по датчикам в каждом отсчете (Nan считаются нулями) в float32
+    """
+    positions = np.unique(np.maximum(np.asarray(idx_list, dtype=np.int64).reshape(-1), 0))
+    boundary_sum, boundary_count = {}, {}
+    carry_sum, carry_count = None, None
+    row_mean = []
+    offset = 0
+    for chunk in chunks:
+        nan_mask = np.isnan(chunk)
+        values = np.where(nan_mask, 0, chunk).astype(np.float64, copy=False)
+        if carry_sum is None:
+            carry_sum = np.zeros(chunk.shape[1], dtype=np.float64)
+            carry_count = np.zeros(chunk.shape[1], dtype=np.int64)
+        row_mean.append((values.sum(axis=1) / max(chunk.shape[1], 1)).astype(np.float32))
+
+        # Строка k накопленных сумм - префикс до offset + k, нулевая строка - перенос из прошлого блока
+        prefix_sum = np.cumsum(np.vstack((carry_sum, values)), axis=0)
+        prefix_count = np.cumsum(np.vstack((carry_count, ~nan_mask)), axis=0)
+        for position in positions[(positions >= offset) & (positions <= offset + len(chunk))]:
+            boundary_sum[int(position)] = prefix_sum[position - offset].copy()
+            boundary_count[int(position)] = prefix_count[position - offset].copy()
+        carry_sum, carry_count = prefix_sum[-1].copy(), prefix_count[-1].copy()
+        offset += len(chunk)
+    if carry_sum is not None:
+        # Концы интервалов за последней строкой ограничиваются длиной лосса
+        boundary_sum[offset], boundary_count[offset] = carry_sum, carry_count
+
+    ranking = []
+    for begin, end in idx_list:
+        begin, end = min(max(begin, 0), offset), min(max(end, 0), offset)
+        end = max(begin, end)
+        if begin == end:
+            means = np.full(0 if carry_sum is None else len(carry_sum), np.nan)
+        else:
+            count = boundary_count[end] - boundary_count[begin]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means = np.where(count > 0, (boundary_sum[end] - boundary_sum[begin]) / np.maximum(count, 1),
+                                 np.nan)
+        top = top_sensors(means, count_top)
+        ranking.append((top, means[top]))
+    row_mean = np.concatenate(row_mean) if row_mean else np.array([], dtype=np.float32)
+    return ranking, row_mean
@@ -0,0 +1,63 @@
+"""
+Модуль содержит индекс интервалов для быстрой проверки попадания отсчета в выделенные интервалы: исключение
+коротких интервалов, начинающихся внутри длинных (interval_engine.get_interval, get_interval_tail и эталонный
+get_interval_reference), маски заполнения серий нулей и покрытия интервалами при подборе параметров.
+Запись json и отчеты обращаются к интервалам по номеру и обходят их один раз, проверок попадания в них нет
+"""
+from bisect import bisect_right
+
+import numpy as np
+
+from typing import Iterable, Tuple, Union
+
+
+def build_interval_index(idx_list: Iterable[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Функция построения индекса интервалов: начала по возрастанию и накопленный максимум концов
+    :param idx_list: список кортежей индексов интервалов [начало, конец)
+    :return: кортеж из массива начал и массива максимальных концов среди интервалов с не большим началом
+    """
+    intervals = np.array(sorted(idx_list), dtype=np.int64).reshape(-1, 2)
+    return intervals[:, 0], np.maximum.accumulate(intervals[:, 1]) if len(intervals) else intervals[:, 1]
+
+
+def index_contains(index: Tuple[np.ndarray, np.ndarray], position: int) -> bool:
+    """
+    Функция проверки попадания отсчета хотя бы в один интервал индекса за O(log n)
+    :param index: индекс интервалов build_interval_index
+    :param position: индекс отсчета
+    :return: True если отсчет лежит внутри хотя бы одного интервала
+    """
+    starts, max_ends = index
+    pos = bisect_right(starts, position) - 1
+    return pos >= 0 and position < max_ends[pos]
+
+
+def index_contains_many(index: Tuple[np.ndarray, np.ndarray], positions: Union[np.ndarray, Iterable[int]]) -> np.ndarray:
+    """
+    Функция векторизованной проверки попадания массива отсчетов в интервалы индекса
+    :param index: индекс интервалов build_interval_index
+    :param positions: индексы отсчетов
+    :return: булев массив попадания каждого отсчета хотя бы в один интервал
+    """
+    starts, max_ends = index
+    positions = np.asarray(positions, dtype=np.int64)
+    pos = np.searchsorted(starts, positions, side='right') - 1
+    if not len(starts):
+        return np.zeros(len(positions), dtype=bool)
+    return (pos >= 0) & (positions < max_ends[np.maximum(pos, 0)])
+
+
+def coverage_mask(idx_list: Iterable[Tuple[int, int]], length: int) -> np.ndarray:
+    """
+    Функция построения маски покрытия отсчетов интервалами для проверки за O(1)
+    :param idx_list: список кортежей индексов интервалов [начало, конец)
+    :param length: количество отсчетов
+    :return: булев массив длины length, True для отсчетов внутри хотя бы одного интервала
+    """
+    intervals = np.clip(np.array(list(idx_list), dtype=np.int64).reshape(-1, 2), 0, length)
+    intervals = intervals[intervals[:, 0] < intervals[:, 1]]
+    delta = np.zeros(length + 1, dtype=np.int64)
+    np.add.at(delta, intervals[:, 0], 1)
+    np.add.at(delta, intervals[:, 1], -1)
+    return np.cumsum(delta[:-1]) > 0
@@ -0,0 +1,113 @@
+"""
+Модуль содержит предпросмотр выделения интервалов по параметрам постобработки без записи на диск
+"""
+import os
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from typing import Tuple, List, Dict, Union
+
+import utils.get_interval as get_interval
+import utils.interval_engine as engine
+import utils.columnar_cache as columnar
+
+# Количество хранимых в памяти сглаженных рядов групп и масок мощности объектов
+PREVIEW_CACHE_SIZE = 32
+
+
+@lru_cache(maxsize=PREVIEW_CACHE_SIZE)
+def rolled_series(predict_path: str, predict_size: int, predict_mtime_ns: int, roll_in_hours: int,
+                  number_of_sample: int, roll_cache_dir: str, group: int,
+                  columnar_cache_dir: str = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Функция сглаженного ряда группы: из кэша сглаживания выделения интервалов, если он есть, иначе сглаживается
+    в памяти; размер и время изменения предикта входят в ключ, чтобы измененный предикт сглаживался заново
+    :param predict_path: путь до csv предикта группы
+    :param predict_size: размер файла предикта
+    :param predict_mtime_ns: время изменения файла предикта в наносекундах
+    :param roll_in_hours: сглаживание в часах
+    :param number_of_sample: количество индексов в часе
+    :param roll_cache_dir: директория кэша сглаживания объекта
+    :param group: номер группы
+    :param columnar_cache_dir: директория поколоночного кэша csv, если None - читается сам csv
+    :return: кортеж из массива сглаженного target_value и массива строк времени
+    """
+    signature = {
+        'predict': {'size': predict_size, 'mtime_ns': predict_mtime_ns},
+        'post_processing': {'roll_in_hours': roll_in_hours},
+        'object_config': {'number_of_sample': number_of_sample}
+    }
+    roll_cache = os.path.join(roll_cache_dir, f"roll_{group}_{get_interval.roll_cache_key(signature)}.npz")
+    roll_df = get_interval.read_roll_cache(roll_cache)
+    if roll_df is None:
+        logger.info(f"rolled_series({predict_path}, {roll_in_hours})")
+        roll_df = get_interval.roll_predict(columnar.read_frame(predict_path, columnar_cache_dir).reset_index(),
+                                            {'roll_in_hours': roll_in_hours},
+                                            {'number_of_sample': number_of_sample})
+    timestamps = pd.to_datetime(roll_df['timestamp']).dt.strftime('%Y-%m-%d %H:%M:%S').to_numpy()
+    return roll_df['target_value'].to_numpy(dtype=float), timestamps
+
+
+@lru_cache(maxsize=PREVIEW_CACHE_SIZE)
+def power_low(data_path: str, data_mtime_ns: int, power_index: str, power_limit: Union[int, float],
+              left_power_shift: int, right_power_shift: int, columnar_cache_dir: str = None) -> np.ndarray:
+    """
+    Функция маски низкой мощности объекта с кэшированием по времени изменения файла срезов
+    :param data_path: путь до файла срезов объекта
+    :param data_mtime_ns: время изменения файла срезов в наносекундах
+    :param power_index: kks датчика мощности
+    :param power_limit: отсечка по мощности
+    :param left_power_shift: количество отсчетов окна мощности слева от текущего
+    :param right_power_shift: количество отсчетов окна мощности справа от текущего
+    :param columnar_cache_dir: директория поколоночного кэша csv, если None - читается сам csv
+    :return: булев массив маски низкой мощности (True - в окне есть мощность ниже отсечки)
+    """
+    power = get_interval.load_power.__wrapped__(data_path, power_index, columnar_cache_dir)
+    return engine.power_low_mask(power, power_limit, left_power_shift, right_power_shift)
+
+
+def preview_intervals(predict_path: str, roll_cache_dir: str, group: int, object_config: dict,
+                      post_processing: dict, columnar_cache_dir: str = None) -> Dict[str, Union[List, float, int]]:
+    """
+    Функция предпросмотра выделения интервалов группы по параметрам постобработки: сглаженный ряд и маска
+    мощности берутся из памяти, на диск ничего не пишется
+    :param predict_path: путь до csv предикта группы
+    :param roll_cache_dir: директория кэша сглаживания объекта
+    :param group: номер группы
+    :param object_config: конфиг объекта
+    :param post_processing: параметры постобработки
+    :param columnar_cache_dir: директория поколоночного кэша csv
+    :return: словарь с временем и индексами интервалов, суммарной длиной и долей аномалий
+    """
+    predict_stat = os.stat(predict_path)
+    target_value, timestamps = rolled_series(predict_path, predict_stat.st_size, predict_stat.st_mtime_ns,
+                                             post_processing['roll_in_hours'], object_config['number_of_sample'],
+                                             roll_cache_dir, group, columnar_cache_dir)
+    mask = power_low(object_config['data'], os.stat(object_config['data']).st_mtime_ns,
+                     object_config['power_index'], object_config['power_limit'],
+                     object_config['left_power_shift'], object_config['right_power_shift'],
+                     columnar_cache_dir)
+
+    _, idx_list, sum_anomaly = engine.get_interval(target_value,
+                                                   threshold_short=post_processing['threshold_short'],
+                                                   threshold_long=post_processing['threshold_long'],
+                                                   len_long=post_processing['len_long'],
+                                                   len_short=post_processing['len_short'],
+                                                   power=None,
+                                                   power_limit=object_config['power_limit'],
+                                                   count_continue_short=post_processing['count_continue_short'],
+                                                   count_continue_long=post_processing['count_continue_long'],
+                                                   power_low=mask)
+
+    # Время конца интервала - время строки после него, для интервала до конца ряда - время последней строки
+    last = len(timestamps) - 1
+    return {
+        'intervals': [(timestamps[start], timestamps[min(end, last)]) for start, end in idx_list],
+        'index': idx_list,
+        'sum_anomaly': sum_anomaly,
+        'part_of_anomaly': sum_anomaly / len(target_value) if len(target_value) else 0.0
+    }
@@ -0,0 +1,254 @@
+"""
+Модуль содержит общую директорию заданий выделения интервалов для распределения групп между хостами
+"""
+import os
+import json
+import time
+import shutil
+import threading
+
+from typing import Union, Tuple, List, Dict, Optional
+
+# Поддиректории общей директории заданий
+JOBS_PENDING = 'pending'
+JOBS_CLAIMED = 'claimed'
+JOBS_DONE = 'done'
+JOBS_PROGRESS = 'progress'
+JOBS_STATE = 'state.json'
+
+# Состояния запуска координатора
+STATE_RUNNING = 'running'
+STATE_FINISHED = 'finished'
+STATE_CANCELLED = 'cancelled'
+
+# Аренда захваченного задания: воркер продлевает ее, обновляя время изменения дескриптора, а координатор
+# возвращает в очередь задания, аренда которых истекла (воркер завершился или хост недоступен), с
+JOB_LEASE = 120.0
+JOB_HEARTBEAT = 15.0
+
+
+def write_json(path: str, data: Union[dict, list]) -> None:
+    """
+    Процедура атомарной записи json: запись во временный файл и переименование
+    :param path: путь до json
+    :param data: данные
+    :return: None
+    """
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'w') as write_file:
+        json.dump(data, write_file)
+    os.replace(temporary, path)
+
+
+def read_json(path: str) -> Optional[Union[dict, list]]:
+    """
+    Функция чтения json, который может быть удален другим процессом
+    :param path: путь до json
+    :return: данные или None, если файла уже нет
+    """
+    try:
+        with open(path, 'r') as read_file:
+            return json.load(read_file)
+    except FileNotFoundError:
+        return None
+
+
+def job_name(job: dict) -> str:
+    """
+    Функция имени дескриптора задания группы
+    :param job: словарь задания
+    :return: имя файла дескриптора
+    """
+    return f"{job['object']}_group_{job['group']}.json"
+
+
+def open_run(job_dir: str) -> None:
+    """
+    Процедура подготовки общей директории к новому запуску: удаление заданий прошлого запуска
+    :param job_dir: путь до общей директории заданий
+    :return: None
+    """
+    for directory in (JOBS_PENDING, JOBS_CLAIMED, JOBS_DONE, JOBS_PROGRESS):
+        shutil.rmtree(os.path.join(job_dir, directory), ignore_errors=True)
+        os.makedirs(os.path.join(job_dir, directory))
+    set_state(job_dir, STATE_RUNNING)
+
+
+def set_state(job_dir: str, state: str) -> None:
+    """
+    Процедура записи состояния запуска координатора
+    :param job_dir: путь до общей директории заданий
+    :param state: состояние running, finished или cancelled
+    :return: None
+    """
+    write_json(os.path.join(job_dir, JOBS_STATE), {'state': state})
+
+
+def read_state(job_dir: str) -> Optional[str]:
+    """
+    Функция чтения состояния запуска координатора
+    :param job_dir: путь до общей директории заданий
+    :return: состояние или None, если координатор еще не запускался
+    """
+    state = read_json(os.path.join(job_dir, JOBS_STATE))
+    return state['state'] if state is not None else None
+
+
+def write_job(job_dir: str, job: dict) -> str:
+    """
+    Функция записи дескриптора задания группы в очередь
+    :param job_dir: путь до общей директории заданий
+    :param job: словарь задания
+    :return: имя дескриптора
+    """
+    name = job_name(job)
+    write_json(os.path.join(job_dir, JOBS_PENDING, name), job)
+    return name
+
+
+def claim_job(job_dir: str) -> Optional[Tuple[str, dict]]:
+    """
+    Функция захвата задания воркером: дескриптор атомарно переносится из очереди в захваченные,
+    поэтому одно задание достается ровно одному воркеру на любом хосте
+    :param job_dir: путь до общей директории заданий
+    :return: кортеж из имени и словаря задания или None, если очередь пуста
+    """
+    pending = os.path.join(job_dir, JOBS_PENDING)
+    try:
+        names = sorted(os.listdir(pending))
+    except FileNotFoundError:
+        return None
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        claimed = os.path.join(job_dir, JOBS_CLAIMED, name)
+        try:
+            # Аренда отсчитывается от захвата, а не от записи дескриптора в очередь
+            os.utime(os.path.join(pending, name))
+            os.rename(os.path.join(pending, name), claimed)
+        except FileNotFoundError:
+            # Задание уже захвачено другим воркером
+            continue
+        job = read_json(claimed)
+        if job is not None:
+            return name, job
+    return None
+
+
+def keep_claim(job_dir: str, name: str, stop: threading.Event, interval: float = JOB_HEARTBEAT) -> None:
+    """
+    Процедура продления аренды захваченного задания до его завершения, выполняется в фоновом потоке воркера
+    :param job_dir: путь до общей директории заданий
+    :param name: имя дескриптора
+    :param stop: событие завершения задания
+    :param interval: период продления в секундах
+    :return: None
+    """
+    while not stop.wait(interval):
+        try:
+            os.utime(os.path.join(job_dir, JOBS_CLAIMED, name))
+        except FileNotFoundError:
+            # Задание завершено или возвращено координатором в очередь
+            return
+
+
+def requeue_stale(job_dir: str, lease: float = JOB_LEASE) -> List[str]:
+    """
+    Функция возврата в очередь захваченных заданий с истекшей арендой. Время аренды сравнивается со временем
+    изменения файла на общей директории, поэтому оно должно заметно превышать расхождение часов хостов
+    :param job_dir: путь до общей директории заданий
+    :param lease: время аренды в секундах
+    :return: список имен возвращенных дескрипторов
+    """
+    requeued = []
+    claimed = os.path.join(job_dir, JOBS_CLAIMED)
+    for name in sorted(os.listdir(claimed)):
+        if not name.endswith('.json'):
+            continue
+        try:
+            if time.time() - os.path.getmtime(os.path.join(claimed, name)) <= lease:
+                continue
+            if os.path.isfile(os.path.join(job_dir, JOBS_DONE, name)):
+                # Воркер успел записать результат
+                continue
+            os.rename(os.path.join(claimed, name), os.path.join(job_dir, JOBS_PENDING, name))
+        except FileNotFoundError:
+            continue
+        try:
+            os.remove(os.path.join(job_dir, JOBS_PROGRESS, name))
+        except FileNotFoundError:
+            pass
+        requeued.append(name)
+    return requeued
+
+
+def write_progress(job_dir: str, name: str, stage: str) -> None:
+    """
+    Процедура записи текущего этапа захваченного задания
+    :param job_dir: путь до общей директории заданий
+    :param name: имя дескриптора
+    :param stage: этап выделения
+    :return: None
+    """
+    write_json(os.path.join(job_dir, JOBS_PROGRESS, name), {'stage': stage})
+
+
+def read_progress(job_dir: str) -> Dict[str, str]:
+    """
+    Функция чтения текущих этапов заданий в работе
+    :param job_dir: путь до общей директории заданий
+    :return: словарь имя дескриптора - этап
+    """
+    progress = {}
+    for name in os.listdir(os.path.join(job_dir, JOBS_PROGRESS)):
+        if name.endswith('.json'):
+            stage = read_json(os.path.join(job_dir, JOBS_PROGRESS, name))
+            if stage is not None:
+                progress[name] = stage['stage']
+    return progress
+
+
+def finish_job(job_dir: str, name: str, result: dict) -> None:
+    """
+    Процедура завершения задания: запись результата и удаление захваченного дескриптора
+    :param job_dir: путь до общей директории заданий
+    :param name: имя дескриптора
+    :param result: результат со статусом success или error и причиной ошибки
+    :return: None
+    """
+    write_json(os.path.join(job_dir, JOBS_DONE, name), result)
+    for directory in (JOBS_CLAIMED, JOBS_PROGRESS):
+        try:
+            os.remove(os.path.join(job_dir, directory, name))
+        except FileNotFoundError:
+            # Дескриптор уже возвращен координатором в очередь
+            pass
+
+
+def collect_results(job_dir: str) -> List[Tuple[str, dict]]:
+    """
+    Функция сбора результатов завершенных заданий координатором, собранные результаты удаляются
+    :param job_dir: путь до общей директории заданий
+    :return: список кортежей из имени дескриптора и результата
+    """
+    results = []
+    done = os.path.join(job_dir, JOBS_DONE)
+    for name in sorted(os.listdir(done)):
+        if not name.endswith('.json'):
+            continue
+        result = read_json(os.path.join(done, name))
+        if result is not None:
+            os.remove(os.path.join(done, name))
+            results.append((name, result))
+    return results
+
+
+class CancelFlag:
+    """
+    Флаг отмены запуска по состоянию координатора в общей директории, совместим с threading.Event.is_set
+    """
+    def __init__(self, job_dir: str) -> None:
+        self.job_dir = job_dir
+
+    def is_set(self) -> bool:
+        return read_state(self.job_dir) == STATE_CANCELLED
@@ -0,0 +1,307 @@
+"""
+Модуль содержит подбор параметров постобработки по сетке или случайным наборам значений
+"""
+import os
+import sys
+import math
+import json
+import argparse
+import itertools
+import multiprocessing
+import yaml
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from typing import Union, Tuple, List, Dict, Any
+
+# Скрипт запускается из директории utils, добавляем корень приложения для импорта модулей utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.interval_engine as engine
+import utils.interval_index as interval_index
+import utils.interval_preview as preview
+
+# Параметры постобработки, по которым ведется подбор (сглаживание общее для всех наборов)
+SEARCH_PARAMETERS = ('threshold_short', 'threshold_long', 'len_short', 'len_long',
+                     'count_continue_short', 'count_continue_long')
+
+# Наибольшее количество наборов одного подбора по умолчанию: пространство API задается клиентом
+MAX_SEARCH_SETS = 10000
+
+# Сглаженный ряд, маска мощности и цель подбора группы, общие для наборов процесса
+shared_search = {}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="start search of post processing parameters")
+    parser.add_argument("-s", "--source", type=str, help="specify source of experiment", required=True)
+    parser.add_argument("-c", "--config", type=str, help="specify config.yaml of experiment", required=True)
+    parser.add_argument("-o", "--object", type=str, help="specify object of experiment", required=True)
+    parser.add_argument("-g", "--group", type=int, default=None, help="specify group, all groups by default")
+    parser.add_argument("-d", "--destination", type=str, default=None,
+                        help="specify destination directory of detection to reuse its rolled series and "
+                             "columnar caches")
+    parser.add_argument("-p", "--param", type=str, action="append", default=[],
+                        help="specify values of parameter, e.g. threshold_short=0.2,0.3,0.4 "
+                             "(parameters not specified keep value from config)")
+    parser.add_argument("-r", "--random", type=int, default=None,
+                        help="specify count of random sets of values instead of full grid")
+    parser.add_argument("-t", "--target-fraction", type=float, default=None,
+                        help="specify target part of anomaly")
+    parser.add_argument("-l", "--labels", type=str, default=None,
+                        help="specify json of labelled intervals (group json format or list of time pairs)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                        help="specify count of processes")
+    parser.add_argument("-m", "--max-sets", type=int, default=MAX_SEARCH_SETS,
+                        help="specify maximum count of sets, larger grids require -r/--random")
+    parser.add_argument("-n", "--top", type=int, default=20, help="specify count of printed best sets")
+    parser.add_argument("--output", type=str, default=None, help="specify csv of ranked table")
+    args = parser.parse_args()
+    if (args.target_fraction is None) == (args.labels is None):
+        parser.error("one of -t/--target-fraction or -l/--labels is required")
+    return args
+
+
+def parse_space(params: List[str], post_processing: dict) -> Dict[str, list]:
+    """
+    Функция пространства подбора из аргументов вида name=value1,value2
+    :param params: список аргументов
+    :param post_processing: параметры постобработки конфига, значения по умолчанию
+    :return: словарь параметр - список значений
+    """
+    space = {name: [post_processing[name]] for name in SEARCH_PARAMETERS}
+    for param in params:
+        name, values = param.split('=', 1)
+        space.update(validate_space({name: values.split(',')}))
+    return space
+
+
+def cast_value(name: str, value: Any, integer: bool = False, minimum: float = 0) -> Union[int, float]:
+    """
+    Функция приведения значения параметра к конечному числу не меньше minimum
+    :param name: наименование параметра
+    :param value: значение (число или строка)
+    :param integer: значение должно быть целым (длины и счетчики)
+    :param minimum: наименьшее допустимое значение
+    :return: приведенное значение
+    """
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} value {value!r} is not a number")
+    if not math.isfinite(number) or number < minimum:
+        raise ValueError(f"{name} value {value!r} must be finite and not less than {minimum}")
+    if not integer:
+        return number
+    if not number.is_integer():
+        raise ValueError(f"{name} value {value!r} must be integer")
+    return int(number)
+
+
+def validate_space(space: Dict[str, Any]) -> Dict[str, list]:
+    """
+    Функция проверки пространства подбора: только параметры подбора, непустые списки приведенных значений
+    без повторов
+    :param space: словарь параметр - значение или список значений
+    :return: словарь параметр - список значений
+    """
+    if not isinstance(space, dict):
+        raise ValueError("space must be an object of parameter values")
+    validated = {}
+    for name, values in space.items():
+        if name not in SEARCH_PARAMETERS:
+            raise ValueError(f"{name} is not searchable parameter, expected one of {SEARCH_PARAMETERS}")
+        values = values if isinstance(values, (list, tuple)) else [values]
+        if not values:
+            raise ValueError(f"{name} has no values")
+        integer = not name.startswith('threshold')
+        validated[name] = list(dict.fromkeys(cast_value(name, value, integer) for value in values))
+    return validated
+
+
+def candidates(space: Dict[str, list], count: int = None, seed: int = 0) -> List[dict]:
+    """
+    Функция наборов параметров: полная сетка или count случайных наборов сетки без повторов
+    :param space: словарь параметр - список значений
+    :param count: количество случайных наборов, если None - полная сетка
+    :param seed: зерно генератора случайных наборов
+    :return: список наборов параметров
+    """
+    names = list(space)
+    sizes = [len(space[name]) for name in names]
+    grid_size = int(np.prod(sizes))
+    if count is None or count >= grid_size:
+        combinations = itertools.product(*(space[name] for name in names))
+        return [dict(zip(names, combination)) for combination in combinations]
+
+    # Случайные номера узлов сетки раскладываются в индексы значений параметров
+    numbers = np.random.default_rng(seed).choice(grid_size, size=count, replace=False)
+    positions = np.unravel_index(numbers, sizes)
+    return [{name: space[name][position[k]] for k, name in enumerate(names)} for position in zip(*positions)]
+
+
+def label_index(labels: List[Union[dict, list]], timestamps: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    Функция индексов размеченных интервалов: записи json группы (с index или time) или пары времени
+    :param labels: список размеченных интервалов
+    :param timestamps: массив строк времени ряда
+    :return: список кортежей индексов размеченных интервалов
+    """
+    idx_list = []
+    for label in labels:
+        if isinstance(label, dict) and 'index' in label:
+            idx_list.append(tuple(label['index']))
+        else:
+            time = label['time'] if isinstance(label, dict) else label
+            idx_list.append(tuple(int(index) for index in np.searchsorted(timestamps, [str(t) for t in time])))
+    return idx_list
+
+
+def init_search(target_value: np.ndarray, power_low: np.ndarray, target_fraction: float = None,
+                labels: np.ndarray = None) -> None:
+    """
+    Процедура инициализации процесса подбора: сглаженный ряд, маска мощности и цель подбора группы
+    :param target_value: массив сглаженного target_value
+    :param power_low: маска низкой мощности (True - в окне есть мощность ниже отсечки)
+    :param target_fraction: целевая доля аномалий
+    :param labels: маска размеченных отсчетов
+    :return: None
+    """
+    shared_search.update(target_value=target_value, power_low=power_low,
+                         target_fraction=target_fraction, labels=labels)
+
+
+def score_candidates(batch: List[dict]) -> List[dict]:
+    """
+    Функция оценки наборов параметров: выделение интервалов и сравнение с целью подбора
+    :param batch: список наборов параметров
+    :return: список строк таблицы: параметры, количество интервалов, доля аномалий и оценка (меньше - лучше)
+    """
+    target_value = shared_search['target_value']
+    labels = shared_search['labels']
+    rows = []
+    for candidate in batch:
+        _, idx_list, sum_anomaly = engine.get_interval(target_value, power=None, power_limit=0,
+                                                       power_low=shared_search['power_low'],
+                                                       **candidate)
+        row = {**candidate, 'intervals': len(idx_list),
+               'part_of_anomaly': sum_anomaly / len(target_value) if len(target_value) else 0.0}
+        if labels is None:
+            row['score'] = abs(row['part_of_anomaly'] - shared_search['target_fraction'])
+        else:
+            # Совпадение выделенных и размеченных отсчетов
+            detected = interval_index.coverage_mask(idx_list, len(target_value))
+            true_positive = int(np.count_nonzero(detected & labels))
+            row['precision'] = true_positive / max(int(np.count_nonzero(detected)), 1)
+            row['recall'] = true_positive / max(int(np.count_nonzero(labels)), 1)
+            row['f1'] = 2 * row['precision'] * row['recall'] / (row['precision'] + row['recall']) \
+                if true_positive else 0.0
+            row['score'] = 1 - row['f1']
+        rows.append(row)
+    return rows
+
+
+def search_group(predict_path: str, roll_cache_dir: Union[str, None], group: int, object_config: dict,
+                 post_processing: dict, space: Dict[str, list], count: int = None, target_fraction: float = None,
+                 labels: Union[str, List[Union[dict, list]]] = None, workers: int = None,
+                 seed: int = 0, columnar_cache_dir: str = None, max_sets: int = MAX_SEARCH_SETS) -> pd.DataFrame:
+    """
+    Функция подбора параметров постобработки группы: ряд сглаживается один раз и общий для всех наборов,
+    наборы оцениваются пулом процессов
+    :param predict_path: путь до csv предикта группы
+    :param roll_cache_dir: директория кэша сглаживания объекта (None - сглаживание в памяти)
+    :param group: номер группы
+    :param object_config: конфиг объекта
+    :param post_processing: параметры постобработки (сглаживание берется отсюда)
+    :param space: словарь параметр - список значений
+    :param count: количество случайных наборов, если None - полная сетка
+    :param target_fraction: целевая доля аномалий
+    :param labels: путь до json разметки или список размеченных интервалов (записи json группы или пары времени)
+    :param workers: количество процессов, по умолчанию - все ядра
+    :param seed: зерно генератора случайных наборов
+    :param columnar_cache_dir: директория поколоночного кэша csv, если None - читается сам csv
+    :param max_sets: наибольшее количество наборов, большие сетки подбираются случайными наборами count
+    :return: таблица наборов, отсортированная по оценке
+    """
+    # Проверка подбора до чтения ряда: количество наборов ограничено, цель подбора ровно одна
+    sets = math.prod(len(values) for values in space.values())
+    if count is not None:
+        count = int(count)
+        if count < 1:
+            raise ValueError(f"count of random sets {count} must be positive")
+        sets = min(sets, count)
+    if sets > max_sets:
+        raise ValueError(f"{sets} sets exceed limit {max_sets}, specify count of random sets")
+    if (target_fraction is None) == (labels is None):
+        raise ValueError("one of target fraction or labels is required")
+    if target_fraction is not None:
+        target_fraction = cast_value('target_fraction', target_fraction)
+
+    predict_stat = os.stat(predict_path)
+    target_value, timestamps = preview.rolled_series(predict_path, predict_stat.st_size, predict_stat.st_mtime_ns,
+                                                     post_processing['roll_in_hours'],
+                                                     object_config['number_of_sample'],
+                                                     roll_cache_dir or '', group, columnar_cache_dir)
+    power_low = preview.power_low(object_config['data'], os.stat(object_config['data']).st_mtime_ns,
+                                  object_config['power_index'], object_config['power_limit'],
+                                  object_config['left_power_shift'],
+                                  object_config['right_power_shift'], columnar_cache_dir)
+    label_mask = None
+    if labels is not None:
+        if isinstance(labels, str):
+            with open(labels, 'r') as read_file:
+                labels = json.load(read_file)
+        label_mask = interval_index.coverage_mask(label_index(labels, timestamps), len(target_value))
+
+    search = candidates(space, count, seed)
+    workers = max(min(workers or os.cpu_count(), len(search)), 1)
+    logger.info(f"search_group({predict_path}): {len(search)} sets, {workers} processes")
+
+    # Наборы делятся на пачки, чтобы накладные расходы пула не превышали время выделения
+    batch_size = max(len(search) // (workers * 4), 1)
+    batches = [search[k:k + batch_size] for k in range(0, len(search), batch_size)]
+    init_args = (target_value, power_low, target_fraction, label_mask)
+    if workers == 1:
+        init_search(*init_args)
+        rows = [row for batch in batches for row in score_candidates(batch)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=init_search, initargs=init_args) as pool:
+            rows = [row for batch_rows in pool.map(score_candidates, batches) for row in batch_rows]
+
+    table = pd.DataFrame(rows)
+    return table.sort_values('score', kind='stable').reset_index(drop=True)
+
+
+def main():
+    args = parse_args()
+
+    with open(args.config, 'r') as read_file:
+        config = yaml.safe_load(read_file)
+    object_config = config[args.object]
+    space = parse_space(args.param, config['post_processing'])
+
+    groups = range(object_config['count_of_groups']) if args.group is None else [args.group]
+    tables = []
+    for group in groups:
+        predict_path = os.path.join(args.source, args.object, 'csv_predict', f"predict_{group}.csv")
+        roll_cache_dir = os.path.join(args.destination, 'objects', args.object, 'data', 'cache') \
+            if args.destination is not None else None
+        columnar_cache_dir = os.path.join(args.destination, 'columnar') if args.destination is not None else None
+        table = search_group(predict_path, roll_cache_dir, group, object_config, config['post_processing'], space,
+                             args.random, args.target_fraction, args.labels, args.workers,
+                             columnar_cache_dir=columnar_cache_dir, max_sets=args.max_sets)
+        table.insert(0, 'group', group)
+        tables.append(table)
+        logger.info(f"group {group}:\n{table.head(args.top).to_string()}")
+
+    if args.output is not None:
+        pd.concat(tables, ignore_index=True).to_csv(args.output, index=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,6 @@
 import re
 import os
 import shutil
-import errno
 
 import pandas as pd
 import numpy as np
@@ -12,6 +11,8 @@ import yaml
 from typing import Union, Tuple, List, Dict
 from loguru import logger
 
+import utils.columnar_cache as columnar
+
 
 def to_camel_case(snake_str: str) -> str:
     """
@@ -66,20 +67,32 @@ def dict_to_snake_case(camel_dict: Dict[str, int]) -> Dict[str, int]:
     return snake_dict
 
 
-def copy_recursively_objects_directory(src: str, dest: str) -> None:
+def link_or_copy(src: str, dest: str) -> str:
+    """
+    Функция жесткой ссылки на файл или его копирования, если файловая система не поддерживает ссылки
+    :param src: путь файла
+    :param dest: путь ссылки
+    :return: путь ссылки
+    """
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+    return dest
+
+
+def snapshot_objects_directory(src: str, staging: str) -> None:
     """
-    Процедура рекурсивного копирования директорий объектов
+    Процедура снимка директории объектов в директорию выделения жесткими ссылками: стоимость снимка зависит от
+    количества файлов, а не от их размера. Выделение записывает результаты только через os.replace, поэтому
+    новые файлы не меняют файлы исходной директории
     :param src: путь директории объектов
-    :param dest: путь директории для бэкапа
+    :param staging: путь директории выделения
     :return: None
     """
-    try:
-        shutil.copytree(src, dest, dirs_exist_ok=True)
-    except OSError as e:
-        # Исключение если директория уже существует
-        logger.warning(e)
-        if e.errno != errno.EEXIST:
-            logger.error(e)
+    # Директория выделения, оставшаяся от прерванного запуска, не применяется
+    shutil.rmtree(staging, ignore_errors=True)
+    shutil.copytree(src, staging, copy_function=link_or_copy)
 
 
 def remove_recursively_objects_directory(path: str) -> None:
@@ -91,13 +104,46 @@ def remove_recursively_objects_directory(path: str) -> None:
     shutil.rmtree(path)
 
 
-def backup_recovery(config_path: str, config: dict, src_backup: str, dest_recovery: str) -> dict:
+def commit_objects_directory(staging: str, dest: str, previous: str) -> None:
+    """
+    Процедура применения директории выделения переименованиями директорий
+    :param staging: путь директории выделения
+    :param dest: путь директории объектов
+    :param previous: путь, под которым директория объектов удаляется после применения
+    :return: None
+    """
+    staging, dest, previous = (os.path.normpath(path) for path in (staging, dest, previous))
+    shutil.rmtree(previous, ignore_errors=True)
+    os.rename(dest, previous)
+    os.rename(staging, dest)
+    remove_recursively_objects_directory(previous)
+
+
+def recover_objects_directory(staging: str, dest: str, previous: str) -> None:
+    """
+    Процедура восстановления директории объектов после прерванного запуска приложения: незавершенное выделение
+    откатывается, прерванное применение завершается
+    :param staging: путь директории выделения
+    :param dest: путь директории объектов
+    :param previous: путь, под которым директория объектов удаляется после применения
+    :return: None
+    """
+    staging, dest, previous = (os.path.normpath(path) for path in (staging, dest, previous))
+    if not os.path.isdir(dest) and os.path.isdir(previous):
+        # Применение прервано между переименованиями: директория выделения завершена, если она есть
+        os.rename(staging if os.path.isdir(staging) else previous, dest)
+        logger.warning(f"{dest} recovered")
+    shutil.rmtree(staging, ignore_errors=True)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def backup_recovery(config_path: str, config: dict, staging: str) -> dict:
     """
-    Функция восстановления бэкапа исходного конфига и объекта
+    Функция восстановления бэкапа исходного конфига и отката выделения: директория объектов не менялась,
+    удаляется только директория выделения
     :param config_path: путь до конфига
     :param config: объект конфига, который будет восстановлен
-    :param src_backup: путь до диретории бэкапа
-    :param dest_recovery: путь до директории, в которой нужно восстановить директории объектов
+    :param staging: путь до директории выделения
     :return: восстановленный конфиг
     """
     # Восстанавливаем параметры конфига
@@ -107,10 +153,8 @@ def backup_recovery(config_path: str, config: dict, src_backup: str, dest_recove
     with open(config_path, 'r') as read_file:
         config = yaml.safe_load(read_file)
 
-    # Восстанавливаем директории с объектами
-    remove_recursively_objects_directory(dest_recovery)
-    copy_recursively_objects_directory(src_backup, dest_recovery)
-    remove_recursively_objects_directory(src_backup)
+    # Откатываем выделение
+    shutil.rmtree(staging, ignore_errors=True)
 
     return config
 
@@ -308,12 +352,12 @@ def fill_plotly_interval_specify(roll_df: pd.DataFrame, object_selected: str, gr
     return data, layout
 
 
-def fill_plotly_multi_axes(slice_df: pd.DataFrame, interval_num: int, signals: List[str],
-                           active_signals: List[str], json_interval: List[dict],
+def fill_plotly_multi_axes(slice_df: Union[pd.DataFrame, columnar.ColumnarFrame], interval_num: int,
+                           signals: List[str], active_signals: List[str], json_interval: List[dict],
                            params: Dict[str, Union[int, str, dict]]) -> Tuple[List[dict], dict]:
     """
     Функция заполнения data и layout многоосевого графика
-    :param slice_df: фрейм исходных данных срезов
+    :param slice_df: фрейм исходных данных срезов или ленивый фрейм срезов
     :param interval_num: номер выбранного интервала
     :param signals: список сигналов
     :param active_signals: список активных сигналов
@@ -324,6 +368,8 @@ def fill_plotly_multi_axes(slice_df: pd.DataFrame, interval_num: int, signals: L
     # Достаем начальные и конечные отсчеты времени и индексы интервалов
     begin, end = json_interval[interval_num]['time']
     begin_index, end_index = json_interval[interval_num]['index']
+    # Из срезов нужны только отображаемые столбцы, ленивый фрейм читает их по запросу
+    slice_df = slice_df[list(active_signals)]
 
     interval_len = end_index - begin_index
     if begin_index < interval_len:
@@ -564,16 +610,33 @@ def fill_plotly_multi_axes(slice_df: pd.DataFrame, interval_num: int, signals: L
     return data, layout
 
 
-def fill_plotly_histogram(loss: pd.DataFrame, threshold_short: int, threshold_long: int) -> Tuple[List[dict], dict]:
+def read_loss_mean(loss_mean_path: str, loss_path: str, mmap: bool = False) -> Union[np.ndarray, None]:
+    """
+    Функция чтения среднего лосса по отсчетам, сохраненного выделением интервалов
+    :param loss_mean_path: путь до npy среднего лосса группы
+    :param loss_path: путь до csv лосса группы
+    :param mmap: отобразить файл в память вместо чтения
+    :return: массив среднего лосса или None, если файла нет или он старше csv лосса
+    """
+    if not os.path.isfile(loss_mean_path) or os.path.getmtime(loss_mean_path) < os.path.getmtime(loss_path):
+        return None
+    return np.load(loss_mean_path, mmap_mode='r' if mmap else None)
+
+
+def fill_plotly_histogram(loss: Union[pd.DataFrame, np.ndarray], threshold_short: int,
+                          threshold_long: int) -> Tuple[List[dict], dict]:
     """
     Функция заполнения data и layout гистограммы
-    :param loss: фрейм лосса
+    :param loss: фрейм лосса или посчитанный выделением средний лосс по отсчетам
     :param threshold_short: порог по вероятности выделения коротких интервалов
     :param threshold_long: порог по вероятности выделения длинных интервалов
     :return: data и layout гистограммы
     """
     # Вычисляем средний loss по датчикам в каждом отсчете времени, предварительно заполнив Nan нулями
-    loss_mean = loss.fillna(0).mean(axis=1, skipna=True).values.tolist()
+    if isinstance(loss, pd.DataFrame):
+        loss_mean = loss.fillna(0).mean(axis=1, skipna=True).values.tolist()
+    else:
+        loss_mean = loss.astype(float).tolist()
 
     # Гистограмма количества вхождений значения loss в интервал
     hist = np.histogram(loss_mean, bins=100)
@@ -0,0 +1,125 @@
+"""
+Модуль содержит локальную очередь сообщений Socket.IO для нескольких процессов веб-приложения вместо внешнего
+брокера (redis, kombu): ретранслятор на localhost рассылает каждое опубликованное сообщение всем процессам,
+менеджер клиентов python-socketio публикует в него события и доставляет их своим клиентам
+"""
+import threading
+
+from multiprocessing.connection import Listener, Client, Connection
+
+import socketio
+from loguru import logger
+
+from typing import Any, Iterator, List, Tuple
+
+# Роли соединений с ретранслятором
+ROLE_PUBLISH = 'publish'
+ROLE_LISTEN = 'listen'
+
+
+class QueueRelay:
+    """
+    Ретранслятор сообщений: принимает соединения процессов и рассылает сообщения издателей всем слушателям
+    """
+    def __init__(self, authkey: bytes) -> None:
+        self.listener = Listener(('127.0.0.1', 0), authkey=authkey)
+        self.address = self.listener.address
+        self.listeners: List[Connection] = []
+        self.lock = threading.Lock()
+
+    def start(self) -> Tuple[str, int]:
+        """
+        Функция запуска приема соединений в фоновом потоке
+        :return: адрес ретранслятора
+        """
+        threading.Thread(target=self.accept, daemon=True).start()
+        logger.info(f"queue relay started on {self.address}")
+        return self.address
+
+    def accept(self) -> None:
+        """
+        Процедура приема соединений: слушатели регистрируются, для каждого издателя запускается поток чтения
+        :return: None
+        """
+        while True:
+            try:
+                connection = self.listener.accept()
+                role = connection.recv()
+            except (OSError, EOFError) as accept_error:
+                logger.warning(accept_error)
+                continue
+            if role == ROLE_LISTEN:
+                with self.lock:
+                    self.listeners.append(connection)
+            else:
+                threading.Thread(target=self.relay, args=(connection,), daemon=True).start()
+
+    def relay(self, connection: Connection) -> None:
+        """
+        Процедура рассылки сообщений издателя всем слушателям, включая процесс издателя
+        :param connection: соединение издателя
+        :return: None
+        """
+        while True:
+            try:
+                message = connection.recv()
+            except (OSError, EOFError):
+                return
+            with self.lock:
+                for listener in list(self.listeners):
+                    try:
+                        listener.send(message)
+                    except OSError:
+                        # Процесс слушателя завершился
+                        self.listeners.remove(listener)
+
+
+class LocalQueueManager(socketio.PubSubManager):
+    """
+    Менеджер клиентов python-socketio поверх ретранслятора QueueRelay: события, отправленные любым процессом,
+    доставляются клиентам всех процессов
+    """
+    name = 'local_queue'
+
+    def __init__(self, address: Tuple[str, int], authkey: bytes, channel: str = 'socketio',
+                 write_only: bool = False) -> None:
+        self.address = address
+        self.authkey = authkey
+        self.publisher = None
+        self.publish_lock = threading.Lock()
+        super().__init__(channel=channel, write_only=write_only)
+
+    def connect(self, role: str) -> Connection:
+        """
+        Функция соединения с ретранслятором
+        :param role: роль соединения: издатель или слушатель
+        :return: соединение
+        """
+        connection = Client(self.address, authkey=self.authkey)
+        connection.send(role)
+        return connection
+
+    def _publish(self, data: Any) -> None:
+        with self.publish_lock:
+            if self.publisher is None:
+                self.publisher = self.connect(ROLE_PUBLISH)
+            self.publisher.send(data)
+
+    def _listen(self) -> Iterator[Any]:
+        connection = self.connect(ROLE_LISTEN)
+        while True:
+            yield connection.recv()
+
+
+def attach_queue(server: socketio.Server, address: Tuple[str, int], authkey: bytes) -> LocalQueueManager:
+    """
+    Функция подключения сервера Socket.IO к локальной очереди до запуска сервера
+    :param server: сервер python-socketio (SocketIO.server)
+    :param address: адрес ретранслятора
+    :param authkey: ключ аутентификации соединений с ретранслятором
+    :return: менеджер клиентов
+    """
+    manager = LocalQueueManager(address, authkey)
+    manager.set_server(server)
+    server.manager = manager
+    return manager
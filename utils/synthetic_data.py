@@ -0,0 +1,157 @@
+"""
+Модуль содержит генератор синтетического testsuite: конфиги станций и эксперимента, срезы, kks с группами,
+предикты и лоссы заданного размера
+"""
+import os
+import argparse
+import yaml
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from typing import List
+
+# Параметры постобработки config_exp.yaml синтетического эксперимента
+SYNTHETIC_POST_PROCESSING = {
+    'roll_in_hours': 1,
+    'threshold_short': 0.3,
+    'threshold_long': 0.5,
+    'len_long': 100,
+    'len_short': 20,
+    'count_continue_short': 10,
+    'count_continue_long': 15,
+    'count_top': 5
+}
+
+# Отсечка по мощности синтетических станций
+SYNTHETIC_POWER_LIMIT = 20
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="generate synthetic testsuite")
+    parser.add_argument("-o", "--output", type=str, help="specify directory of testsuite", required=True)
+    parser.add_argument("-r", "--rows", type=int, default=20000, help="specify count of rows")
+    parser.add_argument("-n", "--sensors", type=int, default=10, help="specify count of sensors in group")
+    parser.add_argument("-g", "--groups", type=int, default=3, help="specify count of groups of object")
+    parser.add_argument("-b", "--objects", type=int, default=2, help="specify count of objects")
+    parser.add_argument("--seed", type=int, default=0, help="specify seed of generator")
+    return parser.parse_args()
+
+
+def anomaly_episodes(rng: np.random.Generator, rows: int, count: int) -> List[slice]:
+    """
+    Функция случайных эпизодов аномалий
+    :param rng: генератор случайных чисел
+    :param rows: количество строк
+    :param count: количество эпизодов
+    :return: список срезов строк эпизодов
+    """
+    lengths = rng.integers(30, 600, size=count)
+    starts = rng.integers(0, max(rows - 600, 1), size=count)
+    return [slice(int(start), int(start + length)) for start, length in zip(starts, lengths)]
+
+
+def generate_object(rng: np.random.Generator, testsuite: str, name: str, rows: int, sensors: int,
+                    groups: int) -> dict:
+    """
+    Функция генерации файлов одного объекта: срезы, kks с группами, предикты и лоссы групп
+    :param rng: генератор случайных чисел
+    :param testsuite: директория testsuite
+    :param name: наименование станции
+    :param rows: количество строк
+    :param sensors: количество датчиков в группе
+    :param groups: количество групп
+    :return: словарь станции для config_station.yaml
+    """
+    number_of_sample = 12
+    timestamps = pd.date_range('2023-01-01', periods=rows, freq='5min').strftime('%Y-%m-%d %H:%M:%S')
+    kks = [f"{name}{group:02d}CP{sensor:03d}" for group in range(groups) for sensor in range(sensors)]
+    power_kks = f"{name}00CE001"
+
+    # Мощность: суточный график нагрузки с остановами ниже отсечки
+    hours = np.arange(rows) / number_of_sample
+    power = 70 + 20 * np.sin(2 * np.pi * hours / 24) + rng.normal(0, 2, rows)
+    for stop in anomaly_episodes(rng, rows, max(rows // 20000, 1)):
+        power[stop] = rng.uniform(0, SYNTHETIC_POWER_LIMIT / 2, stop.stop - stop.start)
+
+    # Датчики: отклик на мощность с шумом, в эпизодах аномалий часть датчиков группы смещается
+    response = rng.uniform(0.5, 1.5, len(kks))
+    slices = np.outer(power, response) + rng.normal(0, 1, (rows, len(kks)))
+    slices_df = pd.DataFrame(slices, columns=kks)
+    slices_df.insert(0, power_kks, power)
+    slices_df.insert(0, 'timestamp', timestamps)
+
+    kks_with_groups = pd.DataFrame({
+        'kks': [power_kks] + kks,
+        'name': ['Мощность'] + [f"Датчик {sensor}" for sensor in kks],
+        'group': [0] + [group for group in range(groups) for _ in range(sensors)]
+    })
+
+    archive = os.path.join(testsuite, 'Archive', name.lower())
+    os.makedirs(os.path.join(archive, 'csv_predict'), exist_ok=True)
+    os.makedirs(os.path.join(archive, 'csv_loss'), exist_ok=True)
+    for group in range(groups):
+        group_kks = kks[group * sensors:(group + 1) * sensors]
+        target_value = np.clip(rng.normal(0.05, 0.05, rows), 0, 1)
+        loss = np.abs(rng.normal(0, 0.1, (rows, sensors)))
+        for episode in anomaly_episodes(rng, rows, max(rows // 2000, 1)):
+            length = episode.stop - episode.start
+            target_value[episode] = np.clip(rng.uniform(0.4, 0.95) + rng.normal(0, 0.1, length), 0, 1)
+            affected = rng.choice(sensors, size=max(sensors // 3, 1), replace=False)
+            loss[episode, affected] += rng.uniform(0.5, 2.0, len(affected))
+            slices_df.loc[episode.start:episode.stop - 1, [group_kks[k] for k in affected]] += 5
+
+        # Спады вероятности до нуля и пропуски, которые заполняет постобработка
+        target_value[rng.random(rows) < 0.01] = 0
+        target_value[rng.random(rows) < 0.001] = np.nan
+
+        predict_df = pd.DataFrame({'timestamp': timestamps, 'target_value': target_value})
+        predict_df.to_csv(os.path.join(archive, 'csv_predict', f"predict_{group}.csv"), index=False)
+        loss_df = pd.DataFrame(loss, columns=group_kks)
+        loss_df.insert(0, 'timestamp', timestamps)
+        loss_df.to_csv(os.path.join(archive, 'csv_loss', f"loss_{group}.csv"), index=False)
+
+    slices_df.to_csv(os.path.join(testsuite, f"{name.lower()}_slices.csv"), index=False)
+    kks_with_groups.to_csv(os.path.join(testsuite, f"{name.lower()}_kks_with_groups.csv"), sep=';', index=False)
+    return {
+        'data': f"{name.lower()}_slices.csv",
+        'kks': f"{name.lower()}_kks_with_groups.csv",
+        'power_index': power_kks,
+        'power_limit': SYNTHETIC_POWER_LIMIT,
+        'number_of_sample': number_of_sample
+    }
+
+
+def generate_testsuite(testsuite: str, rows: int = 20000, sensors: int = 10, groups: int = 3, objects: int = 2,
+                       seed: int = 0) -> str:
+    """
+    Функция генерации синтетического testsuite
+    :param testsuite: директория testsuite
+    :param rows: количество строк
+    :param sensors: количество датчиков в группе
+    :param groups: количество групп объекта
+    :param objects: количество объектов
+    :param seed: зерно генератора
+    :return: путь до эксперимента (Archive) testsuite
+    """
+    logger.info(f"generate_testsuite({testsuite}, {rows}, {sensors}, {groups}, {objects})")
+    rng = np.random.default_rng(seed)
+    os.makedirs(testsuite, exist_ok=True)
+    stations = {f"BLOCK{number + 1}": generate_object(rng, testsuite, f"BLOCK{number + 1}", rows, sensors, groups)
+                for number in range(objects)}
+
+    with open(os.path.join(testsuite, 'config_station.yaml'), 'w') as write_file:
+        yaml.dump({'Station': stations}, write_file)
+    with open(os.path.join(testsuite, 'config_exp.yaml'), 'w') as write_file:
+        yaml.dump(SYNTHETIC_POST_PROCESSING, write_file)
+    return os.path.join(testsuite, 'Archive')
+
+
+def main():
+    args = parse_args()
+    generate_testsuite(args.output, args.rows, args.sensors, args.groups, args.objects, args.seed)
+
+
+if __name__ == '__main__':
+    main()
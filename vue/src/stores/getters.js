@@ -142,6 +142,38 @@ export async function initPostProcessing(postProcessing) {
     })
 }
 
+/**
+ * Процедура предпросмотра интервалов группы по параметрам постобработки без выделения интервалов
+ * @param preview ref ссылка результата предпросмотра: интервалы и доля аномалий
+ * @param objectSelected ref ссылка выбранного объекта
+ * @param groupSelected ref ссылка выбранной группы
+ * @param postProcessing ref ссылка параметров постобработки
+ * @returns {Promise<void>}
+ */
+export async function previewIntervals(
+  preview,
+  objectSelected,
+  groupSelected,
+  postProcessing,
+) {
+  let url = URL + 'api/preview_intervals/'
+
+  await axios
+    .get(url, {
+      params: {
+        objectSelected: objectSelected.value,
+        groupSelected: groupSelected.value,
+        ...postProcessing.value,
+      },
+    })
+    .then(res => {
+      preview.value = res.data
+    })
+    .catch(error => {
+      console.log(error)
+    })
+}
+
 /**
  * Процедура обновления данных графика вероятности на всем периоде или интервале
  * @param data ref ссылка на объект data графика
@@ -247,6 +279,7 @@ export async function getAdditionalsSignals(
  * @param layout ref ссылка на объект layout графика
  * @param mainSignalRef ref ссылка основного сигнала
  * @param objectSelected ref ссылка выбранного объекта
+ * @param groupSelected ref ссылка выбранной группы
  * @param intervalSelected ref ссылка выбранного интервала
  * @param signals ref ссылка на массив объектов сигналов
  * @param signalsCheckbox  ref ссылка на массив выбранных чекбоксов сигналов многоосевого графика
@@ -257,6 +290,7 @@ export async function updatePlotlyMultipleAxes(
   layout,
   mainSignalRef,
   objectSelected,
+  groupSelected,
   intervalSelected,
   signals,
   signalsCheckbox,
@@ -268,6 +302,7 @@ export async function updatePlotlyMultipleAxes(
       params: {
         mainSignal: mainSignalRef.value.kks,
         objectSelected: objectSelected.value,
+        groupSelected: groupSelected.value,
         intervalSelected: intervalSelected,
         signals: signals.value.map(({ kks }) => kks),
         activeCheckbox: signalsCheckbox.value,
@@ -286,13 +321,25 @@ export async function updatePlotlyMultipleAxes(
  * Процедра обновления данных гистограммы распределения
  * @param data ref ссылка на объект data гистограммы
  * @param layout ref ссылка на объект layout гистограммы
+ * @param objectSelected ref ссылка выбранного объекта
+ * @param groupSelected ref ссылка выбранной группы
  * @returns {Promise<void>}
  */
-export async function updatePlotlyHistogram(data, layout) {
+export async function updatePlotlyHistogram(
+  data,
+  layout,
+  objectSelected,
+  groupSelected,
+) {
   let url = URL + 'api/update_plotly_histogram/'
 
   await axios
-    .get(url)
+    .get(url, {
+      params: {
+        objectSelected: objectSelected.value,
+        groupSelected: groupSelected.value,
+      },
+    })
     .then(res => {
       data.value = res.data.data
       layout.value = res.data.layout